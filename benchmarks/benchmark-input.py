@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports the cost of reassembling input lines.
+
+Inputs with one free-text field broken by increasing numbers of embedded '\\r\\n's (as in NSRL sample 12636-1) are parsed.  Constant microseconds per physical line means line reassembly is linear.
+"""
+
+__version__ = "0.1.0"
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import disktype_to_dfxml
+
+def best_time(function, trials):
+    """Returns the least wall-clock time of trials calls of function."""
+    best = None
+    for trial in range(trials):
+        time_start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - time_start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def make_crlf_input(break_count):
+    """Returns disktype output for an ISO9660 image whose Application field is broken by break_count embedded '\\r\\n's."""
+    lines = [
+      b"",
+      b"--- .../synthetic-crlf.img",
+      b"Regular file, size 534 MiB (559894528 bytes)",
+      b"ISO9660 file system",
+      b"  Volume name \"SYNTHETIC\"",
+      b"  Application \"" + b"APPLICATION\r\n" * break_count + b"\"",
+      b"  Data size 534 MiB (559894528 bytes, 273386 blocks of 2 KiB)",
+      b"",
+      b""
+    ]
+    return b"\n".join(lines)
+
+def main():
+    for break_count in args.break_counts:
+        input_blob = make_crlf_input(break_count)
+        physical_line_count = input_blob.count(b"\n")
+        elapsed = best_time(lambda: disktype_to_dfxml.Parser().parse(io.BytesIO(input_blob)), args.trials)
+        print("%7d embedded line breaks: %.4f seconds, %.3f microseconds/physical line." % (break_count, elapsed, 10**6 * elapsed / physical_line_count))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--trials", type=int, default=3, help="Timed runs per measurement; the best is reported.  (Default: %(default)s.)")
+    parser.add_argument("break_counts", type=int, nargs="*", default=[10000, 20000, 40000, 80000])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
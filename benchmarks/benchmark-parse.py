@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports Parser.parse throughput, in lines per second, on the sample disktype output concatenated into one large input.
+"""
+
+import argparse
+import glob
+import io
+import logging
+import os
+import sys
+import time
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import disktype_to_dfxml
+
+def main():
+    tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+    sample_blobs = []
+    for sample_path in sorted(glob.glob(os.path.join(tests_dir, "*", "*.txt"))):
+        with open(sample_path, "rb") as sample_fh:
+            sample_blobs.append(sample_fh.read())
+    #Each sample ends with a blank line, which closes all parsing levels, so the samples concatenate into one valid multi-image input.
+    input_blob = b"".join(sample_blobs) * args.repeat
+    line_count = input_blob.count(b"\n")
+
+    timings = []
+    for trial in range(args.trials):
+        parser = disktype_to_dfxml.Parser()
+        time_start = time.perf_counter()
+        parser.parse(io.BytesIO(input_blob))
+        timings.append(time.perf_counter() - time_start)
+    best = min(timings)
+    print("Input: %d bytes, %d lines." % (len(input_blob), line_count))
+    print("Best of %d: %.3f seconds, %.0f lines/s." % (args.trials, best, line_count / best))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of copies of the sample corpus in the input.")
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports Parser.parse time per line as the number of partitions in one partition system grows.  Constant time per line means parsing cost is linear in input size; growing time per line means some per-line work scales with the parsing stack's contents.
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import disktype_to_dfxml
+import synthetic_disktype
+
+def main():
+    for partition_count in args.partition_counts:
+        input_blob = synthetic_disktype.make_input("dos", partition_count)
+        line_count = input_blob.count(b"\n")
+        parser = disktype_to_dfxml.Parser()
+        time_start = time.perf_counter()
+        parser.parse(io.BytesIO(input_blob))
+        elapsed = time.perf_counter() - time_start
+        print("%6d partitions: %7d lines, %.3f seconds, %.2f microseconds/line." % (partition_count, line_count, elapsed, 10**6 * elapsed / line_count))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("partition_counts", type=int, nargs="*", default=[250, 500, 1000, 2000])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports the cost of classifying pathological lines: very long names, embedded quotes, huge whitespace runs, and delimiters repeated so a greedy wildcard has many split points to try.  Most of these lines nearly match a line pattern and then fail at the end.
+
+Each line family is built at growing lengths and classified as parse_line does, trying every pattern that the line's leading token selects.  The best time per line and per byte is reported for each length.  With linear-time patterns, the time per byte stays roughly flat as lines grow; a pattern that backtracks quadratically shows up as a time per byte that doubles with the length.
+"""
+
+__version__ = "0.1.0"
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import disktype_to_dfxml
+
+#Each family maps a repetition count to a cleaned line.
+line_families = [
+  ("long volume name", lambda count: b"Volume name \"" + b"x" * count + b"\""),
+  ("volume name of quotes", lambda count: b"Volume name \"" + b"\"" * count),
+  ("application of quoted words", lambda count: b"Application \"" + b"\"a\" " * count),
+  ("unterminated extension names", lambda count: b"Joliet extension, volume name \"x\" " * count),
+  ("padded partition line", lambda count: b"Partition 1:" + b" " * count + b"1 MiB (2 sectors from 0"),
+  ("partition line of colons", lambda count: b"Partition 1:" + b" 1:" * count + b"x"),
+  ("unclosed partition summaries", lambda count: b"Partition 1: 1 MiB" + b" (1 MiB, 2" * count),
+  ("unclosed disk size summaries", lambda count: b"Disk size 1 MiB" + b" (1 bytes, 2 blocks" * count),
+  ("unclosed volume size summaries", lambda count: b"Volume size 1 MiB" + b" (1 bytes, 2 clusters of 3 " * count),
+  ("padded volume size", lambda count: b"Volume size 1 MiB (1 bytes, 2 sectors" + b" " * count + b"x"),
+  ("unclosed data size summaries", lambda count: b"Data size 1 MiB" + b"(1 bytes, 2 blocks of 3 " * count),
+  ("type labels of parentheticals", lambda count: b"Type " + b"a (b) (" * count),
+  ("platform of system types", lambda count: b"Platform " + b"a (b), System Type " * count),
+  ("long digit run before offset", lambda count: b"FAT32 file system, " + b"1" * count + b" bytes offset")
+]
+
+def best_time(function, trials):
+    """Returns the least wall-clock time of trials calls of function."""
+    best = None
+    for trial in range(trials):
+        time_start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - time_start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    line_classifier = disktype_to_dfxml.get_line_classifier()
+    print("family\tcount\tbytes\tmicroseconds/line\tnanoseconds/byte")
+    for (label, make_line) in line_families:
+        for count in args.counts:
+            cleaned_line = make_line(count)
+            seconds = best_time(lambda: line_classifier.classify(cleaned_line), args.trials)
+            print("%s\t%d\t%d\t%.1f\t%.2f" % (label, count, len(cleaned_line), 10**6 * seconds, 10**9 * seconds / len(cleaned_line)))
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--trials", type=int, default=5, help="Timed classifications per line; the best is reported.  (Default: %(default)s.)")
+    parser.add_argument("counts", type=int, nargs="*", default=[1000, 2000, 4000, 8000], help="Repetition counts to build each line family at.  (Default: %(default)s.)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
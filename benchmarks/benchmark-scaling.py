@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports how Parser.parse and DFXML serialization scale with input size, on synthetic disktype output (see synthetic_disktype.py).  For each layout and partition count, one tab-separated row reports the input size, the best-of-trials parse and serialization times, parse throughput, and the peak memory traced during each phase.  The rows for one layout form a time-vs-size curve; constant microseconds per line means linear scaling.
+"""
+
+__version__ = "0.1.0"
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import disktype_to_dfxml
+import synthetic_disktype
+
+def best_time(function, trials):
+    """Returns the least wall-clock time of trials calls of function."""
+    best = None
+    for trial in range(trials):
+        time_start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - time_start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def traced_peak(function):
+    """Returns the peak memory, in bytes, allocated through Python during a call of function."""
+    tracemalloc.start()
+    try:
+        function()
+        (current, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def main():
+    print("\t".join([
+      "layout",
+      "images",
+      "partitions",
+      "lines",
+      "input_bytes",
+      "parse_seconds",
+      "parse_lines_per_second",
+      "parse_microseconds_per_line",
+      "parse_peak_bytes",
+      "serialize_seconds",
+      "serialize_peak_bytes"
+    ]))
+    for layout in args.layouts:
+        for partition_count in args.partition_counts:
+            input_blob = synthetic_disktype.make_input(layout, partition_count, args.images)
+            line_count = input_blob.count(b"\n")
+
+            def _parse():
+                return disktype_to_dfxml.Parser().parse(io.BytesIO(input_blob))
+            dobj = _parse()
+            def _serialize():
+                dobj.print_dfxml(output_fh=io.StringIO())
+
+            parse_seconds = best_time(_parse, args.trials)
+            serialize_seconds = best_time(_serialize, args.trials)
+            parse_peak = traced_peak(_parse)
+            serialize_peak = traced_peak(_serialize)
+
+            print("\t".join([
+              layout,
+              str(args.images),
+              str(partition_count),
+              str(line_count),
+              str(len(input_blob)),
+              "%.4f" % parse_seconds,
+              "%.0f" % (line_count / parse_seconds),
+              "%.2f" % (10**6 * parse_seconds / line_count),
+              str(parse_peak),
+              "%.4f" % serialize_seconds,
+              str(serialize_peak)
+            ]))
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--layouts", nargs="+", choices=sorted(synthetic_disktype.layout_makers.keys()), default=sorted(synthetic_disktype.layout_makers.keys()))
+    parser.add_argument("--images", type=int, default=1, help="Number of concatenated image outputs per input.  (Default: %(default)s.)")
+    parser.add_argument("--trials", type=int, default=3, help="Timed runs per measurement; the best is reported.  (Default: %(default)s.)")
+    parser.add_argument("partition_counts", type=int, nargs="*", default=[500, 1000, 2000, 4000])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
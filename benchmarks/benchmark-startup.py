@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script reports the start-up cost of disktype_to_dfxml.py, which dominates converting small disktype outputs one process at a time.
+
+First, the best wall-clock time of several fresh interpreters is reported for: an empty interpreter; importing disktype_to_dfxml; importing it and using one regex; converting a sample as a script; and converting it with `python3 -m`, which, unlike running the script, reuses the byte code cached in __pycache__.
+
+Second, `python3 -X importtime` is run on the import, and the import's own and cumulative microseconds are reported, along with its heaviest direct imports.
+"""
+
+__version__ = "0.1.0"
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+top_srcdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def best_run_time(command, trials):
+    """Returns the least wall-clock time of trials runs of command, run in the top source directory with stdout discarded."""
+    best = None
+    for trial in range(trials):
+        time_start = time.perf_counter()
+        subprocess.run(command, cwd=top_srcdir, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - time_start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def import_times():
+    """Returns (module name, self microseconds, cumulative microseconds, nesting depth) for each module that importing disktype_to_dfxml loads, in -X importtime's order."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import disktype_to_dfxml"], cwd=top_srcdir, stderr=subprocess.PIPE, check=True, universal_newlines=True)
+    records = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            (self_us, cumulative_us) = (int(fields[0]), int(fields[1]))
+        except ValueError:
+            #Header line.
+            continue
+        name_field = fields[2]
+        module_name = name_field.strip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        records.append((module_name, self_us, cumulative_us, depth))
+    return records
+
+def main():
+    sample_path = os.path.abspath(args.sample)
+    for (label, command) in [
+      ("empty interpreter", [sys.executable, "-c", "pass"]),
+      ("import", [sys.executable, "-c", "import disktype_to_dfxml"]),
+      ("import and one regex", [sys.executable, "-c", "import disktype_to_dfxml; disktype_to_dfxml.rx_publisher.search(b'Publisher \"X\"')"]),
+      ("convert, as script", [sys.executable, "disktype_to_dfxml.py", sample_path]),
+      ("convert, with -m", [sys.executable, "-m", "disktype_to_dfxml", sample_path])
+    ]:
+        print("%-22s %7.1f ms" % (label + ":", 1000 * best_run_time(command, args.trials)))
+    sys.stdout.flush()
+
+    records = import_times()
+    #The import of interest is the last depth-0 record; its direct imports are the depth-1 records before it.
+    top_index = max(index for (index, record) in enumerate(records) if record[0] == "disktype_to_dfxml")
+    (module_name, self_us, cumulative_us, depth) = records[top_index]
+    print("-X importtime, disktype_to_dfxml: %d us self, %d us cumulative." % (self_us, cumulative_us))
+    direct_imports = []
+    for (module_name, self_us, cumulative_us, depth) in reversed(records[:top_index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            direct_imports.append((cumulative_us, module_name))
+    for (cumulative_us, module_name) in sorted(direct_imports, reverse=True)[:args.top]:
+        print("  %7d us cumulative  %s" % (cumulative_us, module_name))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--sample", default=os.path.join(top_srcdir, "tests", "ubuntu16.04", "nsrl-10002-1.txt"), help="disktype output to convert.  (Default: %(default)s.)")
+    parser.add_argument("--trials", type=int, default=10, help="Runs per measurement; the best is reported.  (Default: %(default)s.)")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest direct imports to list.  (Default: %(default)s.)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
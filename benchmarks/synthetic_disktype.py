@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script generates synthetic disktype output at arbitrary scale, for benchmarking.  The line shapes are copied from the samples in tests/, so every generated line is one the parser's rx_* patterns accept.  Layouts:
+
+* dos: A DOS/MBR partition map, each partition holding an Ext3 file system.
+* gpt: A GPT partition map, each partition holding an Ext4 file system.
+* eltorito: An ISO9660 file system with an El Torito floppy image holding a BSD disklabel, each disklabel partition holding a UFS file system.
+
+Several images' outputs can be concatenated, as disktype does when given several paths.
+
+Imported as a module, the make_* functions return lists of lines (byte strings without line endings), and make_input() returns a whole disktype output blob.
+"""
+
+__version__ = "0.1.0"
+
+import argparse
+import logging
+import os
+import sys
+import uuid
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+SECTOR_SIZE = 512
+PARTITION_SECTORS = 2048
+
+def human_size(num_bytes):
+    """Returns a size string in disktype's style, e.g. b"1 MiB" or b"1.406 MiB"."""
+    size = float(num_bytes)
+    for unit in [b"bytes", b"KiB", b"MiB", b"GiB"]:
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = b"TiB"
+    if size == int(size):
+        return b"%d %s" % (int(size), unit)
+    return b"%.4g %s" % (size, unit)
+
+def guid(*seeds):
+    """Returns a deterministic upper-case GUID string for the seed numbers."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, ".".join(map(str, seeds)))).upper().encode("ascii")
+
+def bsd_partition_letter(partition_index):
+    """Returns BSD-style partition letters: a, b, ..., z, aa, ab, ...  (Real disklabels stop at p; the parser doesn't care.)"""
+    letters = b""
+    partition_index += 1
+    while partition_index > 0:
+        (partition_index, remainder) = divmod(partition_index - 1, 26)
+        letters = bytes([ord("a") + remainder]) + letters
+    return letters
+
+def make_image_header(image_path, image_bytes):
+    return [
+      b"--- " + image_path,
+      b"Regular file, size %s (%d bytes)" % (human_size(image_bytes), image_bytes)
+    ]
+
+def make_dos(image_path, partition_count, image_index=0):
+    partition_bytes = SECTOR_SIZE * PARTITION_SECTORS
+    image_bytes = partition_bytes * (partition_count + 1)
+    lines = make_image_header(image_path, image_bytes)
+    lines.append(b"DOS/MBR partition map")
+    for partition_index in range(1, partition_count+1):
+        lines.append(b"Partition %d: %s (%d bytes, %d sectors from %d)" % (partition_index, human_size(partition_bytes), partition_bytes, PARTITION_SECTORS, partition_index * PARTITION_SECTORS))
+        lines.append(b"  Type 0x83 (Linux)")
+        lines.append(b"  Ext3 file system")
+        lines.append(b"    Volume size %s (%d bytes, %d blocks of 1 KiB)" % (human_size(partition_bytes), partition_bytes, partition_bytes // 1024))
+    return lines
+
+def make_gpt(image_path, partition_count, image_index=0):
+    partition_bytes = SECTOR_SIZE * PARTITION_SECTORS
+    image_bytes = partition_bytes * (partition_count + 1)
+    lines = make_image_header(image_path, image_bytes)
+    lines.append(b"GPT partition map, %d entries" % partition_count)
+    lines.append(b"  Disk size %s (%d bytes, %d sectors)" % (human_size(image_bytes), image_bytes, image_bytes // SECTOR_SIZE))
+    lines.append(b"  Disk GUID " + guid(image_index))
+    for partition_index in range(1, partition_count+1):
+        lines.append(b"Partition %d: %s (%d bytes, %d sectors from %d)" % (partition_index, human_size(partition_bytes), partition_bytes, PARTITION_SECTORS, partition_index * PARTITION_SECTORS))
+        lines.append(b"  Type Linux Data (GUID AF3DC60F-8384-7247-8E79-3D69D8477DE4)")
+        lines.append(b"  Partition Name \"part%d\"" % partition_index)
+        lines.append(b"  Partition GUID " + guid(image_index, partition_index))
+        lines.append(b"  Ext4 file system")
+        lines.append(b"    UUID " + guid(image_index, partition_index, 0) + b" (DCE, v4)")
+        lines.append(b"    Volume size %s (%d bytes, %d blocks of 4 KiB)" % (human_size(partition_bytes), partition_bytes, partition_bytes // 4096))
+    return lines
+
+def make_eltorito(image_path, partition_count, image_index=0):
+    floppy_bytes = 2880 * SECTOR_SIZE
+    iso_blocks = 2048 + partition_count
+    image_bytes = 2048 * iso_blocks
+    lines = make_image_header(image_path, image_bytes)
+    lines.append(b"ISO9660 file system")
+    lines.append(b"  Volume name \"SYNTH%d\"" % image_index)
+    lines.append(b"  Data size %s (%d bytes, %d blocks of 2 KiB)" % (human_size(image_bytes), image_bytes, iso_blocks))
+    lines.append(b"  El Torito boot record, catalog at 307")
+    lines.append(b"    Bootable 1.44M floppy image, starts at 308, preloads 512 bytes")
+    lines.append(b"      Platform 0x00 (x86), System Type 0x00 (Empty)")
+    lines.append(b"      FreeBSD boot loader (i386 boot1 at sector 0)")
+    lines.append(b"      BSD disklabel (at sector 1), %d partitions" % partition_count)
+    for partition_index in range(partition_count):
+        lines.append(b"      Partition %s: %s (%d bytes, %d sectors from 0)" % (bsd_partition_letter(partition_index), human_size(floppy_bytes), floppy_bytes, floppy_bytes // SECTOR_SIZE))
+        lines.append(b"        Type 7 (4.2BSD fast file system)")
+        lines.append(b"        Includes the disklabel and boot code")
+        lines.append(b"        UFS file system, 8 KiB offset, little-endian")
+        lines.append(b"          Last mounted at \"/mnt%d\"" % partition_index)
+    return lines
+
+layout_makers = {
+  "dos": make_dos,
+  "eltorito": make_eltorito,
+  "gpt": make_gpt
+}
+
+def make_input(layout, partition_count, image_count=1):
+    """Returns disktype output for image_count images of the given layout, each with partition_count partitions, as one byte string."""
+    lines = []
+    for image_index in range(image_count):
+        lines.append(b"")
+        lines += layout_makers[layout](b".../synthetic-%s-%d.img" % (layout.encode("ascii"), image_index), partition_count, image_index)
+    lines.append(b"")
+    lines.append(b"")
+    return b"\n".join(lines)
+
+def main():
+    sys.stdout.buffer.write(make_input(args.layout, args.partitions, args.images))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--layout", choices=sorted(layout_makers.keys()), default="gpt")
+    parser.add_argument("--partitions", type=int, default=128, help="Partitions per image.  (Default: %(default)s.)")
+    parser.add_argument("--images", type=int, default=1, help="Number of concatenated image outputs.  (Default: %(default)s.)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    main()
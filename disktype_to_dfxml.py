@@ -13,20 +13,40 @@
 
 __version__ = "0.3.1"
 
-import subprocess
 import re
 import enum
 import os
 import logging
+import stat
 import sys
-import xml.etree.ElementTree as ET
-import copy
+import collections
+import importlib.util
+import io
+import time
 
 _logger = logging.getLogger(os.path.basename(__file__))
 
-import Objects
-
-XMLNS_DFXML_EXT = Objects.dfxml.XMLNS_DFXML + "#extensions"
+def lazy_import(name):
+    """Returns the module name, deferring its execution until an attribute of it is first used.  Parsing needs the DFXML libraries, but a program that only imports this script (e.g. to check a regex) doesn't pay for them."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("No module named %r" % name, name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+#Modules used by only a few functions (subprocess, hashlib, mmap, tempfile, fcntl, xml.sax.saxutils) are imported in those functions.
+ET = lazy_import("xml.etree.ElementTree")
+Objects = lazy_import("Objects")
+
+#Objects.dfxml.XMLNS_DFXML + "#extensions", spelled out so defining it doesn't load the DFXML libraries.
+XMLNS_DFXML_EXT = "http://www.forensicswiki.org/wiki/Category:Digital_Forensics_XML#extensions"
+#Objects.dfxml.XMLNS_DELTA, spelled out for the same reason.
+XMLNS_DELTA = "http://www.forensicswiki.org/wiki/Forensic_Disk_Differencing"
 
 block_units = {
   "bytes": 2**0,
@@ -35,9 +55,20 @@ block_units = {
   "GiB"  : 2**30
 }
 
+class ByteExtent(collections.namedtuple("ByteExtent", ["img_offset", "len"])):
+    """Immutable byte run of an internal model object.  Either member can be None until disktype reports it; an update replaces the whole extent, so extents can be shared without copying.  Converted to Objects.ByteRun only when written into DFXML."""
+    __slots__ = ()
+
+    def to_ByteRun(self):
+        return Objects.ByteRun(img_offset=self.img_offset, len=self.len)
+
+EMPTY_BYTE_EXTENT = ByteExtent(None, None)
+
 class DiskImageObject(object):
+    __slots__ = ("byte_run", "partition_systems", "sector_size", "volumes")
+
     def __init__(self):
-        self.byte_runs = Objects.ByteRuns()
+        self.byte_run = EMPTY_BYTE_EXTENT
         self.partition_systems = []
         self.sector_size = None
         self.volumes = []
@@ -45,13 +76,17 @@ class DiskImageObject(object):
     def __str__(self):
         parts = []
         for prop in [
-          "byte_runs",
+          "byte_run",
           "partition_systems",
           "sector_size",
           "volumes"
         ]:
             val = getattr(self, prop)
-            if val:
+            if prop == "byte_run":
+                #A ByteExtent is a tuple, so always true; it holds a byte run once either member is reported.
+                if not val.img_offset is None or not val.len is None:
+                    parts.append("%s=%s" % (prop, val))
+            elif val:
                 parts.append("%s=%s" % (prop, val))
         return "DiskImageObject(" + ", ".join(parts) + ")"
 
@@ -64,9 +99,11 @@ class DiskImageObject(object):
             raise ValueError("Unexpected object type passed to DiskImageObject.append(): %r." % type(obj))
 
 class PartitionSystemObject(object):
+    __slots__ = ("block_size", "byte_run", "guid", "partitions", "pstype_str", "volume_name")
+
     def __init__(self):
         self.block_size = None
-        self.byte_runs = Objects.ByteRuns()
+        self.byte_run = EMPTY_BYTE_EXTENT
         self.guid = None
         self.partitions = []
         self.pstype_str = None
@@ -76,14 +113,18 @@ class PartitionSystemObject(object):
         parts = []
         for prop in [
           "block_size",
-          "byte_runs",
+          "byte_run",
           "guid",
           "partitions",
           "pstype_str",
           "volume_name"
         ]:
             val = getattr(self, prop)
-            if val:
+            if prop == "byte_run":
+                #A ByteExtent is a tuple, so always true; it holds a byte run once either member is reported.
+                if not val.img_offset is None or not val.len is None:
+                    parts.append("%s=%s" % (prop, val))
+            elif val:
                 parts.append("%s=%s" % (prop, val))
         return "PartitionSystemObject(" + ", ".join(parts) + ")"
 
@@ -94,10 +135,12 @@ class PartitionSystemObject(object):
             raise ValueError("Unexpected object type passed to PartitionSystemObject.append(): %r." % type(obj))
 
 class PartitionObject(object):
+    __slots__ = ("block_count", "block_size", "byte_run", "ftype_str", "guid", "partition_system_offset", "partition_systems", "ptype", "ptype_str", "volumes")
+
     def __init__(self):
         self.block_count = None
         self.block_size = None
-        self.byte_runs = Objects.ByteRuns()
+        self.byte_run = EMPTY_BYTE_EXTENT
         self.ftype_str = None
         self.guid = None
         self.partition_system_offset = None #Unit: bytes.  Offset within partition system.  Could also be byte_run/@ps_offset, if that were defined in the Objects.ByteRun class.
@@ -111,7 +154,7 @@ class PartitionObject(object):
         for prop in [
           "block_count",
           "block_size",
-          "byte_runs",
+          "byte_run",
           "ftype_str",
           "guid",
           "partition_system_offset",
@@ -121,7 +164,11 @@ class PartitionObject(object):
           "volumes"
         ]:
             val = getattr(self, prop)
-            if val:
+            if prop == "byte_run":
+                #A ByteExtent is a tuple, so always true; it holds a byte run once either member is reported.
+                if not val.img_offset is None or not val.len is None:
+                    parts.append("%s=%s" % (prop, val))
+            elif val:
                 parts.append("%s=%s" % (prop, val))
         return "PartitionObject(" + ", ".join(parts) + ")"
 
@@ -535,80 +582,673 @@ state_transitions = {
   }
 }
 
+class LazyPattern(object):
+    """
+    A regular expression compiled on first use, instead of when this script is imported.  match(), search(), fullmatch(), finditer() and sub() act as the compiled pattern's.
+
+    The line classifier takes the compiled patterns (see compiled()) when it is built, so parsing doesn't go through this wrapper.
+    """
+
+    __slots__ = ("pattern", "flags", "_compiled")
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = None
+
+    def __repr__(self):
+        return "LazyPattern(%r, %r)" % (self.pattern, self.flags)
+
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern, self.flags)
+        return self._compiled
+
+    def match(self, *args):
+        return self.compiled().match(*args)
+
+    def search(self, *args):
+        return self.compiled().search(*args)
+
+    def fullmatch(self, *args):
+        return self.compiled().fullmatch(*args)
+
+    def finditer(self, *args):
+        return self.compiled().finditer(*args)
+
+    def sub(self, *args, **kwargs):
+        return self.compiled().sub(*args, **kwargs)
+
 #These regexen are for byte strings because some free-form text (like generating application) includes non-ASCII characters (e.g. a copyright symbol).
 #Use of re.DOTALL is for patterns that have free-form text, which have been observed to include embedded newline characters.
-rx_additional_primary_volume_descriptor   = re.compile(br"^Additional Primary Volume Descriptor$")
-rx_application                            = re.compile(br"^Application +\"(?P<application>.+)\"$", re.DOTALL)
-rx_bar_archive                            = re.compile(br"^bar archive$")
-rx_blank_check                            = re.compile(br"^First (?P<range>.+) are blank$")
-rx_blank_medium                           = re.compile(br"^Blank disk/medium$")
-rx_boot_loader                            = re.compile(br"^(?P<boot_loader_type>(BeOS|FreeBSD|GRUB|ISOLINUX|LILO|SYSLINUX|Windows / MS-DOS|Windows 95/98/ME|Windows NTLDR)) boot loader.*$")
-rx_boot_record                            = re.compile(br"^(?P<boot_record_type>.+) boot record, catalog at (?P<offset_in_sectors>\d+)$")
-rx_boot_record_unknown_format             = re.compile(br"^Boot record of unknown format$")
-rx_bootable_floppy_image                  = re.compile(br"^Bootable (?P<floppy_size>.+) floppy image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_byte_count>\d+) bytes$")
-rx_bootable_hard_disk_image               = re.compile(br"^Bootable hard disk image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_byte_count>\d+) bytes$")
-rx_bootable_nonemulated_image             = re.compile(br"^Bootable non-emulated image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_count_unitless>\d+) (?P<preload_count_unit>.+)$")
-rx_bootable_nonemulated_image_summary     = re.compile(br"^Bootable non-emulated image, starts at (?P<boot_offset_in_sectors>\d+), preloads .+ \((?P<preload_count_unitless>\d+) (?P<preload_count_unit>.+)\)$")
-rx_bsd_disklabel                          = re.compile(br"^BSD disklabel \(at sector (?P<sector>\d+)\), \d+ partitions$")
-rx_compress                               = re.compile(br"^compress-compressed data( at sector (?P<sector>\d+))?$")
-rx_cpio_archive                           = re.compile(br"^cpio archive(.*)$")
-rx_data_size                              = re.compile(br"^Data size.+\((?P<num_bytes>\d+) bytes, (?P<block_count>\d+) blocks of (?P<bytes_per_block_unitless>\d+) (?P<bytes_per_block_unit>.+)\)$")
-rx_data_size_no_comma                     = re.compile(br"^Data size (?P<num_bytes>\d+) bytes \((?P<block_count>\d+) blocks of (?P<bytes_per_block_unitless>\d+) (?P<bytes_per_block_unit>.+)\)$")
-rx_descriptor_type                        = re.compile(br"^Descriptor type (?P<descriptor_type>\d+) at sector (?P<descriptor_offset_sector>\d+)$")
-rx_disk_meta                              = re.compile(br"^Regular file, size (?P<human_readable_size>\d.+B) \((?P<bytes_in_image>\d+) bytes\)$")
-rx_disk_guid                              = re.compile(br"^Disk GUID (?P<guid>[-0-9A-F]+)$")
-rx_disk_size                              = re.compile(br"^Disk size.+ \((?P<num_bytes>\d+) bytes, (?P<num_blocks>\d+) (?P<block_unit>blocks|sectors).*\)$")
-rx_file_system_uuid                       = re.compile(br"^UUID (?P<uuid>[-0-9A-F]+|nil)(.*)$")
-rx_fs_type_str                            = re.compile(br"^(?P<ftype_str>.+) file system(?P<misc>.*)$")
-rx_fs_type_str_misc_offset                = re.compile(br"(?P<bytes_unitless>\d+) (?P<bytes_unit>.iB) offset")
-rx_gzip                                   = re.compile(br"^gzip-compressed data( at sector (?P<sector>\d+))?$")
-rx_input_file                             = re.compile(br"^--- (?P<filepath>.+)$")
-rx_hfs_wrapper                            = re.compile(br"^HFS wrapper for (?P<ftype_label>.+)$")
-rx_iso9660_extension                      = re.compile(br"^(?P<extension>.+) extension, volume name \"(?P<volume_name>.*)\"$", re.DOTALL)
-rx_last_mounted                           = re.compile(br"^Last mounted at \"(?P<filepath>.+)\"$")
-rx_no_type_and_creator_code               = re.compile(br"^No type and creator code$")
-rx_partition_guid                         = re.compile(br"^Partition GUID (?P<guid>[-0-9A-F]+)$")
-rx_partition_includes                     = re.compile(br"^Includes the disklabel( and boot code)?$")  #Phrase hard-coding matches disktype unix.c.
-rx_partition_invalid_signature            = re.compile(br"^Partition (?P<partition_index>.+): invalid signature, skipping$")
-rx_partition_map                          = re.compile(br"^(?P<pstype_str>.+) partition map.*$")
-rx_partition_meta_no_size_summary         = re.compile(br"^Partition (?P<partition_index>.+):.+(?P<partition_size_unitless>\d+) (?P<partition_size_unit>.+) \((?P<num_blocks_distance>\d+) (?P<block_unit>(sectors|clusters)) from (?P<from>\d+)(?P<bootable>(, bootable)?)\)")
-rx_partition_meta_size_summary            = re.compile(br"^Partition (?P<partition_index>.+):.+\((?P<partition_size_unitless>\d+) (?P<partition_size_unit>.+), (?P<num_blocks_distance>\d+) (?P<block_unit>(sectors|clusters)) from (?P<from>\d+)(?P<bootable>(, bootable)?)\)")
-rx_partition_name                         = re.compile(br"^Partition Name \"(?P<partition_name>.+)\"$", re.DOTALL)
-rx_partition_ptype_and_ptype_str          = re.compile(br"^Type (?P<ptype>(0x[0-9A-Fa-f]{2}|\d+)) \((?P<ptype_label>.+)\)$")
-rx_partition_ptype_int                    = re.compile(br"^Type (?P<ptype_label>\d+)$")
-rx_partition_ptype_str                    = re.compile(br"^Type \"(?P<ptype_label>.+)\"$")
-rx_partition_ptype_str_and_guid           = re.compile(br"^Type (?P<ptype_label>.+) \(GUID (?P<guid>[-0-9A-F]+)\)$")
-rx_partition_ptype_str_ftype_str_and_guid = re.compile(br"^Type (?P<ptype_label>.+) \((?P<ftype_str>.+)\) \(GUID (?P<guid>[-0-9A-F]+)\)$")
-rx_partition_unused                       = re.compile(br"^Partition (?P<partition_index>.+): unused$")
-rx_platform_system_type                   = re.compile(br"^Platform (?P<platform_encoded>.+) \((?P<platform_decoded>.+)\), System Type (?P<system_type_encoded>.+) \((?P<system_type_decoded>.+)\)$")
-rx_preparer                               = re.compile(br"^Preparer +\"(?P<preparer>.+)\"$")
-rx_primary_volume_descriptor_missing      = re.compile(br"^Primary Volume Descriptor missing$")
-rx_publisher                              = re.compile(br"^Publisher +\"(?P<publisher>.+)\"$")
-rx_sector_size                            = re.compile(br"^(Unusual s|S)ector size (?P<sector_size>\d+) bytes$")
-rx_signature_missing                      = re.compile(br"^Signature missing( in sector (?P<sector>\d+))?$")
-rx_solaris_sparc_disklabel                = re.compile(br"^Solaris SPARC disklabel$")
-rx_solaris_x86_disklabel                  = re.compile(br"^Solaris x86 disklabel, version (?P<version>.+), (?P<partition_count>\d+) partitions$")
-rx_tar_archive                            = re.compile(br"^(GNU|Pre-POSIX) tar archive$")
-rx_udf_recognition_sequence_missingloc    = re.compile(br"^UDF recognition sequence, unable to locate anchor descriptor$")
-rx_udf_version                            = re.compile(br"^UDF version (?P<version>.+)$")
-rx_validation_entry_missing               = re.compile(br"^Validation entry missing$")
-rx_volume_name                            = re.compile(br"^Volume name \"(?P<volume_name>.*)\"(?P<misc>.*)$", re.DOTALL)
-rx_volume_size_blocks_or_sectors          = re.compile(br"^Volume size.+ \((?P<num_bytes>\d+) bytes, (?P<num_blocks>\d+) (?P<block_unit>blocks|sectors).*\)$")
-rx_volume_size_clusters                   = re.compile(br"^Volume size.+ \((?P<num_bytes>\d+) bytes, (?P<num_clusters>\d+) clusters of (?P<bytes_per_cluster_unitless>\d+) (?P<bytes_per_cluster_unit>.+)\)$")
-rx_volume_size_clusters_no_summary        = re.compile(br"^Volume size.+ \((?P<num_clusters>\d+) clusters of (?P<bytes_per_cluster_unitless>\d+) (?P<bytes_per_cluster_unit>.+)\)$")
+#Matching must take time linear in the line length, so long names and padded lines cannot make a pattern backtrack quadratically.  A greedy wildcard retries what follows it at every split point, so what follows must fail or succeed without rescanning the rest of the line: a field ending at a fixed delimiter is a class excluding that delimiter (e.g. [^:\n]+:) instead of a second wildcard, and where the last wildcard runs to the end of the line, a lookahead first checks how the line ends (e.g. (?=.*\)$)), which the match could not succeed without.  benchmarks/benchmark-pathological.py reports the per-byte cost of long lines.
+rx_additional_primary_volume_descriptor   = LazyPattern(br"^Additional Primary Volume Descriptor$")
+rx_application                            = LazyPattern(br"^Application +\"(?P<application>.+)\"$", re.DOTALL)
+rx_bar_archive                            = LazyPattern(br"^bar archive$")
+rx_blank_check                            = LazyPattern(br"^First (?P<range>.+) are blank$")
+rx_blank_medium                           = LazyPattern(br"^Blank disk/medium$")
+rx_boot_loader                            = LazyPattern(br"^(?P<boot_loader_type>(BeOS|FreeBSD|GRUB|ISOLINUX|LILO|SYSLINUX|Windows / MS-DOS|Windows 95/98/ME|Windows NTLDR)) boot loader.*$")
+rx_boot_record                            = LazyPattern(br"^(?P<boot_record_type>.+) boot record, catalog at (?P<offset_in_sectors>\d+)$")
+rx_boot_record_unknown_format             = LazyPattern(br"^Boot record of unknown format$")
+rx_bootable_floppy_image                  = LazyPattern(br"^Bootable (?P<floppy_size>.+) floppy image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_byte_count>\d+) bytes$")
+rx_bootable_hard_disk_image               = LazyPattern(br"^Bootable hard disk image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_byte_count>\d+) bytes$")
+rx_bootable_nonemulated_image             = LazyPattern(br"^Bootable non-emulated image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?P<preload_count_unitless>\d+) (?P<preload_count_unit>.+)$")
+rx_bootable_nonemulated_image_summary     = LazyPattern(br"^Bootable non-emulated image, starts at (?P<boot_offset_in_sectors>\d+), preloads (?=.*\)$).+ \((?P<preload_count_unitless>\d+) (?P<preload_count_unit>.+)\)$")
+rx_bsd_disklabel                          = LazyPattern(br"^BSD disklabel \(at sector (?P<sector>\d+)\), \d+ partitions$")
+rx_compress                               = LazyPattern(br"^compress-compressed data( at sector (?P<sector>\d+))?$")
+rx_cpio_archive                           = LazyPattern(br"^cpio archive(.*)$")
+rx_data_size                              = LazyPattern(br"^Data size(?=.*\)$).+\((?P<num_bytes>\d+) bytes, (?P<block_count>\d+) blocks of (?P<bytes_per_block_unitless>\d+) (?P<bytes_per_block_unit>.+)\)$")
+rx_data_size_no_comma                     = LazyPattern(br"^Data size (?P<num_bytes>\d+) bytes \((?P<block_count>\d+) blocks of (?P<bytes_per_block_unitless>\d+) (?P<bytes_per_block_unit>.+)\)$")
+rx_descriptor_type                        = LazyPattern(br"^Descriptor type (?P<descriptor_type>\d+) at sector (?P<descriptor_offset_sector>\d+)$")
+rx_disk_meta                              = LazyPattern(br"^Regular file, size (?P<human_readable_size>\d.+B) \((?P<bytes_in_image>\d+) bytes\)$")
+rx_disk_guid                              = LazyPattern(br"^Disk GUID (?P<guid>[-0-9A-F]+)$")
+rx_disk_size                              = LazyPattern(br"^Disk size(?=.*\)$).+ \((?P<num_bytes>\d+) bytes, (?P<num_blocks>\d+) (?P<block_unit>blocks|sectors).*\)$")
+rx_file_system_uuid                       = LazyPattern(br"^UUID (?P<uuid>[-0-9A-F]+|nil)(.*)$")
+rx_fs_type_str                            = LazyPattern(br"^(?P<ftype_str>.+) file system(?P<misc>.*)$")
+rx_fs_type_str_misc_offset                = LazyPattern(br"(?<!\d)(?P<bytes_unitless>\d+) (?P<bytes_unit>.iB) offset")
+rx_gzip                                   = LazyPattern(br"^gzip-compressed data( at sector (?P<sector>\d+))?$")
+rx_input_file                             = LazyPattern(br"^--- (?P<filepath>.+)$")
+rx_hfs_wrapper                            = LazyPattern(br"^HFS wrapper for (?P<ftype_label>.+)$")
+rx_iso9660_extension                      = LazyPattern(br"^(?=.*\"$)(?P<extension>.+) extension, volume name \"(?P<volume_name>.*)\"$", re.DOTALL)
+rx_last_mounted                           = LazyPattern(br"^Last mounted at \"(?P<filepath>.+)\"$")
+rx_no_type_and_creator_code               = LazyPattern(br"^No type and creator code$")
+rx_partition_guid                         = LazyPattern(br"^Partition GUID (?P<guid>[-0-9A-F]+)$")
+rx_partition_includes                     = LazyPattern(br"^Includes the disklabel( and boot code)?$")  #Phrase hard-coding matches disktype unix.c.
+rx_partition_invalid_signature            = LazyPattern(br"^Partition (?P<partition_index>.+): invalid signature, skipping$")
+rx_partition_map                          = LazyPattern(br"^(?P<pstype_str>.+) partition map.*$")
+rx_partition_meta_no_size_summary         = LazyPattern(br"^Partition (?P<partition_index>[^:\n]+):[^(\n]*?(?<!\d)(?P<partition_size_unitless>\d+) (?P<partition_size_unit>[^ (\n]+) \((?P<num_blocks_distance>\d+) (?P<block_unit>(sectors|clusters)) from (?P<from>\d+)(?P<bootable>(, bootable)?)\)")
+rx_partition_meta_size_summary            = LazyPattern(br"^Partition (?P<partition_index>[^:\n]+):[^(\n]+\((?P<partition_size_unitless>\d+) (?P<partition_size_unit>[^,\n]+), (?P<num_blocks_distance>\d+) (?P<block_unit>(sectors|clusters)) from (?P<from>\d+)(?P<bootable>(, bootable)?)\)")
+rx_partition_name                         = LazyPattern(br"^Partition Name \"(?P<partition_name>.+)\"$", re.DOTALL)
+rx_partition_ptype_and_ptype_str          = LazyPattern(br"^Type (?P<ptype>(0x[0-9A-Fa-f]{2}|\d+)) \((?P<ptype_label>.+)\)$")
+rx_partition_ptype_int                    = LazyPattern(br"^Type (?P<ptype_label>\d+)$")
+rx_partition_ptype_str                    = LazyPattern(br"^Type \"(?P<ptype_label>.+)\"$")
+rx_partition_ptype_str_and_guid           = LazyPattern(br"^Type (?P<ptype_label>.+) \(GUID (?P<guid>[-0-9A-F]+)\)$")
+rx_partition_ptype_str_ftype_str_and_guid = LazyPattern(br"^Type (?=.*\) \(GUID [-0-9A-F]+\)$)(?P<ptype_label>.+) \((?P<ftype_str>.+)\) \(GUID (?P<guid>[-0-9A-F]+)\)$")
+rx_partition_unused                       = LazyPattern(br"^Partition (?P<partition_index>.+): unused$")
+rx_platform_system_type                   = LazyPattern(br"^Platform (?=.*\)$)(?P<platform_encoded>[^ \n]+) \((?P<platform_decoded>.+)\), System Type (?P<system_type_encoded>[^ \n]+) \((?P<system_type_decoded>.+)\)$")
+rx_preparer                               = LazyPattern(br"^Preparer +\"(?P<preparer>.+)\"$")
+rx_primary_volume_descriptor_missing      = LazyPattern(br"^Primary Volume Descriptor missing$")
+rx_publisher                              = LazyPattern(br"^Publisher +\"(?P<publisher>.+)\"$")
+rx_sector_size                            = LazyPattern(br"^(Unusual s|S)ector size (?P<sector_size>\d+) bytes$")
+rx_signature_missing                      = LazyPattern(br"^Signature missing( in sector (?P<sector>\d+))?$")
+rx_solaris_sparc_disklabel                = LazyPattern(br"^Solaris SPARC disklabel$")
+rx_solaris_x86_disklabel                  = LazyPattern(br"^Solaris x86 disklabel, version (?P<version>.+), (?P<partition_count>\d+) partitions$")
+rx_tar_archive                            = LazyPattern(br"^(GNU|Pre-POSIX) tar archive$")
+rx_udf_recognition_sequence_missingloc    = LazyPattern(br"^UDF recognition sequence, unable to locate anchor descriptor$")
+rx_udf_version                            = LazyPattern(br"^UDF version (?P<version>.+)$")
+rx_validation_entry_missing               = LazyPattern(br"^Validation entry missing$")
+rx_volume_name                            = LazyPattern(br"^Volume name \"(?P<volume_name>.*)\"(?P<misc>.*)$", re.DOTALL)
+rx_volume_size_blocks_or_sectors          = LazyPattern(br"^Volume size(?=.*\)$).+ \((?P<num_bytes>\d+) bytes, (?P<num_blocks>\d+) (?P<block_unit>blocks|sectors).*\)$")
+rx_volume_size_clusters                   = LazyPattern(br"^Volume size(?=.*\)$).+ \((?P<num_bytes>\d+) bytes, (?P<num_clusters>\d+) clusters of (?P<bytes_per_cluster_unitless>\d+) (?P<bytes_per_cluster_unit>.+)\)$")
+rx_volume_size_clusters_no_summary        = LazyPattern(br"^Volume size(?=.*\)$).+ \((?P<num_clusters>\d+) clusters of (?P<bytes_per_cluster_unitless>\d+) (?P<bytes_per_cluster_unit>.+)\)$")
+
+rx_shard_file_name                        = LazyPattern(r"shard-\d{6,}\.dfxml")
+
+#Matches, in a whole disktype output, a blank line followed by the start of an input file's section.  The blank line's predecessor can't end with '\r\n', which would make the blank line part of a broken line (see Parser.parse_line()).
+rx_section_boundary                       = LazyPattern(br"(?<!\r)\n[ \t\x0b\x0c]*\n(?=--- )")
+
+class LineKind(enum.Enum):
+    """Kinds of disktype output lines.  Each member names a Parser line handler, "_handle_" plus the lowercased member name."""
+    ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR    =  1
+    APPLICATION                             =  2
+    BAR_ARCHIVE                             =  3
+    BLANK_CHECK                             =  4
+    BLANK_MEDIUM                            =  5
+    BOOT_LOADER                             =  6
+    BOOT_RECORD                             =  7
+    BOOTABLE_FLOPPY_IMAGE                   =  8
+    BOOTABLE_HARD_DISK_IMAGE                =  9
+    BOOTABLE_NONEMULATED_IMAGE              = 10
+    BSD_DISKLABEL                           = 11
+    COMPRESS                                = 12
+    CPIO_ARCHIVE                            = 13
+    DATA_SIZE                               = 14
+    DESCRIPTOR_TYPE                         = 15
+    DISK_GUID                               = 16
+    DISK_META                               = 17
+    DISK_SIZE                               = 18
+    FILE_SYSTEM_UUID                        = 19
+    FS_TYPE_STR                             = 20
+    GZIP                                    = 21
+    INPUT_FILE                              = 22
+    HFS_WRAPPER                             = 23
+    ISO9660_EXTENSION                       = 24
+    LAST_MOUNTED                            = 25
+    NO_TYPE_AND_CREATOR_CODE                = 26
+    PARTITION_GUID                          = 27
+    PARTITION_INCLUDES                      = 28
+    PARTITION_INVALID_SIGNATURE             = 29
+    PARTITION_MAP                           = 30
+    PARTITION_META                          = 31
+    PARTITION_NAME                          = 32
+    PARTITION_PTYPE_INT                     = 33
+    PARTITION_PTYPE_STR                     = 34
+    PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID  = 35
+    PARTITION_PTYPE_STR_AND_GUID            = 36
+    PARTITION_PTYPE_AND_PTYPE_STR           = 37
+    PARTITION_UNUSED                        = 38
+    PLATFORM_SYSTEM_TYPE                    = 39
+    PREPARER                                = 40
+    PRIMARY_VOLUME_DESCRIPTOR_MISSING       = 41
+    PUBLISHER                               = 42
+    SECTOR_SIZE                             = 43
+    SIGNATURE_MISSING                       = 44
+    SOLARIS_DISKLABEL                       = 45
+    TAR_ARCHIVE                             = 46
+    UDF_RECOGNITION_SEQUENCE_MISSINGLOC     = 47
+    UDF_VERSION                             = 48
+    VALIDATION_ENTRY_MISSING                = 49
+    VOLUME_NAME                             = 50
+    VOLUME_SIZE_BLOCKS_OR_SECTORS           = 51
+    VOLUME_SIZE_CLUSTERS                    = 52
+
+#Line kinds, with the regexen that recognize them and the leading tokens (cleaned-line text before the first space) that can start a matching line.  A leading-token entry of None means the line starts with free-form text, so the kind is a candidate for every line.
+#This list is in precedence order.  Several expressions can match the same line through free-form text (e.g. a volume name mentioning "file system"), and the first kind listed wins.  Within a kind, regexen are also tried in order.
+line_kind_patterns = [
+  (LineKind.ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR,   [rx_additional_primary_volume_descriptor], [b"Additional"]),
+  (LineKind.APPLICATION,                            [rx_application], [b"Application"]),
+  (LineKind.BAR_ARCHIVE,                            [rx_bar_archive], [b"bar"]),
+  (LineKind.BLANK_CHECK,                            [rx_blank_check], [b"First"]),
+  (LineKind.BLANK_MEDIUM,                           [rx_blank_medium], [b"Blank"]),
+  (LineKind.BOOT_LOADER,                            [rx_boot_loader], [b"BeOS", b"FreeBSD", b"GRUB", b"ISOLINUX", b"LILO", b"SYSLINUX", b"Windows"]),
+  (LineKind.BOOT_RECORD,                            [rx_boot_record, rx_boot_record_unknown_format], None),
+  (LineKind.BOOTABLE_FLOPPY_IMAGE,                  [rx_bootable_floppy_image], [b"Bootable"]),
+  (LineKind.BOOTABLE_HARD_DISK_IMAGE,               [rx_bootable_hard_disk_image], [b"Bootable"]),
+  (LineKind.BOOTABLE_NONEMULATED_IMAGE,             [rx_bootable_nonemulated_image, rx_bootable_nonemulated_image_summary], [b"Bootable"]),
+  (LineKind.BSD_DISKLABEL,                          [rx_bsd_disklabel], [b"BSD"]),
+  (LineKind.COMPRESS,                               [rx_compress], [b"compress-compressed"]),
+  (LineKind.CPIO_ARCHIVE,                           [rx_cpio_archive], [b"cpio"]),
+  (LineKind.DATA_SIZE,                              [rx_data_size, rx_data_size_no_comma], [b"Data"]),
+  (LineKind.DESCRIPTOR_TYPE,                        [rx_descriptor_type], [b"Descriptor"]),
+  (LineKind.DISK_GUID,                              [rx_disk_guid], [b"Disk"]),
+  (LineKind.DISK_META,                              [rx_disk_meta], [b"Regular"]),
+  (LineKind.DISK_SIZE,                              [rx_disk_size], [b"Disk"]),
+  (LineKind.FILE_SYSTEM_UUID,                       [rx_file_system_uuid], [b"UUID"]),
+  (LineKind.FS_TYPE_STR,                            [rx_fs_type_str], None),
+  (LineKind.GZIP,                                   [rx_gzip], [b"gzip-compressed"]),
+  (LineKind.INPUT_FILE,                             [rx_input_file], [b"---"]),
+  (LineKind.HFS_WRAPPER,                            [rx_hfs_wrapper], [b"HFS"]),
+  (LineKind.ISO9660_EXTENSION,                      [rx_iso9660_extension], None),
+  (LineKind.LAST_MOUNTED,                           [rx_last_mounted], [b"Last"]),
+  (LineKind.NO_TYPE_AND_CREATOR_CODE,               [rx_no_type_and_creator_code], [b"No"]),
+  (LineKind.PARTITION_GUID,                         [rx_partition_guid], [b"Partition"]),
+  (LineKind.PARTITION_INCLUDES,                     [rx_partition_includes], [b"Includes"]),
+  (LineKind.PARTITION_INVALID_SIGNATURE,            [rx_partition_invalid_signature], [b"Partition"]),
+  (LineKind.PARTITION_MAP,                          [rx_partition_map], None),
+  (LineKind.PARTITION_META,                         [rx_partition_meta_no_size_summary, rx_partition_meta_size_summary], [b"Partition"]),
+  (LineKind.PARTITION_NAME,                         [rx_partition_name], [b"Partition"]),
+  (LineKind.PARTITION_PTYPE_INT,                    [rx_partition_ptype_int], [b"Type"]),
+  (LineKind.PARTITION_PTYPE_STR,                    [rx_partition_ptype_str], [b"Type"]),
+  (LineKind.PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID, [rx_partition_ptype_str_ftype_str_and_guid], [b"Type"]),
+  (LineKind.PARTITION_PTYPE_STR_AND_GUID,           [rx_partition_ptype_str_and_guid], [b"Type"]),
+  (LineKind.PARTITION_PTYPE_AND_PTYPE_STR,          [rx_partition_ptype_and_ptype_str], [b"Type"]),
+  (LineKind.PARTITION_UNUSED,                       [rx_partition_unused], [b"Partition"]),
+  (LineKind.PLATFORM_SYSTEM_TYPE,                   [rx_platform_system_type], [b"Platform"]),
+  (LineKind.PREPARER,                               [rx_preparer], [b"Preparer"]),
+  (LineKind.PRIMARY_VOLUME_DESCRIPTOR_MISSING,      [rx_primary_volume_descriptor_missing], [b"Primary"]),
+  (LineKind.PUBLISHER,                              [rx_publisher], [b"Publisher"]),
+  (LineKind.SECTOR_SIZE,                            [rx_sector_size], [b"Sector", b"Unusual"]),
+  (LineKind.SIGNATURE_MISSING,                      [rx_signature_missing], [b"Signature"]),
+  (LineKind.SOLARIS_DISKLABEL,                      [rx_solaris_sparc_disklabel, rx_solaris_x86_disklabel], [b"Solaris"]),
+  (LineKind.TAR_ARCHIVE,                            [rx_tar_archive], [b"GNU", b"Pre-POSIX"]),
+  (LineKind.UDF_RECOGNITION_SEQUENCE_MISSINGLOC,    [rx_udf_recognition_sequence_missingloc], [b"UDF"]),
+  (LineKind.UDF_VERSION,                            [rx_udf_version], [b"UDF"]),
+  (LineKind.VALIDATION_ENTRY_MISSING,               [rx_validation_entry_missing], [b"Validation"]),
+  (LineKind.VOLUME_NAME,                            [rx_volume_name], [b"Volume"]),
+  (LineKind.VOLUME_SIZE_BLOCKS_OR_SECTORS,          [rx_volume_size_blocks_or_sectors], [b"Volume"]),
+  (LineKind.VOLUME_SIZE_CLUSTERS,                   [rx_volume_size_clusters, rx_volume_size_clusters_no_summary], [b"Volume"])
+]
+
+#The parsing states each line kind's handler transitions into first.  A line kind can only follow a state that allows one of these transitions.  None means the handler may pop levels before its first transition, so the kind can follow any state.
+line_kind_entry_states = {
+  LineKind.ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR:    {ParseState.ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR},
+  LineKind.APPLICATION:                             {ParseState.APPLICATION},
+  LineKind.BAR_ARCHIVE:                             {ParseState.BAR_ARCHIVE},
+  LineKind.BLANK_CHECK:                             {ParseState.BLANK_CHECK},
+  LineKind.BLANK_MEDIUM:                            {ParseState.BLANK_MEDIUM},
+  LineKind.BOOT_LOADER:                             {ParseState.BOOT_LOADER},
+  LineKind.BOOT_RECORD:                             {ParseState._EL_TORITO_START, ParseState.BOOT_RECORD},
+  LineKind.BOOTABLE_FLOPPY_IMAGE:                   {ParseState._DISK_START},
+  LineKind.BOOTABLE_HARD_DISK_IMAGE:                {ParseState._DISK_START},
+  LineKind.BOOTABLE_NONEMULATED_IMAGE:              {ParseState._DISK_START},
+  LineKind.BSD_DISKLABEL:                           {ParseState._PARTITION_SYSTEM_START},
+  LineKind.COMPRESS:                                {ParseState._COMPRESSION_START},
+  LineKind.CPIO_ARCHIVE:                            {ParseState.CPIO_ARCHIVE},
+  LineKind.DATA_SIZE:                               {ParseState.DATA_SIZE},
+  LineKind.DESCRIPTOR_TYPE:                         {ParseState.DESCRIPTOR_TYPE},
+  LineKind.DISK_GUID:                               {ParseState.DISK_GUID},
+  LineKind.DISK_META:                               {ParseState.DISK_META},
+  LineKind.DISK_SIZE:                               {ParseState.DISK_SIZE},
+  LineKind.FILE_SYSTEM_UUID:                        {ParseState.FILE_SYSTEM_UUID},
+  LineKind.FS_TYPE_STR:                             None,
+  LineKind.GZIP:                                    {ParseState._COMPRESSION_START},
+  LineKind.INPUT_FILE:                              {ParseState._DISK_START},
+  LineKind.HFS_WRAPPER:                             {ParseState.HFS_WRAPPER},
+  LineKind.ISO9660_EXTENSION:                       {ParseState.ISO9660_EXTENSION},
+  LineKind.LAST_MOUNTED:                            {ParseState.LAST_MOUNTED},
+  LineKind.NO_TYPE_AND_CREATOR_CODE:                {ParseState.NO_TYPE_AND_CREATOR_CODE},
+  LineKind.PARTITION_GUID:                          {ParseState.PARTITION_GUID},
+  LineKind.PARTITION_INCLUDES:                      {ParseState.PARTITION_INCLUDES},
+  LineKind.PARTITION_INVALID_SIGNATURE:             {ParseState._PARTITION_START},
+  LineKind.PARTITION_MAP:                           None,
+  LineKind.PARTITION_META:                          {ParseState._PARTITION_START},
+  LineKind.PARTITION_NAME:                          {ParseState.PARTITION_NAME},
+  LineKind.PARTITION_PTYPE_INT:                     {ParseState.PARTITION_PTYPE_INT},
+  LineKind.PARTITION_PTYPE_STR:                     {ParseState.PARTITION_PTYPE_STR},
+  LineKind.PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID:  {ParseState.PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID},
+  LineKind.PARTITION_PTYPE_STR_AND_GUID:            {ParseState.PARTITION_PTYPE_STR_AND_GUID},
+  LineKind.PARTITION_PTYPE_AND_PTYPE_STR:           {ParseState.PARTITION_PTYPE_AND_PTYPE_STR},
+  LineKind.PARTITION_UNUSED:                        {ParseState._PARTITION_START},
+  LineKind.PLATFORM_SYSTEM_TYPE:                    {ParseState.PLATFORM_SYSTEM_TYPE},
+  LineKind.PREPARER:                                {ParseState.PREPARER},
+  LineKind.PRIMARY_VOLUME_DESCRIPTOR_MISSING:       {ParseState.PRIMARY_VOLUME_DESCRIPTOR_MISSING},
+  LineKind.PUBLISHER:                               {ParseState.PUBLISHER},
+  LineKind.SECTOR_SIZE:                             {ParseState.SECTOR_SIZE},
+  LineKind.SIGNATURE_MISSING:                       {ParseState.SIGNATURE_MISSING},
+  LineKind.SOLARIS_DISKLABEL:                       {ParseState._PARTITION_SYSTEM_START},
+  LineKind.TAR_ARCHIVE:                             {ParseState.TAR_ARCHIVE},
+  LineKind.UDF_RECOGNITION_SEQUENCE_MISSINGLOC:     None,
+  LineKind.UDF_VERSION:                             {ParseState.UDF_VERSION},
+  LineKind.VALIDATION_ENTRY_MISSING:                {ParseState.VALIDATION_ENTRY_MISSING},
+  LineKind.VOLUME_NAME:                             {ParseState.VOLUME_NAME},
+  LineKind.VOLUME_SIZE_BLOCKS_OR_SECTORS:           {ParseState.VOLUME_SIZE},
+  LineKind.VOLUME_SIZE_CLUSTERS:                    {ParseState.VOLUME_SIZE}
+}
+
+def line_kind_can_follow(kind, state):
+    """Returns True if a line of the given LineKind can legally be handled while in the given ParseState."""
+    entry_states = line_kind_entry_states[kind]
+    if entry_states is None:
+        return True
+    return not entry_states.isdisjoint(state_transitions[state])
+
+#rx_fs_type_str overlaps with other expressions that sometimes contain the free text "file system" without meaning to refer to a file system type.  A line classified as a key kind is instead classified as the first listed kind that also matches it.
+line_kind_overrides = {
+  LineKind.FS_TYPE_STR: [
+    LineKind.PARTITION_PTYPE_AND_PTYPE_STR,
+    LineKind.APPLICATION,
+    LineKind.PUBLISHER,
+    LineKind.VOLUME_NAME
+  ]
+}
+
+#Per leading token, the number of lines each kind's regexen matched in a corpus of disktype outputs, in the order of the kind's regexen.  The None entry counts lines with no leading token listed in line_kind_patterns.  The line classifier tries frequent regexen first, without changing how any line is classified.
+#Generated with: python3 disktype_to_dfxml.py --train-line-kind-frequencies tests/macports tests/ubuntu16.04
+line_kind_frequencies = {
+  b"---": {
+    "INPUT_FILE": [75]
+  },
+  b"Additional": {
+    "ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR": [14]
+  },
+  b"Application": {
+    "APPLICATION": [28]
+  },
+  b"BSD": {
+    "BSD_DISKLABEL": [3]
+  },
+  b"BeOS": {
+    "BOOT_LOADER": [1]
+  },
+  b"Blank": {
+    "BLANK_MEDIUM": [8]
+  },
+  b"Bootable": {
+    "BOOTABLE_FLOPPY_IMAGE": [14],
+    "BOOTABLE_HARD_DISK_IMAGE": [1],
+    "BOOTABLE_NONEMULATED_IMAGE": [7, 1]
+  },
+  b"Data": {
+    "DATA_SIZE": [47, 1]
+  },
+  b"Descriptor": {
+    "DESCRIPTOR_TYPE": [1]
+  },
+  b"Disk": {
+    "DISK_GUID": [1],
+    "DISK_SIZE": [1]
+  },
+  b"First": {
+    "BLANK_CHECK": [7]
+  },
+  b"FreeBSD": {
+    "BOOT_LOADER": [3]
+  },
+  b"GNU": {
+    "TAR_ARCHIVE": [5]
+  },
+  b"GRUB": {
+    "BOOT_LOADER": [1]
+  },
+  b"HFS": {
+    "FS_TYPE_STR": [13],
+    "HFS_WRAPPER": [1]
+  },
+  b"ISOLINUX": {
+    "BOOT_LOADER": [2]
+  },
+  b"Includes": {
+    "PARTITION_INCLUDES": [21]
+  },
+  b"LILO": {
+    "BOOT_LOADER": [2]
+  },
+  b"Last": {
+    "LAST_MOUNTED": [28]
+  },
+  b"No": {
+    "NO_TYPE_AND_CREATOR_CODE": [28]
+  },
+  b"Partition": {
+    "PARTITION_GUID": [2],
+    "PARTITION_INVALID_SIGNATURE": [4],
+    "PARTITION_META": [2, 97],
+    "PARTITION_NAME": [2],
+    "PARTITION_UNUSED": [1]
+  },
+  b"Platform": {
+    "PLATFORM_SYSTEM_TYPE": [23]
+  },
+  b"Pre-POSIX": {
+    "TAR_ARCHIVE": [3]
+  },
+  b"Preparer": {
+    "PREPARER": [19]
+  },
+  b"Primary": {
+    "PRIMARY_VOLUME_DESCRIPTOR_MISSING": [1]
+  },
+  b"Publisher": {
+    "PUBLISHER": [18]
+  },
+  b"Regular": {
+    "DISK_META": [75]
+  },
+  b"SYSLINUX": {
+    "BOOT_LOADER": [1]
+  },
+  b"Sector": {
+    "SECTOR_SIZE": [4]
+  },
+  b"Signature": {
+    "SIGNATURE_MISSING": [2]
+  },
+  b"Solaris": {
+    "SOLARIS_DISKLABEL": [8, 3]
+  },
+  b"Type": {
+    "PARTITION_PTYPE_AND_PTYPE_STR": [24],
+    "PARTITION_PTYPE_INT": [45],
+    "PARTITION_PTYPE_STR": [28],
+    "PARTITION_PTYPE_STR_AND_GUID": [1],
+    "PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID": [1]
+  },
+  b"UDF": {
+    "FS_TYPE_STR": [4],
+    "UDF_RECOGNITION_SEQUENCE_MISSINGLOC": [1],
+    "UDF_VERSION": [3]
+  },
+  b"UUID": {
+    "FILE_SYSTEM_UUID": [4]
+  },
+  b"Unusual": {
+    "SECTOR_SIZE": [2]
+  },
+  b"Validation": {
+    "VALIDATION_ENTRY_MISSING": [1]
+  },
+  b"Volume": {
+    "VOLUME_NAME": [78],
+    "VOLUME_SIZE_BLOCKS_OR_SECTORS": [20],
+    "VOLUME_SIZE_CLUSTERS": [13, 4]
+  },
+  b"Windows": {
+    "BOOT_LOADER": [7]
+  },
+  b"bar": {
+    "BAR_ARCHIVE": [3]
+  },
+  b"compress-compressed": {
+    "COMPRESS": [3]
+  },
+  b"cpio": {
+    "CPIO_ARCHIVE": [2]
+  },
+  b"gzip-compressed": {
+    "GZIP": [5]
+  },
+  None: {
+    "BOOT_RECORD": [24, 1],
+    "FS_TYPE_STR": [102],
+    "ISO9660_EXTENSION": [23],
+    "PARTITION_MAP": [16]
+  }
+}
+
+#Line kinds whose handlers start a partition.
+partition_starting_line_kinds = frozenset([
+  LineKind.PARTITION_INVALID_SIGNATURE,
+  LineKind.PARTITION_META,
+  LineKind.PARTITION_UNUSED
+])
+
+#The result of classifying a line: its LineKind and the match object of the kind's regex, or both None if no kind matches.
+LineClassification = collections.namedtuple("LineClassification", ["kind", "match"])
+UNCLASSIFIED = LineClassification(None, None)
+
+def compiled_regexen(regexen):
+    """Returns a tuple of regexen, with each LazyPattern replaced by its compiled pattern."""
+    return tuple(regex.compiled() if isinstance(regex, LazyPattern) else regex for regex in regexen)
+
+def required_substring(regex):
+    """Returns the longest byte string that any string regex matches must contain, found among the literal characters at the top level of regex's pattern.  Returns b"" if there is none."""
+    if regex.flags & re.IGNORECASE:
+        return b""
+    try:
+        import re._parser as sre_parse
+    except ImportError:
+        #Python < 3.11.
+        import sre_parse
+    longest = b""
+    current = bytearray()
+    #A LITERAL item at the top level of a pattern is never optional or repeated; any other item (group, repeat, branch, anchor) ends a run of literal characters.
+    for (opcode, argument) in list(sre_parse.parse(regex.pattern, regex.flags)) + [(None, None)]:
+        if opcode == sre_parse.LITERAL:
+            current.append(argument)
+            continue
+        if len(current) > len(longest):
+            longest = bytes(current)
+        current = bytearray()
+    return longest
+
+class LineClassifier(object):
+    """
+    Decides the LineKind of a cleaned input line with one dictionary lookup on its leading token, instead of searching every regex in turn.
+
+    The candidates tried for a leading token are the regexen of the kinds listed for that token plus those of the free-form kinds.  If kind_frequencies is given (see line_kind_frequencies), the candidates are tried most frequent first; otherwise, in precedence order.  Either way, the result is the same as trying every kind in precedence order: when a candidate matches, the higher-precedence candidates that frequency ordering placed after it are tried first, skipping any whose required substring (see required_substring()) is absent from the line.
+
+    Given the current ParseState, only the kinds that can legally follow that state are tried.  If none of those match, the full candidate list is tried, so an unexpected line fails the same way it would without pruning.
+
+    Overlapping kinds are then resolved per line_kind_overrides, so line handlers get the final kind.
+    """
+
+    def __init__(self, kind_patterns, kind_overrides=None, kind_frequencies=None):
+        if kind_overrides is None:
+            kind_overrides = dict()
+        if kind_frequencies is None:
+            kind_frequencies = dict()
+        self._kind_frequencies = kind_frequencies
+        (self._free_form_candidates, self._candidates_by_token) = self._build_dispatch(kind_patterns)
+
+        #Members and types: LineKind -> [(overriding LineKind, regexen)], in override order.
+        regexen_by_kind = {kind: compiled_regexen(regexen) for (kind, regexen, leading_tokens) in kind_patterns}
+        #Members and types: (LineKind, regex) -> index of the regex within the kind's regexen.
+        self._regex_indexes = {(kind, regex): regex_index for (kind, regexen) in regexen_by_kind.items() for (regex_index, regex) in enumerate(regexen)}
+        self._overrides = {kind: [(override_kind, regexen_by_kind[override_kind]) for override_kind in override_kinds] for (kind, override_kinds) in kind_overrides.items()}
+
+        #Members and types: ParseState -> (free-form candidates, leading token -> candidates), pruned to the kinds that can follow the state.
+        self._dispatch_by_state = dict()
+        for state in ParseState:
+            pruned_kind_patterns = [kind_pattern for kind_pattern in kind_patterns if line_kind_can_follow(kind_pattern[0], state)]
+            self._dispatch_by_state[state] = self._build_dispatch(pruned_kind_patterns)
+
+    def _build_dispatch(self, kind_patterns):
+        #Candidates are first collected in precedence order, as (LineKind, regex index within the kind, regex).
+        free_form_units = []
+        units_by_token = dict()
+        for (kind, regexen, leading_tokens) in kind_patterns:
+            units = [(kind, regex_index, regex) for (regex_index, regex) in enumerate(compiled_regexen(regexen))]
+            if leading_tokens is None:
+                free_form_units.extend(units)
+                for token_units in units_by_token.values():
+                    token_units.extend(units)
+            else:
+                for leading_token in leading_tokens:
+                    if not leading_token in units_by_token:
+                        units_by_token[leading_token] = list(free_form_units)
+                    units_by_token[leading_token].extend(units)
+        free_form_candidates = self._ordered_candidates(free_form_units, None)
+        candidates_by_token = {leading_token: self._ordered_candidates(token_units, leading_token) for (leading_token, token_units) in units_by_token.items()}
+        return (free_form_candidates, candidates_by_token)
+
+    def _ordered_candidates(self, units, leading_token):
+        """Returns units, a list of (LineKind, regex index, regex) in precedence order, as a tuple of (LineKind, regex, bypassed) candidates, most frequent first for leading_token.  bypassed lists (required substring, LineKind, regex) for each unit of higher precedence that is tried after the candidate, in precedence order."""
+        token_frequencies = self._kind_frequencies.get(leading_token, dict())
+        def _frequency(unit_position):
+            (kind, regex_index, regex) = units[unit_position]
+            regex_frequencies = token_frequencies.get(kind.name, ())
+            return regex_frequencies[regex_index] if regex_index < len(regex_frequencies) else 0
+        #Sorting is stable, so candidates of equal frequency stay in precedence order.
+        tried_positions = sorted(range(len(units)), key=_frequency, reverse=True)
+        candidates = []
+        for (tried_index, unit_position) in enumerate(tried_positions):
+            tried_later = set(tried_positions[tried_index+1:])
+            bypassed = tuple((required_substring(units[position][2]), units[position][0], units[position][2]) for position in range(unit_position) if position in tried_later)
+            (kind, regex_index, regex) = units[unit_position]
+            candidates.append((kind, regex, bypassed))
+        return tuple(candidates)
+
+    def candidates(self, cleaned_line, state=None):
+        """Returns the (LineKind, regex, bypassed) candidates that could match cleaned_line, in the order they are tried (see _ordered_candidates()).  If state is given, only kinds that can follow it are returned."""
+        leading_token = cleaned_line.split(b" ", 1)[0]
+        if state is None:
+            return self._candidates_by_token.get(leading_token, self._free_form_candidates)
+        (free_form_candidates, candidates_by_token) = self._dispatch_by_state[state]
+        return candidates_by_token.get(leading_token, free_form_candidates)
+
+    def classify(self, cleaned_line, state=None):
+        """Returns a LineClassification for the first matching kind in precedence order, after overrides, or UNCLASSIFIED if no kind matches.  If state is given, kinds that cannot follow it are tried only if no other kind matches."""
+        for (kind, regex, bypassed) in self.candidates(cleaned_line, state):
+            maybe_match = regex.search(cleaned_line)
+            if maybe_match is None:
+                continue
+            for (substring, bypassed_kind, bypassed_regex) in bypassed:
+                if not substring in cleaned_line:
+                    continue
+                bypassed_match = bypassed_regex.search(cleaned_line)
+                if not bypassed_match is None:
+                    (kind, maybe_match) = (bypassed_kind, bypassed_match)
+                    break
+            return self._override(LineClassification(kind, maybe_match), cleaned_line)
+        if not state is None:
+            return self.classify(cleaned_line)
+        return UNCLASSIFIED
+
+    def _override(self, classification, cleaned_line):
+        for (override_kind, regexen) in self._overrides.get(classification.kind, ()):
+            for regex in regexen:
+                maybe_match = regex.search(cleaned_line)
+                if not maybe_match is None:
+                    return LineClassification(override_kind, maybe_match)
+        return classification
+
+    def regex_index(self, classification):
+        """Returns the index, within its kind's regexen, of the regex whose match made classification."""
+        return self._regex_indexes[(classification.kind, classification.match.re)]
+
+_line_classifier = None
+
+def get_line_classifier():
+    """Returns the LineClassifier for line_kind_patterns, line_kind_overrides and line_kind_frequencies, building it, and so compiling the patterns, on first call."""
+    global _line_classifier
+    if _line_classifier is None:
+        _line_classifier = LineClassifier(line_kind_patterns, line_kind_overrides, line_kind_frequencies)
+    return _line_classifier
+
+def train_line_kind_frequencies(in_paths):
+    """Returns line kind frequencies in the form of line_kind_frequencies, counted by classifying each line of the disktype outputs at in_paths, without state pruning.  Line fragments that classify as nothing (such as parts of free text broken by a \\r\\n) are not counted."""
+    line_classifier = get_line_classifier()
+    regex_counts = {kind: len(regexen) for (kind, regexen, leading_tokens) in line_kind_patterns}
+    kind_frequencies = dict()
+    for in_path in in_paths:
+        with open(in_path, "rb") as in_fh:
+            for line in in_fh:
+                cleaned_line = line.strip()
+                if cleaned_line == b"":
+                    continue
+                classification = line_classifier.classify(cleaned_line)
+                if classification.kind is None:
+                    continue
+                leading_token = cleaned_line.split(b" ", 1)[0]
+                if not leading_token in line_classifier._candidates_by_token:
+                    leading_token = None
+                regex_frequencies = kind_frequencies.setdefault(leading_token, dict()).setdefault(classification.kind.name, [0] * regex_counts[classification.kind])
+                regex_frequencies[line_classifier.regex_index(classification)] += 1
+    return kind_frequencies
+
+def format_line_kind_frequencies(kind_frequencies):
+    """Returns kind_frequencies as the Python source of the line_kind_frequencies table."""
+    token_sources = []
+    for leading_token in sorted(kind_frequencies, key=lambda leading_token: (leading_token is None, leading_token or b"")):
+        kind_sources = ["    \"%s\": %r" % (kind_name, regex_frequencies) for (kind_name, regex_frequencies) in sorted(kind_frequencies[leading_token].items())]
+        token_source = "None" if leading_token is None else "b\"%s\"" % leading_token.decode("ascii")
+        token_sources.append("  %s: {\n%s\n  }" % (token_source, ",\n".join(kind_sources)))
+    return "line_kind_frequencies = {\n%s\n}\n" % ",\n".join(token_sources)
+
+#Members and types of a Parser context stack entry, describing one object stack entry: the nearest DiskImageObject, PartitionSystemObject, PartitionObject and Objects.VolumeObject at or below that entry (each None if there is none); and the nearest byte run (ByteExtent or Objects.ByteRun) strictly below that entry with both img_offset and len defined.
+ParseContext = collections.namedtuple("ParseContext", ["disk_image", "partition_system", "partition", "volume", "container_byte_run"])
+EMPTY_PARSE_CONTEXT = ParseContext(None, None, None, None, None)
+
+def make_dfxml_object(argv):
+    """Returns an empty DFXMLObject recording this script, with command line argv, as its creator."""
+    dobj = Objects.DFXMLObject(version="1.1.1")
+    dobj.program = os.path.basename(argv[0])
+    dobj.program_version = __version__
+    dobj.command_line = " ".join(argv)
+    dobj.add_creator_library("Python", ".".join(map(str, sys.version_info[0:3]))) #A bit of a bend, but gets the major version information out.
+    dobj.add_creator_library("Objects.py", Objects.__version__)
+    dobj.add_creator_library("dfxml.py", Objects.dfxml.__version__)
+    dobj.add_namespace("dfxmlext", XMLNS_DFXML_EXT)
+    return dobj
 
 class Parser(object):
-    def __init__(self):
-        """State variables are initialized at the top of the parse() method."""
-        pass
+    def __init__(self, volume_callback=None, argv=None):
+        """
+        State variables are initialized at the top of the parse() method.
+
+        If volume_callback is given, it is called as volume_callback(dobj, vobj) with each top-level VolumeObject as soon as its file system level closes, and the volume is not appended to the DFXMLObject that parse() returns.
+
+        argv is the command line recorded as the DFXML's creator, defaulting to sys.argv.  A server converting on behalf of a client records the client's.
+        """
+        self._volume_callback = volume_callback
+        self._argv = sys.argv if argv is None else argv
+        self._line_classifier = get_line_classifier()
+        self._parsing = False
+        if not active_profile is None:
+            active_profile.instrument(self)
+        self._line_handlers = {kind: getattr(self, "_handle_" + kind.name.lower()) for kind in LineKind}
 
     def debug_level_stack(self):
+        if not _logger.isEnabledFor(logging.DEBUG):
+            return
         for (stack_level, level) in enumerate(self._level_stack):
-            _logger.debug("self._level_stack[%d] = %s." % (stack_level, level))
+            _logger.debug("self._level_stack[%d] = %s.", stack_level, level)
 
     def debug_object_stack(self):
+        if not _logger.isEnabledFor(logging.DEBUG):
+            return
         for (stack_level, obj) in enumerate(self._object_stack):
-            _logger.debug("self._object_stack[%d] = %s." % (stack_level, obj))
+            _logger.debug("self._object_stack[%d] = %s.", stack_level, obj)
 
     def derive_volume_byte_run(self, vobj, num_bytes):
         """This code is repeated between FS_TYPE_STR, DATA_SIZE, VOLUME_SIZE state actions."""
@@ -626,15 +1266,39 @@ class Parser(object):
 
     def get_container_byte_run(self):
         """
-        Returns the byte run closest to the top of the object stack that has both img_offset and len defined.
+        Returns the byte run closest to the top of the object stack, excluding the top object, that has both img_offset and len defined; or None if there is none.
         """
-        #cobj - containing object
-        cbr = None #Containing object's byte run
-        for cobj in reversed(self._object_stack[:-1]):
-            cbr = cobj.byte_runs[0]
-            if not None in (cbr.img_offset, cbr.len):
-                break
-        return cbr
+        return self._context_stack[-1].container_byte_run
+
+    def push_object(self, obj):
+        """Pushes obj onto the object stack, and pushes its ParseContext, derived from the context of its container, onto the context stack."""
+        if len(self._object_stack) == 0:
+            context = EMPTY_PARSE_CONTEXT
+        else:
+            context = self._context_stack[-1]
+            #Byte runs are only updated while their object is at the top of the stack, so the container's byte run is final now.
+            cobj = self._object_stack[-1]
+            if isinstance(cobj, Objects.VolumeObject):
+                cbr = cobj.byte_runs[0]
+            else:
+                cbr = getattr(cobj, "byte_run", None)
+            if not cbr is None and not None in (cbr.img_offset, cbr.len):
+                context = context._replace(container_byte_run=cbr)
+        if isinstance(obj, DiskImageObject):
+            context = context._replace(disk_image=obj)
+        elif isinstance(obj, PartitionSystemObject):
+            context = context._replace(partition_system=obj)
+        elif isinstance(obj, PartitionObject):
+            context = context._replace(partition=obj)
+        elif isinstance(obj, Objects.VolumeObject):
+            context = context._replace(volume=obj)
+        self._object_stack.append(obj)
+        self._context_stack.append(context)
+
+    def pop_object(self):
+        """Pops and returns the top of the object stack, with its context."""
+        self._context_stack.pop()
+        return self._object_stack.pop()
 
     def get_image_size(self):
         """Returns size of entire input disk image (not any nested disk image) from object stack."""
@@ -647,734 +1311,670 @@ class Parser(object):
             _logger.debug("get_image_size: type(self._object_stack[1]) == %r." % type(self._object_stack[1]))
             raise ValueError("self._object_stack[1] is not a DiskImageObject.")
         diobj = self._object_stack[1]
-        if len(diobj.byte_runs) > 0:
-            image_size = diobj.byte_runs[0].len
+        image_size = diobj.byte_run.len
         if image_size is None:
-            _logger.debug("get_image_size: diobj.byte_runs[0] == %r." % diobj.byte_runs[0])
+            _logger.debug("get_image_size: diobj.byte_run == %r." % (diobj.byte_run,))
         return image_size
 
-    def parse(self, fh):
+    def begin_parse(self, line_no=0):
+        """Resets the parser to take a new stream of disktype output, as lines via parse_line() or as chunks via feed().  line_no is the number of lines preceding the stream, for line numbers in error messages when the stream is a section of a larger input."""
+        #Debug tracing formats every object on the stack, which costs time proportional to the stack's contents on every line.  Check once per parse whether anybody is listening.
+        self._debug = _logger.isEnabledFor(logging.DEBUG)
+
         self._state = ParseState._INPUT_START
-        self._line_no = None  #1-based counter.  (Defining: line 0 is before beginning of file.)
+        self._line_no = line_no  #1-based counter.  (Defining: line 0 is before beginning of file.)
         self._last_indentation = None
         self._current_indentation = None
 
         #The object stack is an object stack of DFXML Objects with .append() methods, and potential DFXML Objects defined in this script.
         self._object_stack = []
 
+        #The context stack is parallel to the object stack, so the nearest containers of each type are known without scanning the object stack.  Push and pop objects with push_object() and pop_object() to keep the two in step.
+        #Members and types: ParseContext
+        self._context_stack = []
+
         #The level stack is a (nearly-)parallel list to the object stack.  It's necessary for now because DFXML doesn't have elements for partition systems, partitions, or other "parsing levels" (indentation levels) illustrated in disktype output.
         #The level stack is also necessary because indentation level needs to be tracked for the various encountered states.
         #Members and types: ParseState; indentation count (int or NoneType); line number (int)
         self._level_stack = [(ParseState._INPUT_START, None, 0)]
 
-        dobj = Objects.DFXMLObject(version="1.1.1")
-        dobj.program = os.path.basename(sys.argv[0])
-        dobj.program_version = __version__
-        dobj.command_line = " ".join(sys.argv)
-        dobj.add_creator_library("Python", ".".join(map(str, sys.version_info[0:3]))) #A bit of a bend, but gets the major version information out.
-        dobj.add_creator_library("Objects.py", Objects.__version__)
-        dobj.add_creator_library("dfxml.py", Objects.dfxml.__version__)
-        dobj.add_namespace("dfxmlext", XMLNS_DFXML_EXT)
-        self._object_stack.append(dobj)
-
-        #Some of the parsing expressions can match at multiple points, due to free-form text (usually in name fields).  Handle those cases with "_handle_foo" subroutines here.
-        def _handle_application(maybe_match):
-            self.transition(ParseState.APPLICATION)
-            #Nop.  Information not recorded in DFXML.
-
-        def _handle_partition_ptype_and_ptype_str(maybe_match):
-            self.transition(ParseState.PARTITION_PTYPE_AND_PTYPE_STR)
-            ptype = maybe_match.group("ptype").decode("utf-8")
-            if ptype.startswith("0x"):
-                self._object_stack[-1].ptype = int(ptype, base=16)
-            else:
-                self._object_stack[-1].ptype = int(ptype)
-            self._object_stack[-1].ptype_str = maybe_match.group("ptype_label").decode("utf-8")
+        self.push_object(make_dfxml_object(self._argv))
 
-        def _handle_publisher(maybe_match):
-            self.transition(ParseState.PUBLISHER)
-            #Nop.  Information not recorded in DFXML.
+        #Pieces of a line broken by embedded '\r\n's, joined once the line is complete so reassembly is linear in the line's length.
+        self._line_parts = []
 
-        def _handle_volume_name(maybe_match):
-            self.transition(ParseState.VOLUME_NAME)
-            #Nop.  Information not recorded in DFXML.
+        #Pieces of a physical line split across feed() calls, joined once its line ending arrives.
+        self._feed_parts = []
 
-        #It is possible for input lines to be broken up by free text containing line break characters.  So far, one case had an application name ending '\r\n' (NSRL sample 12636-1).  Reassemble in that case.
-        def _iter_fh_cleaned_lines():
-            line_buffer = b""
-            for line in fh:
-                _logger.debug("Parsing: %r." % line)
-                line_buffer += line
-                if len(line) > 1 and line[-2:] == b"\r\n":
-                    _logger.debug("Buffering line with embedded '\\r\\n'.")
-                    continue
-                yield line_buffer
-                line_buffer = b""
+        self._parsing = True
 
-        #Consume the input file handle lines.
-        for (line_no, line) in enumerate(_iter_fh_cleaned_lines()):
-            self._line_no = line_no+1
+    def parse_line(self, line):
+        """Consumes one line of disktype output, as a byte string including its line ending."""
+        if self._debug:
+            _logger.debug("Parsing: %r.", line)
 
+        #It is possible for input lines to be broken up by free text containing line break characters.  So far, one case had an application name ending '\r\n' (NSRL sample 12636-1).  Reassemble in that case.
+        if len(line) > 1 and line[-2:] == b"\r\n":
+            if self._debug:
+                _logger.debug("Buffering line with embedded '\\r\\n'.")
+            self._line_parts.append(line)
+            return
+        if len(self._line_parts) > 0:
+            self._line_parts.append(line)
+            line = b"".join(self._line_parts)
+            self._line_parts = []
+        self._line_no += 1
+
+        if self._debug:
             self.debug_level_stack()
             self.debug_object_stack()
 
-            cleaned_line = line.strip()
-
-            if cleaned_line == b"":
-                #Blank input line is last input line; pop whole stack.
-                _logger.debug("BLANK LINE - popping stack")
-                _logger.debug("self._level_stack = %r." % self._level_stack)
-                while self._level_stack[-1][0] != ParseState._INPUT_START:
-                    self.pop_level()
-                continue
-
-            #Indentation matters.  Also, in some cases, long trails of whitespace are produced (e.g. 2009-m57-patents-redacted-terry-2009-12-11-002), so we need at least rstrip().  Full strip() is needed for cleaned_line to prevent some abiguities (e.g. rx_partition_ptype*, which starts "Type" matching rx_platform_system_type, which later contains "Type").
-            self._last_indentation = self._current_indentation
-            self._current_indentation = len(line) - len(line.lstrip())
-
-            if not self._last_indentation is None and self._current_indentation < self._last_indentation:
-                _logger.debug("DEINDENT")
-                _logger.debug("  %r -> %r" % (self._last_indentation, self._current_indentation))
-                #GPT metadata lines are indented before partitions are enumerated.  Don't close the partition system (i.e. pop levels) in that case.
-                in_gpt_psobj = None
-                for obj in reversed(self._object_stack):
-                    if isinstance(obj, PartitionSystemObject):
-                        in_gpt_psobj = (obj.pstype_str == "gpt")
-                        break
-                in_gpt_partition_table = in_gpt_psobj and self._level_stack[-1][0] == ParseState._PARTITION_SYSTEM_START
-
-                #There used to be an assumption that a single partition wouldn't contain multiple file systems.  However, HFS Plus was originally implemented with an HFS "wrapper" file system (see e.g. NSRL sample 10002-1.txt).  Treat this as a second, adjacent file system within the partition.
-                #(AJN 2017-06-14: It's more correct to nest the HFS+ volume object in the HFS object, because the HFS wrapper encodes the (arbitrary) offset to the embedded HFS+ volume.  Unfortunately, disktype does not emit that offset.)
-                maybe_match0 = rx_hfs_wrapper.search(cleaned_line)
-                next_line_is_hfs_wrapper = not maybe_match0 is None
-                in_file_system = isinstance(self._object_stack[-1], Objects.VolumeObject)
-
-                #One case (NSRL sample 2332-1) indented the volume name of a partition that also had a Solaris disk label.  The indented line followed the disklabel line, but preceded partition definitions.  Check for this case as another instance to skip level popping.
-                #The test here is to look for *any* transition that would trigger a _PARTITION_START transition.  Unfortunately, at the moment, this is hard-coded as extra transition() calls in the line-consuming loop because there are some "Level-starting" triggering transitions that are based on contents of the regular expression matches (e.g. the El Torito level).  This will likely need fixing after six months away from the code and finding a new implementation-challenging sample.
-                #TODO It may be better to consider these indentations as annotation regions, inducing a Level for annotations.
-                maybe_match0 = rx_partition_invalid_signature.search(cleaned_line) \
-                  or rx_partition_meta_no_size_summary.search(cleaned_line) \
-                  or rx_partition_meta_size_summary.search(cleaned_line) \
-                  or rx_partition_unused.search(cleaned_line)
-                about_to_start_partition = not maybe_match0 is None
-                in_partition_system = isinstance(self._object_stack[-1], PartitionSystemObject)
-
-                #This is the same messy check as for 'about_to_start_partition', except FS_TYPE_STR has the added complication of being able to accidentally match text in free-form text entry fields (e.g. volume names that mention a file system).
-                #(AJN 2017-06-14: The sample that hits this indentation corner case: NSRL 7476-1.  An El Torito floppy image had three objects simultaneously starting at sub-image offset 0: a 512-byte long BSD disklabel (per SleuthKit's mmls); the disklabel's first partition (per Disktype); and a UFS file system with a single file "kernel" (per SleuthKit's fiwalk).  For now, I'm considering this to be nested like normal even with its de-indentation fluke.)
-                maybe_match0 = rx_fs_type_str.search(cleaned_line)
-                maybe_match1 = rx_partition_ptype_and_ptype_str.search(cleaned_line) \
-                  or rx_application.search(cleaned_line) \
-                  or rx_publisher.search(cleaned_line) \
-                  or rx_volume_name.search(cleaned_line)
-                about_to_start_file_system = (not maybe_match0 is None) and (maybe_match1 is None)
-                in_partition = isinstance(self._object_stack[-1], PartitionObject)
-
-                if in_gpt_partition_table:
-                    _logger.debug("In GPT partition table.  Not popping level.")
-                elif next_line_is_hfs_wrapper and in_file_system:
-                    _logger.debug("Encountered wrapped HFS+ file system.  Not popping level.")
-                elif about_to_start_partition and in_partition_system:
-                    _logger.debug("About to start partition while in partition system level.  Not popping level.")
-                elif about_to_start_file_system and in_partition:
-                    _logger.debug("About to start file system partition while in partition.  Not popping level.")
-                else:
-                    #Continue popping, to the topmost level with a matching indentation.
-                    while self._current_indentation < self._level_stack[-1][1]:
-                        self.pop_level()
-                    #After that while loop completes, we've closed inner levels up to the container we actually wanted to close.
-                    self.pop_level()
-                _logger.debug("Done handling deindent effects.")
-
-            maybe_match = rx_additional_primary_volume_descriptor.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR)
-                #Nop.  No further information provided in this pattern.
-                continue
-
-            maybe_match = rx_application.search(cleaned_line)
-            if not maybe_match is None:
-                _handle_application(maybe_match)
-                continue
-
-            maybe_match = rx_bar_archive.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.BAR_ARCHIVE)
-                #Nop.
-                continue
-
-            maybe_match = rx_blank_check.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.BLANK_CHECK)
-                #Nop.
-                continue
-
-            maybe_match = rx_blank_medium.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.BLANK_MEDIUM)
-                #Nop.
-                continue
-
-            maybe_match = rx_boot_loader.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.BOOT_LOADER)
-                #Nop.
-                continue
-
-            maybe_match = rx_boot_record.search(cleaned_line) or rx_boot_record_unknown_format.search(cleaned_line)
-            if not maybe_match is None:
-                if "boot_record_type" in maybe_match.groupdict():
-                    if maybe_match.group("boot_record_type").decode("utf-8") == "El Torito":
-                        self.transition(ParseState._EL_TORITO_START)
-                self.transition(ParseState.BOOT_RECORD)
-                continue
-
-            #This expression only matches on an El Torito boot catalog (see Disktype source, cdrom.c).
-            maybe_match = rx_bootable_floppy_image.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._DISK_START)
-                self.transition(ParseState.BOOTABLE_FLOPPY_IMAGE)
-                diobj = self._object_stack[-1]
-                assert isinstance(diobj, DiskImageObject)
+        cleaned_line = line.strip()
 
-                vobj = self._object_stack[-2]
-                if not isinstance(vobj, Objects.VolumeObject):
-                    raise ValueError("Object stack confusion: Expecting object stack's last two members to be Objects.VolumeObject, DiskImageObject.  Instead they are: %r." % (type(self._object_stack[-2]), type(self._object_stack[-1])))
+        if cleaned_line == b"":
+            #Blank input line is last input line; pop whole stack.
+            _logger.debug("BLANK LINE - popping stack")
+            _logger.debug("self._level_stack = %r.", self._level_stack)
+            while self._level_stack[-1][0] != ParseState._INPUT_START:
+                self.pop_level()
+            #The next line, if any, starts a new input file at the top level.  Don't treat it as a deindent.
+            self._current_indentation = None
+            return
+
+        #Indentation matters.  Also, in some cases, long trails of whitespace are produced (e.g. 2009-m57-patents-redacted-terry-2009-12-11-002), so we need at least rstrip().  Full strip() is needed for cleaned_line to prevent some abiguities (e.g. rx_partition_ptype*, which starts "Type" matching rx_platform_system_type, which later contains "Type").
+        self._last_indentation = self._current_indentation
+        self._current_indentation = len(line) - len(line.lstrip())
+
+        #Classify the line once, for both the deindent decision and the line handler.  A deindent pops levels, changing the parsing state, so a deindented line is classified without pruning by state.
+        deindented = not self._last_indentation is None and self._current_indentation < self._last_indentation
+        if deindented:
+            classification = self._line_classifier.classify(cleaned_line)
+        else:
+            classification = self._line_classifier.classify(cleaned_line, self._state)
+
+        if deindented:
+            _logger.debug("DEINDENT")
+            _logger.debug("  %r -> %r", self._last_indentation, self._current_indentation)
+            #GPT metadata lines are indented before partitions are enumerated.  Don't close the partition system (i.e. pop levels) in that case.
+            psobj = self._context_stack[-1].partition_system
+            in_gpt_psobj = None if psobj is None else (psobj.pstype_str == "gpt")
+            in_gpt_partition_table = in_gpt_psobj and self._level_stack[-1][0] == ParseState._PARTITION_SYSTEM_START
+
+            #There used to be an assumption that a single partition wouldn't contain multiple file systems.  However, HFS Plus was originally implemented with an HFS "wrapper" file system (see e.g. NSRL sample 10002-1.txt).  Treat this as a second, adjacent file system within the partition.
+            #(AJN 2017-06-14: It's more correct to nest the HFS+ volume object in the HFS object, because the HFS wrapper encodes the (arbitrary) offset to the embedded HFS+ volume.  Unfortunately, disktype does not emit that offset.)
+            next_line_is_hfs_wrapper = classification.kind == LineKind.HFS_WRAPPER
+            in_file_system = isinstance(self._object_stack[-1], Objects.VolumeObject)
+
+            #One case (NSRL sample 2332-1) indented the volume name of a partition that also had a Solaris disk label.  The indented line followed the disklabel line, but preceded partition definitions.  Check for this case as another instance to skip level popping.
+            #The test here is to look for *any* transition that would trigger a _PARTITION_START transition.  Unfortunately, at the moment, this is hard-coded as extra transition() calls in the line-consuming loop because there are some "Level-starting" triggering transitions that are based on contents of the regular expression matches (e.g. the El Torito level).  This will likely need fixing after six months away from the code and finding a new implementation-challenging sample.
+            #TODO It may be better to consider these indentations as annotation regions, inducing a Level for annotations.
+            about_to_start_partition = classification.kind in partition_starting_line_kinds
+            in_partition_system = isinstance(self._object_stack[-1], PartitionSystemObject)
+
+            #This is the same messy check as for 'about_to_start_partition', except FS_TYPE_STR has the added complication of being able to accidentally match text in free-form text entry fields (e.g. volume names that mention a file system).
+            #(AJN 2017-06-14: The sample that hits this indentation corner case: NSRL 7476-1.  An El Torito floppy image had three objects simultaneously starting at sub-image offset 0: a 512-byte long BSD disklabel (per SleuthKit's mmls); the disklabel's first partition (per Disktype); and a UFS file system with a single file "kernel" (per SleuthKit's fiwalk).  For now, I'm considering this to be nested like normal even with its de-indentation fluke.)
+            #The classifier has already resolved those accidental matches (see line_kind_overrides).
+            about_to_start_file_system = classification.kind == LineKind.FS_TYPE_STR
+            in_partition = isinstance(self._object_stack[-1], PartitionObject)
+
+            if in_gpt_partition_table:
+                _logger.debug("In GPT partition table.  Not popping level.")
+            elif next_line_is_hfs_wrapper and in_file_system:
+                _logger.debug("Encountered wrapped HFS+ file system.  Not popping level.")
+            elif about_to_start_partition and in_partition_system:
+                _logger.debug("About to start partition while in partition system level.  Not popping level.")
+            elif about_to_start_file_system and in_partition:
+                _logger.debug("About to start file system partition while in partition.  Not popping level.")
+            else:
+                self.pop_deindented_levels()
+            _logger.debug("Done handling deindent effects.")
 
-                diobj.sector_size = 512
+        if classification.kind is None:
+            _logger.debug("Cleaned line form: %r." % cleaned_line)
+            raise ValueError("Unparsed line, line %d: %r." % (self._line_no, line))
+        self._line_handlers[classification.kind](classification.match, line, cleaned_line)
 
-                dibr = diobj.byte_runs[0]
+    def end_parse(self):
+        """Closes all open levels at the end of input, and returns the DFXMLObject."""
+        self.transition(ParseState._INPUT_END)
+        self._parsing = False
+        return self._object_stack[0]
 
-                #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
-                dibr.img_offset = int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size
+    def feed(self, data):
+        """
+        Consumes a chunk of disktype output, as bytes, split anywhere, even mid-line.  Complete lines are parsed at once, and the rest is kept until a later chunk completes it, so this never waits on input.  Call close() after the last chunk.
 
-                floppy_size = maybe_match.group("floppy_size").decode("utf-8")
-                dibr.len = {
-                  "1.2M":  1228800,
-                  "1.44M": 1474560,
-                  "2.88M": 2949120
-                }[floppy_size]
-                continue
+        A parse is begun by the first chunk if begin_parse() was not called.  Volumes are handed to the volume callback, if there is one, as soon as a fed line closes their file system level.
+        """
+        if not self._parsing:
+            self.begin_parse()
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        line_start = 0
+        line_end = data.find(b"\n") + 1
+        while line_end > 0:
+            if len(self._feed_parts) > 0:
+                self._feed_parts.append(data[line_start:line_end])
+                line = b"".join(self._feed_parts)
+                self._feed_parts = []
+            else:
+                line = data[line_start:line_end]
+            self.parse_line(line)
+            line_start = line_end
+            line_end = data.find(b"\n", line_start) + 1
+        if line_start < len(data):
+            self._feed_parts.append(data[line_start:])
+
+    def close(self):
+        """Parses any unterminated last line fed, ends the parse as end_parse() does, and returns the DFXMLObject."""
+        if not self._parsing:
+            self.begin_parse()
+        if len(self._feed_parts) > 0:
+            line = b"".join(self._feed_parts)
+            self._feed_parts = []
+            self.parse_line(line)
+        return self.end_parse()
+
+    def parse(self, fh, line_no=0):
+        """Parses all lines of fh, a binary file handle or other iterable of byte strings, and returns a DFXMLObject.  line_no is as for begin_parse()."""
+        self.begin_parse(line_no)
+        for line in fh:
+            self.parse_line(line)
+        return self.end_parse()
+
+    def add_section_result(self, sources, externals, volume_events, end_state):
+        """
+        Adds the result of another Parser's parse of a section of this parser's input (see parse_section()) to this parser's DFXMLObject, as if this parser had parsed the section.  Call between begin_parse() and end_parse(), once per section, in input order.
 
-            #This expression behaves much like the nonemulated expression in the next match block.  However, one sample of this image contained an indicator of a FAT16 file system (NSRL sample 11130-1).  Disktype didn't seem to think there was a FAT file system there, though.
-            maybe_match = rx_bootable_hard_disk_image.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._DISK_START)
-                self.transition(ParseState.BOOTABLE_HARD_DISK_IMAGE)
+        volume_events lists (source count, external count, VolumeObject) in the order the volumes were delivered; the counts are how many of the section's sources and externals came before the volume's delivery, so a volume_callback sees the DFXMLObject as it would in a serial parse.  end_state is the section parser's state at the end of the section, from which end_parse() transitions.
+        """
+        self._state = end_state
+        dobj = self._object_stack[0]
+        (sources_done, externals_done) = (0, 0)
+        for (source_count, external_count, vobj) in volume_events + [(len(sources), len(externals), None)]:
+            for source in sources[sources_done:source_count]:
+                dobj.sources.append(source)
+            for el in externals[externals_done:external_count]:
+                dobj.externals.append(el)
+            (sources_done, externals_done) = (source_count, external_count)
+            if vobj is None:
+                pass
+            elif self._volume_callback is None:
+                dobj.append(vobj)
+            else:
+                self._volume_callback(dobj, vobj)
 
-                diobj = self._object_stack[-1]
-                assert isinstance(diobj, DiskImageObject)
-                vobj = self._object_stack[-2]
-                assert isinstance(vobj, Objects.VolumeObject)
+    #Line handlers.  Parser.parse() dispatches each classified input line to the handler named for its LineKind.
+    #Some of the parsing expressions can match at multiple points, due to free-form text (usually in name fields).  The handlers for those cases are also called from within other handlers.
 
-                dibr = diobj.byte_runs[0]
-                #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
-                dibr.img_offset = int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size
-                continue
+    def _handle_additional_primary_volume_descriptor(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.ADDITIONAL_PRIMARY_VOLUME_DESCRIPTOR)
+        #Nop.  No further information provided in this pattern.
 
-            #This expression only matches on an El Torito boot catalog (see Disktype source, cdrom.c).
-            maybe_match = rx_bootable_nonemulated_image.search(cleaned_line) or rx_bootable_nonemulated_image_summary.search(cleaned_line)
-            if not maybe_match is None:
-                #The other "Bootable" regex (rx_bootable_floppy_image) indicates an emulated disk image, so that match triggers a transition to _DISK_START.  This regex, for non-emulated images, doesn't seem to contain further partition/file systems, but for symmetry's sake it will also transition to _DISK_START.
-                self.transition(ParseState._DISK_START)
-                self.transition(ParseState.BOOTABLE_NONEMULATED_IMAGE)
-
-                diobj = self._object_stack[-1]
-                assert isinstance(diobj, DiskImageObject)
-                vobj = self._object_stack[-2]
-                assert isinstance(vobj, Objects.VolumeObject)
-
-                dibr = diobj.byte_runs[0]
-                #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
-                dibr.img_offset = int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size
-                continue
+    def _handle_application(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.APPLICATION)
+        #Nop.  Information not recorded in DFXML.
 
-            maybe_match = rx_bsd_disklabel.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._PARTITION_SYSTEM_START)
-                self.transition(ParseState.BSD_DISKLABEL)
+    def _handle_bar_archive(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.BAR_ARCHIVE)
+        #Nop.
 
-                psobj = self._object_stack[-1]
-                assert isinstance(psobj, PartitionSystemObject)
+    def _handle_blank_check(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.BLANK_CHECK)
+        #Nop.
 
-                psobj.pstype_str = "bsd"
+    def _handle_blank_medium(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.BLANK_MEDIUM)
+        #Nop.
 
-                pstel = ET.Element("dfxmlext:pstype_str")
-                pstel.text = psobj.pstype_str
-                self._object_stack[0].externals.append(pstel) #TODO Maybe enqueue all the encountered partition systems into a set?
+    def _handle_boot_loader(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.BOOT_LOADER)
+        #Nop.
 
-                #TODO Set up byte run for partition system?
-                continue
+    def _handle_boot_record(self, maybe_match, line, cleaned_line):
+        if "boot_record_type" in maybe_match.groupdict():
+            if maybe_match.group("boot_record_type").decode("utf-8") == "El Torito":
+                self.transition(ParseState._EL_TORITO_START)
+        self.transition(ParseState.BOOT_RECORD)
 
-            maybe_match = rx_compress.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._COMPRESSION_START)
-                self.transition(ParseState.COMPRESS)
-                #Nop otherwise.
-                continue
+    def _handle_bootable_floppy_image(self, maybe_match, line, cleaned_line):
+        #This expression only matches on an El Torito boot catalog (see Disktype source, cdrom.c).
+        self.transition(ParseState._DISK_START)
+        self.transition(ParseState.BOOTABLE_FLOPPY_IMAGE)
+        diobj = self._object_stack[-1]
+        assert isinstance(diobj, DiskImageObject)
 
-            maybe_match = rx_cpio_archive.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.CPIO_ARCHIVE)
-                #Nop.
-                continue
+        vobj = self._object_stack[-2]
+        if not isinstance(vobj, Objects.VolumeObject):
+            raise ValueError("Object stack confusion: Expecting object stack's last two members to be Objects.VolumeObject, DiskImageObject.  Instead they are: %r." % (type(self._object_stack[-2]), type(self._object_stack[-1])))
 
-            maybe_match = rx_data_size.search(cleaned_line) or rx_data_size_no_comma.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.DATA_SIZE)
-                assert isinstance(self._object_stack[-1], Objects.VolumeObject)
+        diobj.sector_size = 512
 
-                unit = maybe_match.group("bytes_per_block_unit").decode("utf-8")
-                bytes_per_block_unit = block_units[unit]
+        #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
+        img_offset = int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size
 
-                self._object_stack[-1].block_size = int(maybe_match.group("bytes_per_block_unitless")) * bytes_per_block_unit
-                self._object_stack[-1].block_count = int(maybe_match.group("block_count"))
+        floppy_size = maybe_match.group("floppy_size").decode("utf-8")
+        diobj.byte_run = ByteExtent(img_offset, {
+          "1.2M":  1228800,
+          "1.44M": 1474560,
+          "2.88M": 2949120
+        }[floppy_size])
 
-                num_bytes = int(maybe_match.group("num_bytes"))
-                self.derive_volume_byte_run(self._object_stack[-1], num_bytes)
-                continue
+    def _handle_bootable_hard_disk_image(self, maybe_match, line, cleaned_line):
+        #This expression behaves much like the nonemulated expression in the next handler.  However, one sample of this image contained an indicator of a FAT16 file system (NSRL sample 11130-1).  Disktype didn't seem to think there was a FAT file system there, though.
+        self.transition(ParseState._DISK_START)
+        self.transition(ParseState.BOOTABLE_HARD_DISK_IMAGE)
 
-            maybe_match = rx_descriptor_type.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.DESCRIPTOR_TYPE)
-                #TODO Decode type?
-                continue
+        diobj = self._object_stack[-1]
+        assert isinstance(diobj, DiskImageObject)
+        vobj = self._object_stack[-2]
+        assert isinstance(vobj, Objects.VolumeObject)
 
-            maybe_match = rx_disk_guid.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.DISK_GUID)
-                guid = maybe_match.group("guid").decode("utf-8")
-                if isinstance(self._object_stack[-1], PartitionSystemObject):
-                    self._object_stack[-1].guid = guid
-                else:
-                    _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
-                    raise NotImplementedError("Disk GUID provided at unexpected parsing level.  Expected partition system.")
-                continue
+        #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
+        diobj.byte_run = diobj.byte_run._replace(img_offset=int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size)
 
-            maybe_match = rx_disk_meta.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.DISK_META)
-                if not len(self._object_stack) == 2:
-                    raise ValueError("Expecting object stack to have just two items.  It currently has %d: %r." % (len(self._object_stack), self._object_stack))
-                dibr = self._object_stack[-1].byte_runs[0]
-                dibr.img_offset = 0
-                dibr.len = int(maybe_match.group("bytes_in_image"))
-
-                dibrel = dibr.to_Element()
-                dibrel.tag = "dfxmlext:disk_image_byte_runs"
-                self._object_stack[0].externals.append(dibrel)
-                continue
+    def _handle_bootable_nonemulated_image(self, maybe_match, line, cleaned_line):
+        #This expression only matches on an El Torito boot catalog (see Disktype source, cdrom.c).
+        #The other "Bootable" regex (rx_bootable_floppy_image) indicates an emulated disk image, so that match triggers a transition to _DISK_START.  This regex, for non-emulated images, doesn't seem to contain further partition/file systems, but for symmetry's sake it will also transition to _DISK_START.
+        self.transition(ParseState._DISK_START)
+        self.transition(ParseState.BOOTABLE_NONEMULATED_IMAGE)
 
-            maybe_match = rx_disk_size.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.DISK_SIZE)
-                psobj = self._object_stack[-1]
-                if not isinstance(psobj, PartitionSystemObject):
-                    _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
-                    raise NotImplementedError("'Disk size' line provided at unexpected parsing level.  Expected partition system.")
-                psbr = psobj.byte_runs[0]
-                psbr.len = int(maybe_match.group("num_bytes"))
-                continue
+        diobj = self._object_stack[-1]
+        assert isinstance(diobj, DiskImageObject)
+        vobj = self._object_stack[-2]
+        assert isinstance(vobj, Objects.VolumeObject)
 
-            maybe_match = rx_file_system_uuid.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.FILE_SYSTEM_UUID)
-                uuid = maybe_match.group("uuid").decode("utf-8")
-                vobj = self._object_stack[-1]
-                if not isinstance(vobj, Objects.VolumeObject):
-                    _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
-                    raise NotImplementedError("UUID line provided at unexpected parsing level.  Expected file system.")
-                uuidel = ET.Element("dfxmlext:uuid")
-                if uuid == "nil":
-                    uuidel.text = ""
-                else:
-                    uuidel.text = uuid
-                vobj.externals.append(uuidel)
-                continue
+        #"Sectors" are ISO9660-level sectors; recorded as blocks in the volume object.
+        diobj.byte_run = diobj.byte_run._replace(img_offset=int(maybe_match.group("boot_offset_in_sectors")) * vobj.block_size)
 
-            #rx_fs_type_str overlaps with other expressions that sometimes contain the free text "file system" without meaning to refer to a file system type.  Disambiguate.
-            maybe_match = rx_fs_type_str.search(cleaned_line)
-            if not maybe_match is None:
-                maybe_match2 = rx_partition_ptype_and_ptype_str.search(cleaned_line)
-                #The logic for ParseState.PARTITION_PTYPE_AND_PTYPE_STR (etc.) needs to be broken out into an internal function just because it can be reached at two points in this loop.
-                if not maybe_match2 is None:
-                    _handle_partition_ptype_and_ptype_str(maybe_match2)
-                    continue
-                if cleaned_line.startswith(b"Type"):
-                    raise NotImplementedError("This appears to be a partition type, but the logic to handle it is not implemented yet, for lack of test cases.")
+    def _handle_bsd_disklabel(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._PARTITION_SYSTEM_START)
+        self.transition(ParseState.BSD_DISKLABEL)
 
-                maybe_match2 = rx_application.search(cleaned_line)
-                if not maybe_match2 is None:
-                    _handle_application(maybe_match2)
-                    continue
+        psobj = self._object_stack[-1]
+        assert isinstance(psobj, PartitionSystemObject)
 
-                maybe_match2 = rx_publisher.search(cleaned_line)
-                if not maybe_match2 is None:
-                    _handle_publisher(maybe_match2)
-                    continue
+        psobj.pstype_str = "bsd"
 
-                maybe_match2 = rx_volume_name.search(cleaned_line)
-                if not maybe_match2 is None:
-                    _handle_volume_name(maybe_match2)
-                    continue
+        pstel = ET.Element("dfxmlext:pstype_str")
+        pstel.text = psobj.pstype_str
+        self._object_stack[0].externals.append(pstel) #TODO Maybe enqueue all the encountered partition systems into a set?
 
-                if self._current_indentation == 0:
-                    #This is a file system outside of other partition managers (a common case is ISO 9660).  Pop back up to disk level.
-                    while self._level_stack[-1][0] != ParseState._DISK_START:
-                        self.pop_level()
-                self.transition(ParseState._FILE_SYSTEM_START)
-                self.transition(ParseState.FS_TYPE_STR)
-
-                vobj = self._object_stack[-1]
-                ftype_str = maybe_match.group("ftype_str").decode("utf-8")
-                vobj.ftype_str = ftype_str
-
-                cbr = self.get_container_byte_run()
-
-                #The ftype_str line sometimes contains extra geometric information after the file system name.  If present, use that to record the file system dimensions.
-                file_system_in_partition = isinstance(self._object_stack[-2], PartitionObject)
-                maybe_match_2 = rx_fs_type_str_misc_offset.search(line)
-                if maybe_match_2 is None:
-                    #There is no geometry information.  Rely on inheriting the file system dimensions from either the containing partiion; or, just consider the file system to span the whole disk.
-                    if file_system_in_partition:
-                        _logger.debug("Trusting the file system geometry is inherited from the containing partition.")
-                    else:
-                        _logger.debug("Treating the file system as spanning the containing object.")
-                        vobj.partition_offset = cbr.img_offset
-                elif ftype_str == "UFS":
-                    #The 'offset' datum in UFS indicates the offset of the superblock from the start of the file system.  Before that offset can come bootloader code.
-                    #Since UFS can be a file system for an unpartitioned disk, treat the within-image offset as 0 if not already defined.
-                    _logger.debug("Skipping offset information due to different meaning for UFS.")
-                    if not file_system_in_partition:
-                        _logger.debug("Treating the UFS file system as spanning the containing object.")
-                        vobj.partition_offset = cbr.img_offset
-                else:
-                    _logger.debug("File system type line includes offset.")
-                    bytes_unit = maybe_match_2.group("bytes_unit").decode("utf-8")
-                    bytes_per_unit = block_units[bytes_unit]
-                    vobj.partition_offset = int(maybe_match_2.group("bytes_unitless")) * bytes_per_unit
-
-                num_bytes = None #To be an integer
-                if not None in (self._object_stack[-1].block_count, self._object_stack[-1].block_size):
-                    #Say the volume size is the number of blocks times block size.
-                    num_bytes = self._object_stack[-1].block_count * self._object_stack[-1].block_size
-                else:
-                    #Say the volume size is the remainder of the disk image after the partition offset.
-                    num_bytes = self.get_image_size() - self._object_stack[-1].partition_offset
-                self.derive_volume_byte_run(self._object_stack[-1], num_bytes)
-                continue
+        #TODO Set up byte run for partition system?
 
-            maybe_match = rx_gzip.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._COMPRESSION_START)
-                self.transition(ParseState.GZIP)
-                #Nop otherwise.
-                continue
+    def _handle_compress(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._COMPRESSION_START)
+        self.transition(ParseState.COMPRESS)
+        #Nop otherwise.
 
-            maybe_match = rx_input_file.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._DISK_START)
-                self.transition(ParseState.INPUT_FILE)
-                filepath = maybe_match.group("filepath").decode("utf-8")
-                self._object_stack[0].sources.append(filepath)
-                continue
+    def _handle_cpio_archive(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.CPIO_ARCHIVE)
+        #Nop.
 
-            maybe_match = rx_hfs_wrapper.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.HFS_WRAPPER)
+    def _handle_data_size(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.DATA_SIZE)
+        assert isinstance(self._object_stack[-1], Objects.VolumeObject)
 
-                vobj = self._object_stack[-1]
-                assert isinstance(vobj, Objects.VolumeObject)
-
-                #Note that this is an HFS wrapper.
-                extel = ET.Element("dfxmlext:hfs_wrapping_hfsplus")
-                extel.text = "1"
-                vobj.externals.append(extel)
-                continue
-
-            maybe_match = rx_iso9660_extension.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.ISO9660_EXTENSION)
-
-                vobj = self._object_stack[-1]
-                assert isinstance(vobj, Objects.VolumeObject)
-
-                extel = ET.Element("dfxmlext:iso9660extension")
-                extel.text = maybe_match.group("extension").decode("utf-8")
-                vobj.externals.append(extel)
-                #TODO Volume name not recorded for now.  May need to address character encoding issues.
-                continue
-
-            maybe_match = rx_last_mounted.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.LAST_MOUNTED)
-                #Nop.  Information not recorded in DFXML.
-                continue
-
-            maybe_match = rx_no_type_and_creator_code.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.NO_TYPE_AND_CREATOR_CODE)
-                #Nop.
-                continue
-
-
-            maybe_match = rx_partition_guid.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_GUID)
-                pobj = self._object_stack[-1]
-                assert isinstance(pobj, PartitionObject)
-                pobj.guid = maybe_match.group("guid").decode("utf-8")
-                continue
+        unit = maybe_match.group("bytes_per_block_unit").decode("utf-8")
+        bytes_per_block_unit = block_units[unit]
+
+        self._object_stack[-1].block_size = int(maybe_match.group("bytes_per_block_unitless")) * bytes_per_block_unit
+        self._object_stack[-1].block_count = int(maybe_match.group("block_count"))
+
+        num_bytes = int(maybe_match.group("num_bytes"))
+        self.derive_volume_byte_run(self._object_stack[-1], num_bytes)
+
+    def _handle_descriptor_type(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.DESCRIPTOR_TYPE)
+        #TODO Decode type?
+
+    def _handle_disk_guid(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.DISK_GUID)
+        guid = maybe_match.group("guid").decode("utf-8")
+        if isinstance(self._object_stack[-1], PartitionSystemObject):
+            self._object_stack[-1].guid = guid
+        else:
+            _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
+            raise NotImplementedError("Disk GUID provided at unexpected parsing level.  Expected partition system.")
+
+    def _handle_disk_meta(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.DISK_META)
+        if not len(self._object_stack) == 2:
+            raise ValueError("Expecting object stack to have just two items.  It currently has %d: %r." % (len(self._object_stack), self._object_stack))
+        dibr = ByteExtent(0, int(maybe_match.group("bytes_in_image")))
+        self._object_stack[-1].byte_run = dibr
+
+        dibrel = dibr.to_ByteRun().to_Element()
+        dibrel.tag = "dfxmlext:disk_image_byte_runs"
+        self._object_stack[0].externals.append(dibrel)
+
+    def _handle_disk_size(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.DISK_SIZE)
+        psobj = self._object_stack[-1]
+        if not isinstance(psobj, PartitionSystemObject):
+            _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
+            raise NotImplementedError("'Disk size' line provided at unexpected parsing level.  Expected partition system.")
+        psobj.byte_run = psobj.byte_run._replace(len=int(maybe_match.group("num_bytes")))
+
+    def _handle_file_system_uuid(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.FILE_SYSTEM_UUID)
+        uuid = maybe_match.group("uuid").decode("utf-8")
+        vobj = self._object_stack[-1]
+        if not isinstance(vobj, Objects.VolumeObject):
+            _logger.info("Current parsing level: %r." % self._level_stack[-1][0])
+            raise NotImplementedError("UUID line provided at unexpected parsing level.  Expected file system.")
+        uuidel = ET.Element("dfxmlext:uuid")
+        if uuid == "nil":
+            uuidel.text = ""
+        else:
+            uuidel.text = uuid
+        vobj.externals.append(uuidel)
 
-            maybe_match = rx_partition_includes.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_INCLUDES)
-                #Nop.
-                continue
+    def _handle_fs_type_str(self, maybe_match, line, cleaned_line):
+        #rx_fs_type_str overlaps with other expressions that sometimes contain the free text "file system" without meaning to refer to a file system type.  The classifier resolves the known overlaps (see line_kind_overrides); a partition type line that reaches here has an unknown form.
+        if cleaned_line.startswith(b"Type"):
+            raise NotImplementedError("This appears to be a partition type, but the logic to handle it is not implemented yet, for lack of test cases.")
 
-            maybe_match = rx_partition_invalid_signature.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._PARTITION_START)
-                self.transition(ParseState.PARTITION_INVALID_SIGNATURE)
-                #There is no information to be gathered on this partition; further, there won't be an indented line following, so just pop the level here.
+        if self._current_indentation == 0:
+            #This is a file system outside of other partition managers (a common case is ISO 9660).  Pop back up to disk level.
+            while self._level_stack[-1][0] != ParseState._DISK_START:
                 self.pop_level()
-                continue
-
-            maybe_match = rx_partition_map.search(cleaned_line)
-            if not maybe_match is None:
-                if self._level_stack[-1][0] == ParseState._PARTITION_SYSTEM_START:
-                    #GPT/DOS disk images can't use indentation to detect when the counterpart partition system has closed.  Handle closing here.
-                    self.pop_level()
-                self.transition(ParseState._PARTITION_SYSTEM_START)
-                self.transition(ParseState.PARTITION_MAP)
-
-                psobj = self._object_stack[-1]
-                assert isinstance(psobj, PartitionSystemObject)
-
-                psobj.pstype_str = {
-                  b"Apple": "mac",
-                  b"DOS/MBR": "dos",
-                  b"GPT": "gpt"
-                }[maybe_match.group("pstype_str")]
-
-                #For easier (maybe?) records checks, pstype_str is appended to the top DFXMLObject without any volume associations; and then associated as appropriate to each child partition and file system.
-                #TODO Solaris disk labels can be nested in partitions.  (See NSRL sample 16618-1.txt)  pstype_str elements currently get counted once per file system.  Should fix this.
-                pstel = ET.Element("dfxmlext:pstype_str")
-                pstel.text = psobj.pstype_str
-                self._object_stack[0].externals.append(pstel) #TODO Maybe enqueue all the encountered partition systems into a set?
-                continue
-
-            maybe_match = rx_partition_meta_no_size_summary.search(cleaned_line) or rx_partition_meta_size_summary.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._PARTITION_START)
-                self.transition(ParseState.PARTITION_META)
-                pobj = self._object_stack[-1]
-                assert isinstance(pobj, PartitionObject)
-                psobj = self._object_stack[-2]
-                assert isinstance(psobj, PartitionSystemObject)
-
-                pbr = pobj.byte_runs[0]
-
-                pobj.block_count = int(maybe_match.group("num_blocks_distance"))
-                #pobj.block_size is by default inherited from the partition system, in transition().  We'll recompute it here, though, if we have the information.
-
-                pbr.len = int(maybe_match.group("partition_size_unitless")) * block_units[maybe_match.group("partition_size_unit").decode("utf-8")]
-
-                if pobj.block_count > 0:
-                    if pbr.len % pobj.block_count != 0:
-                        _logger.info("Bytes in partition = %r." % pbr.len)
-                        _logger.info("Block count = %r." % pobj.block_count)
-                        _logger.error("Guessed block size = %r." % (1.0 * pbr.len) / pobj.block_count)
-                        raise ValueError("Error in confirming block size from given information.")
-                    pobj.block_size = pbr.len // pobj.block_count
-
-                #It is possible at this point that the block size has not yet been determined for any of the containing levels.  (See e.g. Apple partition map NSRL sample '10002-1.txt' - first opportunity to infer block size is the first Partition definition.)  Back-fill block size if it's absent.
-                if psobj.block_size is None:
-                    psobj.block_size = pobj.block_size
-                if self._object_stack[1].sector_size is None:
-                    self._object_stack[1].sector_size = psobj.block_size
-
-                pobj.partition_system_offset = int(maybe_match.group("from")) * pobj.block_size
-
-                #Finally, determine img_offset of the partition (which needs to be computed relative to the img_offset of the partition system).
-                psbr = psobj.byte_runs[0]
-                pbr.img_offset = psbr.img_offset + pobj.partition_system_offset
-
-                continue
-
-            maybe_match = rx_partition_name.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_NAME)
-                #TODO Partition name not recorded for now.  May need to address character encoding issues.
-                continue
-
-            maybe_match = rx_partition_ptype_int.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_PTYPE_INT)
-                self._object_stack[-1].ptype = int(maybe_match.group("ptype_label"))
-                continue
-
-            maybe_match = rx_partition_ptype_str.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_PTYPE_STR)
-                self._object_stack[-1].ptype_str = maybe_match.group("ptype_label").decode("utf-8")
-                continue
-
-            maybe_match = rx_partition_ptype_str_ftype_str_and_guid.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID)
-                self._object_stack[-1].ptype_str = maybe_match.group("ptype_label").decode("utf-8")
-                self._object_stack[-1].ftype_str = maybe_match.group("ftype_str").decode("utf-8")
-                self._object_stack[-1].guid = maybe_match.group("guid").decode("utf-8")
-                continue
-
-            maybe_match = rx_partition_ptype_str_and_guid.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PARTITION_PTYPE_STR_AND_GUID)
-                self._object_stack[-1].ptype_str = maybe_match.group("ptype_label").decode("utf-8")
-                self._object_stack[-1].guid = maybe_match.group("guid").decode("utf-8")
-                continue
-
-            maybe_match = rx_partition_ptype_and_ptype_str.search(cleaned_line)
-            if not maybe_match is None:
-                _handle_partition_ptype_and_ptype_str(maybe_match)
-                continue
-
-            maybe_match = rx_partition_unused.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._PARTITION_START)
-                self.transition(ParseState.PARTITION_UNUSED)
-                #Nop.
-                continue
-
-            maybe_match = rx_platform_system_type.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PLATFORM_SYSTEM_TYPE)
-                #TODO Decode?
-                continue
-
-            maybe_match = rx_preparer.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PREPARER)
-                #Not currently recorded in DFXML.
-                #Nop.
-                continue
-
-            maybe_match = rx_primary_volume_descriptor_missing.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.PRIMARY_VOLUME_DESCRIPTOR_MISSING)
-                #Nop.  No further information provided in this pattern.
-                continue
-
-            maybe_match = rx_publisher.search(cleaned_line)
-            if not maybe_match is None:
-                _handle_publisher(maybe_match)
-                continue
-
-            maybe_match = rx_sector_size.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.SECTOR_SIZE)
-                if self._level_stack[-1][0] == ParseState._FILE_SYSTEM_START:
-                    self._object_stack[-1].sector_size = int(maybe_match.group("sector_size"))
-                else:
-                    raise NotImplementedError("Currently unspecified: How to integrate sector size information in level %r." % self._level_stack[-1][0])
-                continue
-
-            maybe_match = rx_signature_missing.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.SIGNATURE_MISSING)
-                #Nop.
-                continue
-
-            maybe_match = rx_solaris_sparc_disklabel.search(cleaned_line) or rx_solaris_x86_disklabel.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState._PARTITION_SYSTEM_START)
-                self.transition(ParseState.SOLARIS_DISKLABEL)
-
-                psobj = self._object_stack[-1]
-                assert isinstance(psobj, PartitionSystemObject)
-
-                psobj.pstype_str = "sun"
-                pstel = ET.Element("dfxmlext:pstype_str")
-                pstel.text = psobj.pstype_str
-                self._object_stack[0].externals.append(pstel)
-                continue
-
-            maybe_match = rx_tar_archive.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.TAR_ARCHIVE)
-                #Nop.
-                continue
-
-            maybe_match = rx_udf_recognition_sequence_missingloc.search(cleaned_line)
-            if not maybe_match is None:
-                if self._current_indentation == 0:
-                    #This is a file system outside of other partition managers (UDF and ISO 9660 are common cases of this).  Pop back up to disk level.
-                    while self._level_stack[-1][0] != ParseState._DISK_START:
-                        self.pop_level()
-                self.transition(ParseState.UDF_RECOGNITION_SEQUENCE_MISSINGLOC)
-                #Nop.
-                continue
-
-            maybe_match = rx_udf_version.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.UDF_VERSION)
-                #Nop.
-                continue
-
-            maybe_match = rx_validation_entry_missing.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.VALIDATION_ENTRY_MISSING)
-                #Nop.
-                continue
-
-            maybe_match = rx_volume_name.search(cleaned_line)
-            if not maybe_match is None:
-                _handle_volume_name(maybe_match)
-                continue
-
-            maybe_match = rx_volume_size_blocks_or_sectors.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.VOLUME_SIZE)
-                vobj = self._object_stack[-1]
-                assert isinstance(vobj, Objects.VolumeObject)
+        self.transition(ParseState._FILE_SYSTEM_START)
+        self.transition(ParseState.FS_TYPE_STR)
 
-                vobj.block_count = int(maybe_match.group("num_blocks"))
-                volume_num_bytes = int(maybe_match.group("num_bytes"))
-                vobj.block_size = volume_num_bytes // self._object_stack[-1].block_count
+        vobj = self._object_stack[-1]
+        ftype_str = sys.intern(maybe_match.group("ftype_str").decode("utf-8"))
+        vobj.ftype_str = ftype_str
 
-                #Treat the VolumeObject byte run as the *file system* dimensions.  The *partition's* (or other container's, e.g. the disk's) dimensions can be bigger than the file systems, but those dimensions are recorded separately in extension elements.
-                self.derive_volume_byte_run(self._object_stack[-1], volume_num_bytes)
+        cbr = self.get_container_byte_run()
 
-                continue
+        #The ftype_str line sometimes contains extra geometric information after the file system name.  If present, use that to record the file system dimensions.
+        file_system_in_partition = isinstance(self._object_stack[-2], PartitionObject)
+        maybe_match_2 = rx_fs_type_str_misc_offset.search(line)
+        if maybe_match_2 is None:
+            #There is no geometry information.  Rely on inheriting the file system dimensions from either the containing partiion; or, just consider the file system to span the whole disk.
+            if file_system_in_partition:
+                _logger.debug("Trusting the file system geometry is inherited from the containing partition.")
+            else:
+                _logger.debug("Treating the file system as spanning the containing object.")
+                vobj.partition_offset = cbr.img_offset
+        elif ftype_str == "UFS":
+            #The 'offset' datum in UFS indicates the offset of the superblock from the start of the file system.  Before that offset can come bootloader code.
+            #Since UFS can be a file system for an unpartitioned disk, treat the within-image offset as 0 if not already defined.
+            _logger.debug("Skipping offset information due to different meaning for UFS.")
+            if not file_system_in_partition:
+                _logger.debug("Treating the UFS file system as spanning the containing object.")
+                vobj.partition_offset = cbr.img_offset
+        else:
+            _logger.debug("File system type line includes offset.")
+            bytes_unit = maybe_match_2.group("bytes_unit").decode("utf-8")
+            bytes_per_unit = block_units[bytes_unit]
+            vobj.partition_offset = int(maybe_match_2.group("bytes_unitless")) * bytes_per_unit
+
+        num_bytes = None #To be an integer
+        if not None in (self._object_stack[-1].block_count, self._object_stack[-1].block_size):
+            #Say the volume size is the number of blocks times block size.
+            num_bytes = self._object_stack[-1].block_count * self._object_stack[-1].block_size
+        else:
+            #Say the volume size is the remainder of the disk image after the partition offset.
+            num_bytes = self.get_image_size() - self._object_stack[-1].partition_offset
+        self.derive_volume_byte_run(self._object_stack[-1], num_bytes)
+
+    def _handle_gzip(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._COMPRESSION_START)
+        self.transition(ParseState.GZIP)
+        #Nop otherwise.
+
+    def _handle_input_file(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._DISK_START)
+        self.transition(ParseState.INPUT_FILE)
+        filepath = maybe_match.group("filepath").decode("utf-8")
+        self._object_stack[0].sources.append(filepath)
+
+    def _handle_hfs_wrapper(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.HFS_WRAPPER)
+
+        vobj = self._object_stack[-1]
+        assert isinstance(vobj, Objects.VolumeObject)
+
+        #Note that this is an HFS wrapper.
+        extel = ET.Element("dfxmlext:hfs_wrapping_hfsplus")
+        extel.text = "1"
+        vobj.externals.append(extel)
+
+    def _handle_iso9660_extension(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.ISO9660_EXTENSION)
+
+        vobj = self._object_stack[-1]
+        assert isinstance(vobj, Objects.VolumeObject)
+
+        extel = ET.Element("dfxmlext:iso9660extension")
+        extel.text = maybe_match.group("extension").decode("utf-8")
+        vobj.externals.append(extel)
+        #TODO Volume name not recorded for now.  May need to address character encoding issues.
+
+    def _handle_last_mounted(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.LAST_MOUNTED)
+        #Nop.  Information not recorded in DFXML.
+
+    def _handle_no_type_and_creator_code(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.NO_TYPE_AND_CREATOR_CODE)
+        #Nop.
+
+    def _handle_partition_guid(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_GUID)
+        pobj = self._object_stack[-1]
+        assert isinstance(pobj, PartitionObject)
+        pobj.guid = maybe_match.group("guid").decode("utf-8")
+
+    def _handle_partition_includes(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_INCLUDES)
+        #Nop.
+
+    def _handle_partition_invalid_signature(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._PARTITION_START)
+        self.transition(ParseState.PARTITION_INVALID_SIGNATURE)
+        #There is no information to be gathered on this partition; further, there won't be an indented line following, so just pop the level here.
+        self.pop_level()
+
+    def _handle_partition_map(self, maybe_match, line, cleaned_line):
+        if self._level_stack[-1][0] == ParseState._PARTITION_SYSTEM_START:
+            #GPT/DOS disk images can't use indentation to detect when the counterpart partition system has closed.  Handle closing here.
+            self.pop_level()
+        self.transition(ParseState._PARTITION_SYSTEM_START)
+        self.transition(ParseState.PARTITION_MAP)
+
+        psobj = self._object_stack[-1]
+        assert isinstance(psobj, PartitionSystemObject)
+
+        psobj.pstype_str = {
+          b"Apple": "mac",
+          b"DOS/MBR": "dos",
+          b"GPT": "gpt"
+        }[maybe_match.group("pstype_str")]
+
+        #For easier (maybe?) records checks, pstype_str is appended to the top DFXMLObject without any volume associations; and then associated as appropriate to each child partition and file system.
+        #TODO Solaris disk labels can be nested in partitions.  (See NSRL sample 16618-1.txt)  pstype_str elements currently get counted once per file system.  Should fix this.
+        pstel = ET.Element("dfxmlext:pstype_str")
+        pstel.text = psobj.pstype_str
+        self._object_stack[0].externals.append(pstel) #TODO Maybe enqueue all the encountered partition systems into a set?
+
+    def _handle_partition_meta(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._PARTITION_START)
+        self.transition(ParseState.PARTITION_META)
+        pobj = self._object_stack[-1]
+        assert isinstance(pobj, PartitionObject)
+        psobj = self._object_stack[-2]
+        assert isinstance(psobj, PartitionSystemObject)
+
+        pobj.block_count = int(maybe_match.group("num_blocks_distance"))
+        #pobj.block_size is by default inherited from the partition system, in transition().  We'll recompute it here, though, if we have the information.
+
+        partition_len = int(maybe_match.group("partition_size_unitless")) * block_units[maybe_match.group("partition_size_unit").decode("utf-8")]
+
+        if pobj.block_count > 0:
+            if partition_len % pobj.block_count != 0:
+                _logger.info("Bytes in partition = %r." % partition_len)
+                _logger.info("Block count = %r." % pobj.block_count)
+                _logger.error("Guessed block size = %r." % (1.0 * partition_len) / pobj.block_count)
+                raise ValueError("Error in confirming block size from given information.")
+            pobj.block_size = partition_len // pobj.block_count
+
+        #It is possible at this point that the block size has not yet been determined for any of the containing levels.  (See e.g. Apple partition map NSRL sample '10002-1.txt' - first opportunity to infer block size is the first Partition definition.)  Back-fill block size if it's absent.
+        if psobj.block_size is None:
+            psobj.block_size = pobj.block_size
+        if self._object_stack[1].sector_size is None:
+            self._object_stack[1].sector_size = psobj.block_size
+
+        pobj.partition_system_offset = int(maybe_match.group("from")) * pobj.block_size
+
+        #Finally, determine img_offset of the partition (which needs to be computed relative to the img_offset of the partition system).
+        pobj.byte_run = ByteExtent(psobj.byte_run.img_offset + pobj.partition_system_offset, partition_len)
+
+    def _handle_partition_name(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_NAME)
+        #TODO Partition name not recorded for now.  May need to address character encoding issues.
+
+    def _handle_partition_ptype_int(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_PTYPE_INT)
+        self._object_stack[-1].ptype = int(maybe_match.group("ptype_label"))
+
+    def _handle_partition_ptype_str(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_PTYPE_STR)
+        self._object_stack[-1].ptype_str = sys.intern(maybe_match.group("ptype_label").decode("utf-8"))
+
+    def _handle_partition_ptype_str_ftype_str_and_guid(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_PTYPE_STR_FTYPE_STR_AND_GUID)
+        self._object_stack[-1].ptype_str = sys.intern(maybe_match.group("ptype_label").decode("utf-8"))
+        self._object_stack[-1].ftype_str = sys.intern(maybe_match.group("ftype_str").decode("utf-8"))
+        self._object_stack[-1].guid = maybe_match.group("guid").decode("utf-8")
+
+    def _handle_partition_ptype_str_and_guid(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_PTYPE_STR_AND_GUID)
+        self._object_stack[-1].ptype_str = sys.intern(maybe_match.group("ptype_label").decode("utf-8"))
+        self._object_stack[-1].guid = maybe_match.group("guid").decode("utf-8")
+
+    def _handle_partition_ptype_and_ptype_str(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PARTITION_PTYPE_AND_PTYPE_STR)
+        ptype = maybe_match.group("ptype").decode("utf-8")
+        if ptype.startswith("0x"):
+            self._object_stack[-1].ptype = int(ptype, base=16)
+        else:
+            self._object_stack[-1].ptype = int(ptype)
+        self._object_stack[-1].ptype_str = sys.intern(maybe_match.group("ptype_label").decode("utf-8"))
+
+    def _handle_partition_unused(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._PARTITION_START)
+        self.transition(ParseState.PARTITION_UNUSED)
+        #Nop.
+
+    def _handle_platform_system_type(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PLATFORM_SYSTEM_TYPE)
+        #TODO Decode?
+
+    def _handle_preparer(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PREPARER)
+        #Not currently recorded in DFXML.
+        #Nop.
+
+    def _handle_primary_volume_descriptor_missing(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PRIMARY_VOLUME_DESCRIPTOR_MISSING)
+        #Nop.  No further information provided in this pattern.
+
+    def _handle_publisher(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.PUBLISHER)
+        #Nop.  Information not recorded in DFXML.
+
+    def _handle_sector_size(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.SECTOR_SIZE)
+        if self._level_stack[-1][0] == ParseState._FILE_SYSTEM_START:
+            self._object_stack[-1].sector_size = int(maybe_match.group("sector_size"))
+        else:
+            raise NotImplementedError("Currently unspecified: How to integrate sector size information in level %r." % self._level_stack[-1][0])
 
-            maybe_match = rx_volume_size_clusters.search(cleaned_line) or rx_volume_size_clusters_no_summary.search(cleaned_line)
-            if not maybe_match is None:
-                self.transition(ParseState.VOLUME_SIZE)
-                vobj = self._object_stack[-1]
-                assert isinstance(vobj, Objects.VolumeObject)
+    def _handle_signature_missing(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.SIGNATURE_MISSING)
+        #Nop.
 
-                if b"off the scale" in cleaned_line:
-                    #Consider this line to contain bad data.  E.g. NSRL sample 14480-1 supposedly has an El Torito inner disk image that is 18 quintillion bytes.
-                    _logger.debug("Skipping 'off the scale' volume size line.")
-                    continue
-                vobj.block_count = int(maybe_match.group("num_clusters"))
-                vobj.block_size = int(maybe_match.group("bytes_per_cluster_unitless")) * block_units[maybe_match.group("bytes_per_cluster_unit").decode("utf-8")]
+    def _handle_solaris_disklabel(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState._PARTITION_SYSTEM_START)
+        self.transition(ParseState.SOLARIS_DISKLABEL)
 
-                if "num_bytes" in maybe_match.groupdict():
-                    #Double-check reported Disktype data, if available (only appears in one of the rx_volume_size_ regexen).
-                    num_bytes = int(maybe_match.group("num_bytes"))
-                    if num_bytes != vobj.block_count * vobj.block_size:
-                        #Maybe this should be a warning?
-                        raise ValueError("The number of bytes disktype does not match the cluster size and count: %r vs. %r * %r." % (num_bytes, vobj.block_count, vobj.block_size))
+        psobj = self._object_stack[-1]
+        assert isinstance(psobj, PartitionSystemObject)
 
-                self.derive_volume_byte_run(vobj, num_bytes)
-                continue
+        psobj.pstype_str = "sun"
+        pstel = ET.Element("dfxmlext:pstype_str")
+        pstel.text = psobj.pstype_str
+        self._object_stack[0].externals.append(pstel)
 
-            _logger.debug("Cleaned line form: %r." % cleaned_line)
-            raise ValueError("Unparsed line, line %d: %r." % (self._line_no, line))
-        self.transition(ParseState._INPUT_END)
+    def _handle_tar_archive(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.TAR_ARCHIVE)
+        #Nop.
 
-        return dobj
+    def _handle_udf_recognition_sequence_missingloc(self, maybe_match, line, cleaned_line):
+        if self._current_indentation == 0:
+            #This is a file system outside of other partition managers (UDF and ISO 9660 are common cases of this).  Pop back up to disk level.
+            while self._level_stack[-1][0] != ParseState._DISK_START:
+                self.pop_level()
+        self.transition(ParseState.UDF_RECOGNITION_SEQUENCE_MISSINGLOC)
+        #Nop.
+
+    def _handle_udf_version(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.UDF_VERSION)
+        #Nop.
+
+    def _handle_validation_entry_missing(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.VALIDATION_ENTRY_MISSING)
+        #Nop.
+
+    def _handle_volume_name(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.VOLUME_NAME)
+        #Nop.  Information not recorded in DFXML.
+
+    def _handle_volume_size_blocks_or_sectors(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.VOLUME_SIZE)
+        vobj = self._object_stack[-1]
+        assert isinstance(vobj, Objects.VolumeObject)
+
+        vobj.block_count = int(maybe_match.group("num_blocks"))
+        volume_num_bytes = int(maybe_match.group("num_bytes"))
+        vobj.block_size = volume_num_bytes // self._object_stack[-1].block_count
+
+        #Treat the VolumeObject byte run as the *file system* dimensions.  The *partition's* (or other container's, e.g. the disk's) dimensions can be bigger than the file systems, but those dimensions are recorded separately in extension elements.
+        self.derive_volume_byte_run(self._object_stack[-1], volume_num_bytes)
+
+    def _handle_volume_size_clusters(self, maybe_match, line, cleaned_line):
+        self.transition(ParseState.VOLUME_SIZE)
+        vobj = self._object_stack[-1]
+        assert isinstance(vobj, Objects.VolumeObject)
+
+        if b"off the scale" in cleaned_line:
+            #Consider this line to contain bad data.  E.g. NSRL sample 14480-1 supposedly has an El Torito inner disk image that is 18 quintillion bytes.
+            _logger.debug("Skipping 'off the scale' volume size line.")
+            return
+        vobj.block_count = int(maybe_match.group("num_clusters"))
+        vobj.block_size = int(maybe_match.group("bytes_per_cluster_unitless")) * block_units[maybe_match.group("bytes_per_cluster_unit").decode("utf-8")]
+
+        if not "num_bytes" in maybe_match.groupdict():
+            #Without a byte count, keep the byte run derived from the file system type line.
+            return
+
+        #Double-check reported Disktype data, if available (only appears in one of the rx_volume_size_ regexen).
+        num_bytes = int(maybe_match.group("num_bytes"))
+        if num_bytes != vobj.block_count * vobj.block_size:
+            #Maybe this should be a warning?
+            raise ValueError("The number of bytes disktype does not match the cluster size and count: %r vs. %r * %r." % (num_bytes, vobj.block_count, vobj.block_size))
+
+        self.derive_volume_byte_run(vobj, num_bytes)
+
+    def pop_deindented_levels(self):
+        """Closes the levels a deindented line ends."""
+        #Continue popping, to the topmost level with a matching indentation.
+        while self._current_indentation < self._level_stack[-1][1]:
+            self.pop_level()
+        #After that while loop completes, we've closed inner levels up to the container we actually wanted to close.
+        self.pop_level()
 
     def pop_level(self):
         """Pops up one level in the storage system stack (e.g. file system to partition).  Uses self._level_stack to determine whether object stack is also popped.  Transitions parsing state to appropriate _..._END member of ParseState."""
@@ -1388,7 +1988,7 @@ class Parser(object):
         elif self._level_stack[-1][0] == ParseState._FILE_SYSTEM_START:
             self.transition(ParseState._FILE_SYSTEM_END)
             level_popped = self._level_stack.pop()
-            object_popped = self._object_stack.pop()
+            object_popped = self.pop_object()
 
             #Handle attaching HFS+ file systems to wrapping parent HFS file systems here.
             parent_object = self._object_stack[-1]
@@ -1396,14 +1996,16 @@ class Parser(object):
                 vel = object_popped.to_Element()
                 vel.tag = "dfxmlext:wrapped_hfsplus_volume"
                 parent_object.externals.append(vel)
+            elif not self._volume_callback is None:
+                self._volume_callback(self._object_stack[0], object_popped)
         elif self._level_stack[-1][0] == ParseState._PARTITION_START:
             self.transition(ParseState._PARTITION_END)
             level_popped = self._level_stack.pop()
-            object_popped = self._object_stack.pop()
+            object_popped = self.pop_object()
         elif self._level_stack[-1][0] == ParseState._PARTITION_SYSTEM_START:
             self.transition(ParseState._PARTITION_SYSTEM_END)
             level_popped = self._level_stack.pop()
-            object_popped = self._object_stack.pop()
+            object_popped = self.pop_object()
         elif self._level_stack[-1][0] == ParseState._EL_TORITO_START:
             self.transition(ParseState._EL_TORITO_END)
             level_popped = self._level_stack.pop()
@@ -1411,17 +2013,18 @@ class Parser(object):
         elif self._level_stack[-1][0] == ParseState._DISK_START:
             self.transition(ParseState._DISK_END)
             level_popped = self._level_stack.pop()
-            object_popped = self._object_stack.pop()
+            object_popped = self.pop_object()
 
-        if level_popped is None:
-            _logger.debug("No level popped.")
-        else:
-            _logger.debug("Level popped: %r." % (level_popped,))
+        if self._debug:
+            if level_popped is None:
+                _logger.debug("No level popped.")
+            else:
+                _logger.debug("Level popped: %r.", level_popped)
 
-        if object_popped is None:
-            _logger.debug("No object popped.")
-        else:
-            _logger.debug("Object popped: %s." % (object_popped,))
+            if object_popped is None:
+                _logger.debug("No object popped.")
+            else:
+                _logger.debug("Object popped: %s.", object_popped)
 
         return (level_popped, object_popped)
 
@@ -1429,10 +2032,11 @@ class Parser(object):
         """
         Instantiate new members of object stack.
 
-        To simplify byte run management: All byte_runs.append calls are made in this function.
+        To simplify byte run management: All byte_runs.append calls are made in this function.  (Objects of the internal model instead start with EMPTY_BYTE_EXTENT, replaced as disktype reports their dimensions.)
         """
 
-        _logger.debug("Transitioning to %r." % to_state)
+        if self._debug:
+            _logger.debug("Transitioning to %r.", to_state)
 
         if not to_state in state_transitions[self._state]:
             raise ValueError("Input line %r: Unimplemented transition: %r -> %r." % (self._line_no, self._state, to_state))
@@ -1455,43 +2059,31 @@ class Parser(object):
         if to_state == ParseState._DISK_START:
             diobj = DiskImageObject()
             object_pushed = diobj
-            self._object_stack.append(diobj)
-
-            dibr = Objects.ByteRun()
-            diobj.byte_runs.append(dibr)
+            self.push_object(diobj)
 
         if to_state == ParseState._PARTITION_SYSTEM_START:
             psobj = PartitionSystemObject()
             object_pushed = psobj
-            self._object_stack.append(psobj)
-
-            psbr = Objects.ByteRun()
-            psobj.byte_runs.append(psbr)
+            self.push_object(psobj)
 
             if isinstance(self._object_stack[-2], PartitionObject):
-                #Solaris SPARC disklabels can appear in a partition, nesting a partition system.  If this has happened, inherit the container's byte run.
+                #Solaris SPARC disklabels can appear in a partition, nesting a partition system.  If this has happened, inherit the container's byte run.  (Extents are immutable, so sharing is safe.)
                 pobj = self._object_stack[-2]
-                pbr = pobj.byte_runs[0]
-                psbr.img_offset = pbr.img_offset
-                psbr.len = pbr.len
+                psobj.byte_run = pobj.byte_run
             elif isinstance(self._object_stack[-2], DiskImageObject):
                 #El Torito bootable images are disk images in the middle of the input image.  Thus, we must work relative to any containing disk image.
                 diobj = self._object_stack[-2]
-                dibr = diobj.byte_runs[0]
-                psbr.img_offset = dibr.img_offset
+                psobj.byte_run = ByteExtent(diobj.byte_run.img_offset, None)
 
                 #El Torito bootable images contain partition systems that reset the sector size.
                 psobj.block_size = diobj.sector_size
             else:
-                psbr.img_offset = 0
+                psobj.byte_run = ByteExtent(0, None)
 
         if to_state == ParseState._PARTITION_START:
             pobj = PartitionObject()
             object_pushed = pobj
-            self._object_stack.append(pobj)
-
-            pbr = Objects.ByteRun()
-            pobj.byte_runs.append(pbr)
+            self.push_object(pobj)
 
             #PartitionObjects should only be within PartitionSystemObjects.
             psobj = self._object_stack[-2]
@@ -1512,9 +2104,10 @@ class Parser(object):
                 if not hfs_wrapping_hfsplus(parent_object):
                     raise NotImplementedError("Encountered a file system embedded in another file system, but the parent has not been annotated as an HFS file system wrapping an HFS+ file system (currently, the one expected way for this to occur).  Please report this issue to the disktype_to_dfxml.py maintainer.")
                 #This vobj will have to be converted to an XML Element and have its tag renamed, at stack-popping time.
-            else:
+            elif self._volume_callback is None:
                 self._object_stack[0].append(vobj)
-            self._object_stack.append(vobj)
+            #Otherwise, the vobj is handed to the volume callback at stack-popping time.
+            self.push_object(vobj)
 
             vobj.byte_runs = Objects.ByteRuns()
             vbr = None
@@ -1557,34 +2150,31 @@ class Parser(object):
                     vobj.block_size = pobj.block_size #NOTE: This may be overwritten.  A file system can have its own block(/cluster) size.
                 if not pobj.ftype_str is None:
                     vobj.ftype_str = pobj.ftype_str
-                pbr = pobj.byte_runs[0]
-                if not None in (pbr.img_offset, pbr.len):
+                pbr = pobj.byte_run
+                if not None in pbr:
                     #The volume byte run may be updated by further information.  Keep the partition byte run handy, but in its own element.
-                    vbr = copy.deepcopy(pbr)
+                    vbr = pbr.to_ByteRun()
                     vobj.partition_offset = pbr.img_offset
-                    pbrel = pbr.to_Element()
+                    pbrel = pbr.to_ByteRun().to_Element()
                     pbrel.tag = "dfxmlext:partition_byte_run"
                     vobj.externals.append(pbrel)
 
             if vbr is None:
                 #Treat volume as spanning whole containing disk image.
-                cobj = None #Containing object
-                object_stack_level = -1
-                assert isinstance(self._object_stack[1], DiskImageObject) #Guarantee termination.
-                while not isinstance(cobj, DiskImageObject):
-                    object_stack_level -= 1
-                    cobj = self._object_stack[object_stack_level]
-                vbr = copy.deepcopy(cobj.byte_runs[0])
+                cobj = self._context_stack[-1].disk_image #Containing object
+                assert isinstance(cobj, DiskImageObject)
+                vbr = cobj.byte_run.to_ByteRun()
             vobj.byte_runs.append(vbr)
 
-        if level_pushed is None:
-            _logger.debug("No level pushed.")
-        else:
-            _logger.debug("Level pushed: %r." % (level_pushed,))
-        if object_pushed is None:
-            _logger.debug("No object pushed.")
-        else:
-            _logger.debug("Object pushed: %s." % object_pushed)
+        if self._debug:
+            if level_pushed is None:
+                _logger.debug("No level pushed.")
+            else:
+                _logger.debug("Level pushed: %r.", level_pushed)
+            if object_pushed is None:
+                _logger.debug("No object pushed.")
+            else:
+                _logger.debug("Object pushed: %s.", object_pushed)
 
 def hfs_wrapping_hfsplus(vobj):
     if not isinstance(vobj, Objects.VolumeObject):
@@ -1598,19 +2188,1518 @@ def hfs_wrapping_hfsplus(vobj):
             return True
     return False
 
-def main():
-    with open(args.disktype_out_txt, "rb") as in_fh:
+class ProfiledPattern(object):
+    """A compiled pattern that records its search attempts, hits, and time into a ParserProfile's per-pattern counters."""
+
+    __slots__ = ("_compiled", "_counters")
+
+    def __init__(self, compiled, counters):
+        self._compiled = compiled
+        self._counters = counters
+
+    @property
+    def pattern(self):
+        return self._compiled.pattern
+
+    @property
+    def flags(self):
+        return self._compiled.flags
+
+    def search(self, *args):
+        time_start = time.perf_counter()
+        maybe_match = self._compiled.search(*args)
+        counters = self._counters
+        counters[2] += time.perf_counter() - time_start
+        counters[0] += 1
+        if not maybe_match is None:
+            counters[1] += 1
+        return maybe_match
+
+class ParserProfile(object):
+    """
+    Counters and timers of where parsing time goes, recorded by every Parser created while this is active_profile (see enable_profiling()):
+
+    * Per rx_* pattern used by the line classifier: search attempts, hits, and seconds.
+    * Per ParseState: transitions into it.
+    * Calls and inclusive seconds of parse_line, transition, pop_level, and serialization (DFXML or JSON Lines writing, whole or per volume).
+    * Deindented lines that closed levels, and the levels they closed.
+
+    A Parser is instrumented by shadowing its methods with timing wrappers on the instance, so Parsers created while no profile is active run unchanged code.  Profiles from batch worker processes are combined with merge(), from the to_dict() form.
+    """
+
+    def __init__(self):
+        self.input_count = 0
+        #Members and types: pattern name -> [attempts, hits, seconds]
+        self.patterns = dict()
+        #Members and types: ParseState name -> transition count
+        self.transitions = collections.Counter()
+        #Members and types: timer name -> [calls, seconds]
+        self.timers = dict()
+        self.deindent_count = 0
+        self.deindent_pop_count = 0
+        self._line_classifier = None
+
+    def timed(self, name, function):
+        """Returns function, wrapped to add its calls and seconds to timer name."""
+        counters = self.timers.setdefault(name, [0, 0.0])
+        def _timed(*args):
+            time_start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                counters[1] += time.perf_counter() - time_start
+                counters[0] += 1
+        return _timed
+
+    def get_line_classifier(self):
+        """Returns a LineClassifier like get_line_classifier()'s, whose patterns record into this profile."""
+        if self._line_classifier is None:
+            pattern_names = {id(value): name for (name, value) in globals().items() if name.startswith("rx_")}
+            profiled_kind_patterns = []
+            for (kind, regexen, leading_tokens) in line_kind_patterns:
+                profiled_regexen = []
+                for regex in regexen:
+                    counters = self.patterns.setdefault(pattern_names[id(regex)], [0, 0, 0.0])
+                    profiled_regexen.append(ProfiledPattern(compiled_regexen([regex])[0], counters))
+                profiled_kind_patterns.append((kind, profiled_regexen, leading_tokens))
+            self._line_classifier = LineClassifier(profiled_kind_patterns, line_kind_overrides, line_kind_frequencies)
+        return self._line_classifier
+
+    def instrument(self, parser):
+        """Makes parser record into this profile."""
+        self.input_count += 1
+        parser._line_classifier = self.get_line_classifier()
+        parser.parse_line = self.timed("parse_line", parser.parse_line)
+        parser.pop_level = self.timed("pop_level", parser.pop_level)
+
+        timed_transition = self.timed("transition", parser.transition)
+        def _transition(to_state):
+            self.transitions[to_state.name] += 1
+            return timed_transition(to_state)
+        parser.transition = _transition
+
+        pop_deindented_levels = parser.pop_deindented_levels
+        def _pop_deindented_levels():
+            level_count = len(parser._level_stack)
+            pop_deindented_levels()
+            self.deindent_count += 1
+            self.deindent_pop_count += level_count - len(parser._level_stack)
+        parser.pop_deindented_levels = _pop_deindented_levels
+
+        if not parser._volume_callback is None:
+            parser._volume_callback = self.timed("serialization", parser._volume_callback)
+
+    def to_dict(self):
+        return {
+          "input_count": self.input_count,
+          "patterns": {name: {"attempts": counters[0], "hits": counters[1], "seconds": counters[2]} for (name, counters) in self.patterns.items()},
+          "transitions": dict(self.transitions),
+          "timers": {name: {"calls": counters[0], "seconds": counters[1]} for (name, counters) in self.timers.items()},
+          "deindent_count": self.deindent_count,
+          "deindent_pop_count": self.deindent_pop_count
+        }
+
+    def merge(self, profile_dict):
+        """Adds the counts of another profile, in its to_dict() form."""
+        self.input_count += profile_dict["input_count"]
+        for (name, pattern_dict) in profile_dict["patterns"].items():
+            counters = self.patterns.setdefault(name, [0, 0, 0.0])
+            counters[0] += pattern_dict["attempts"]
+            counters[1] += pattern_dict["hits"]
+            counters[2] += pattern_dict["seconds"]
+        self.transitions.update(profile_dict["transitions"])
+        for (name, timer_dict) in profile_dict["timers"].items():
+            counters = self.timers.setdefault(name, [0, 0.0])
+            counters[0] += timer_dict["calls"]
+            counters[1] += timer_dict["seconds"]
+        self.deindent_count += profile_dict["deindent_count"]
+        self.deindent_pop_count += profile_dict["deindent_pop_count"]
+
+    def take(self):
+        """Returns the to_dict() form of the counts, and resets them.  Counters are zeroed in place, so instrumented objects keep recording."""
+        profile_dict = self.to_dict()
+        self.input_count = 0
+        for counters in self.patterns.values():
+            counters[:] = [0, 0, 0.0]
+        self.transitions.clear()
+        for counters in self.timers.values():
+            counters[:] = [0, 0.0]
+        self.deindent_count = 0
+        self.deindent_pop_count = 0
+        return profile_dict
+
+    def write_report(self, out_fh):
+        """Writes a human-readable report: timers, deindents, patterns by time, and transitions by count."""
+        out_fh.write("Parser profile: %d inputs.\n" % self.input_count)
+        for (name, (calls, seconds)) in sorted(self.timers.items()):
+            out_fh.write("  %-14s %10d calls %10.4f s\n" % (name + ":", calls, seconds))
+        out_fh.write("  %-14s %10d lines closed %d levels\n" % ("deindents:", self.deindent_count, self.deindent_pop_count))
+        out_fh.write("Patterns, by time:\n")
+        out_fh.write("  %-42s %10s %10s %10s\n" % ("pattern", "attempts", "hits", "seconds"))
+        for (name, (attempts, hits, seconds)) in sorted(self.patterns.items(), key=lambda item: (-item[1][2], item[0])):
+            if attempts > 0:
+                out_fh.write("  %-42s %10d %10d %10.4f\n" % (name, attempts, hits, seconds))
+        out_fh.write("Transitions into state, by count:\n")
+        for (name, count) in sorted(self.transitions.items(), key=lambda item: (-item[1], item[0])):
+            out_fh.write("  %-42s %10d\n" % (name, count))
+
+#The ParserProfile every new Parser records into, or None (the default) for no profiling.
+active_profile = None
+
+def enable_profiling():
+    """Makes Parsers created from now on record into a new active_profile.  Also used as a batch worker process initializer."""
+    global active_profile
+    active_profile = ParserProfile()
+
+def dfxml_head(dobj):
+    """Returns the XML declaration and the DFXML start tag and root-level elements of dobj, without its volumes or end tag, as text ending in a newline."""
+    dfxml_wrapper = ET.tostring(dobj.to_partial_Element(), encoding="unicode").strip()
+    dfxml_foot = "</dfxml>"
+    #Check for an empty element.
+    if dfxml_wrapper.endswith("/>"):
+        dfxml_head = dfxml_wrapper[:-2].rstrip() + ">"
+    else:
+        dfxml_head = dfxml_wrapper[:-len(dfxml_foot)]
+    return """<?xml version="1.0"?>\n""" + dfxml_head + "\n"
+
+def source_elements(sources, version):
+    """Returns the <source> elements of a DFXMLObject of the given version with the given sources."""
+    if len(sources) == 0:
+        return []
+    #Let Objects.py decide how sources are serialized.
+    sources_dobj = Objects.DFXMLObject(version=version)
+    for source in sources:
+        sources_dobj.sources.append(source)
+    return [el for el in sources_dobj.to_partial_Element() if el.tag == "source" or el.tag.endswith("}source")]
+
+class DFXMLStreamWriter(object):
+    """
+    Writes DFXML one volume at a time, for use as a Parser volume callback.  Each volume is serialized and flushed when its file system level closes, so memory use does not grow with the number of volumes.
+
+    The DFXML header is written with the first volume (or at close(), if there are no volumes), by which point the input file's source and disk image annotations have been read.  Sources and root-level extension elements found after the header was written are written after the last volume.
+    """
+
+    def __init__(self, output_fh):
+        self._output_fh = output_fh
+        self._header_written = False
+        self._sources_written = 0
+        self._externals_written = 0
+
+    def _write_header(self, dobj):
+        self._output_fh.write(dfxml_head(dobj))
+        self._header_written = True
+        self._sources_written = len(dobj.sources)
+        self._externals_written = len(dobj.externals)
+
+    def write_volume(self, dobj, vobj):
+        if not self._header_written:
+            self._write_header(dobj)
+        self._output_fh.write(ET.tostring(vobj.to_Element(), encoding="unicode"))
+        self._output_fh.write("\n")
+        self._output_fh.flush()
+
+    def close(self, dobj):
+        """Writes any late root-level elements of dobj, and the DFXML footer."""
+        if not self._header_written:
+            self._write_header(dobj)
+        for el in source_elements(dobj.sources[self._sources_written:], dobj.version):
+            self._output_fh.write(ET.tostring(el, encoding="unicode"))
+            self._output_fh.write("\n")
+        for el in dobj.externals[self._externals_written:]:
+            self._output_fh.write(ET.tostring(el, encoding="unicode"))
+            self._output_fh.write("\n")
+        self._output_fh.write("</dfxml>\n")
+        self._output_fh.flush()
+
+#Fields of a DFXML extension element that are text, even when they look like integers.  Other integer-looking text and attributes are written to JSON as numbers.
+json_text_fields = frozenset([
+  "ftype_str",
+  "guid",
+  "iso9660extension",
+  "ptype_str",
+  "pstype_str",
+  "uuid"
+])
+
+def json_local_name(tag):
+    """Returns an element tag without its namespace, whether given as a prefix (dfxmlext:uuid) or in Clark notation ({...}uuid)."""
+    return tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+
+def json_value(name, text):
+    if not name in json_text_fields and not text is None and text.lstrip("-").isdigit():
+        return int(text)
+    return text
+
+def element_to_json_value(el):
+    """Returns the JSON value of an extension element: its text if it has no attributes or children; otherwise an object of its attributes and its children's values, by local name."""
+    name = json_local_name(el.tag)
+    if name == "byte_runs":
+        #As in volume_to_json_object(), however many byte runs there are.
+        return [element_to_json_value(child) for child in el]
+    if len(el.attrib) == 0 and len(el) == 0:
+        return json_value(name, el.text)
+    value = dict()
+    for (attribute_name, attribute_value) in el.attrib.items():
+        attribute_name = json_local_name(attribute_name)
+        value[attribute_name] = json_value(attribute_name, attribute_value)
+    for child in el:
+        add_json_member(value, json_local_name(child.tag), element_to_json_value(child))
+    return value
+
+def add_json_member(record, name, value):
+    """Sets record[name] to value, turning the member into a list if name repeats."""
+    if not name in record:
+        record[name] = value
+    elif isinstance(record[name], list):
+        record[name].append(value)
+    else:
+        record[name] = [record[name], value]
+
+def volume_to_json_object(vobj, image_path=None):
+    """Returns a dictionary of a VolumeObject's fields and extension elements, as written by JSONLinesVolumeWriter.  Fields that are not set are omitted."""
+    record = dict()
+    if not image_path is None:
+        record["image_path"] = image_path
+    for prop in [
+      "ftype_str",
+      "partition_offset",
+      "block_size",
+      "block_count"
+    ]:
+        val = getattr(vobj, prop)
+        if not val is None:
+            record[prop] = val
+    if not vobj.byte_runs is None:
+        record["byte_runs"] = [{prop: getattr(br, prop) for prop in ["img_offset", "len"] if not getattr(br, prop) is None} for br in vobj.byte_runs]
+    for el in vobj.externals:
+        add_json_member(record, json_local_name(el.tag), element_to_json_value(el))
+    return record
+
+class JSONLinesVolumeWriter(object):
+    """
+    Writes one compact JSON object per volume, one per line, for use as a Parser volume callback.  Volumes are written straight from the parser's objects, without building or serializing the DFXML document.
+
+    Each object carries the path of the disk image the volume was found in, as disktype reported it on its "---" line; the volume's fields; and its extension elements, keyed by name without the dfxmlext: prefix.
+
+    As with DFXMLStreamWriter, volumes are written in the order their file systems close, so a file system in a boot image comes before the file system holding the image.
+    """
+
+    def __init__(self, output_fh):
+        import json
+        self._output_fh = output_fh
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def write_volume(self, dobj, vobj):
+        #The image a volume is in is the last one named before the volume closed.
+        image_path = dobj.sources[-1] if len(dobj.sources) > 0 else None
+        self._output_fh.write(self._encoder.encode(volume_to_json_object(vobj, image_path)))
+        self._output_fh.write("\n")
+
+    def close(self, dobj):
+        self._output_fh.flush()
+
+#Output formats, by --format name, and the extensions of their batch output files.
+output_format_extensions = {
+  "dfxml": ".dfxml",
+  "jsonl": ".jsonl"
+}
+
+def start_conversion(out_fh, streaming=False, argv=None, output_format="dfxml"):
+    """Returns (parser, finish): a Parser, and a function to call with the parser's resulting DFXMLObject to finish writing output to text file handle out_fh.  argv is passed to the Parser.  output_format is "dfxml", or "jsonl" for JSON Lines (see JSONLinesVolumeWriter), which is always streamed."""
+    if output_format == "jsonl":
+        writer = JSONLinesVolumeWriter(out_fh)
+        (parser, finish) = (Parser(volume_callback=writer.write_volume, argv=argv), writer.close)
+    elif streaming:
+        writer = DFXMLStreamWriter(out_fh)
+        (parser, finish) = (Parser(volume_callback=writer.write_volume, argv=argv), writer.close)
+    else:
+        def _finish(dobj):
+            dobj.print_dfxml(output_fh=out_fh)
+        (parser, finish) = (Parser(argv=argv), _finish)
+    if not active_profile is None:
+        finish = active_profile.timed("serialization", finish)
+    return (parser, finish)
+
+def write_dfxml(in_fh, out_fh, streaming=False, argv=None, output_format="dfxml"):
+    """Parses the disktype output in binary file handle in_fh, and writes DFXML, or output_format, to text file handle out_fh.  argv is passed to the Parser."""
+    (parser, finish) = start_conversion(out_fh, streaming, argv, output_format)
+    finish(parser.parse(in_fh))
+
+def iter_section_offsets(in_bytes):
+    """Yields the offsets of the sections of in_bytes, the disktype output of one or more files, that can be parsed independently: 0, and the start of each '--- ' line that follows a blank line.  A blank line closes all parsing levels, so parsing resumes at each of these offsets as it would at the start of input.  in_bytes can be a bytes-like object, such as an mmap."""
+    yield 0
+    for match in rx_section_boundary.finditer(in_bytes):
+        yield match.end()
+
+def parse_section(in_path, start, end, line_no, deliver_at_close):
+    """
+    Section worker for write_dfxml_sections().  Parses bytes [start, end) of the disktype output file at in_path, where line_no lines precede start.
+
+    Returns (sources, externals, volume events, end state, profile), the arguments to Parser.add_section_result() and the to_dict() form of the active_profile counts taken for this section (None if not profiling).  If deliver_at_close, volumes are listed as they close, as a volume_callback receives them; otherwise, as they are appended to the DFXMLObject.
+    """
+    with open(in_path, "rb") as in_fh:
+        in_fh.seek(start)
+        section_bytes = in_fh.read(end - start)
+    volume_events = []
+    if deliver_at_close:
+        def _record(dobj, vobj):
+            volume_events.append((len(dobj.sources), len(dobj.externals), vobj))
+        parser = Parser(volume_callback=_record)
+    else:
         parser = Parser()
-        dobj = parser.parse(in_fh)
-        dobj.print_dfxml()
+    parser.begin_parse(line_no)
+    for line in io.BytesIO(section_bytes):
+        parser.parse_line(line)
+    end_state = parser._state
+    dobj = parser.end_parse()
+    if not deliver_at_close:
+        volume_events = [(len(dobj.sources), len(dobj.externals), vobj) for vobj in dobj.volumes]
+    profile_dict = None
+    if not active_profile is None:
+        profile_dict = active_profile.take()
+        #The input is counted once, by the Parser merging the sections.
+        profile_dict["input_count"] -= 1
+    return (list(dobj.sources), list(dobj.externals), volume_events, end_state, profile_dict)
+
+def write_dfxml_sections(in_path, out_fh, streaming=False, jobs=2, output_format="dfxml"):
+    """
+    Parses the disktype output file at in_path, which can list many input files (disktype's '--- <path>' sections), on a pool of jobs processes, and writes DFXML, or output_format, to text file handle out_fh.
+
+    The sections (see iter_section_offsets()) are grouped into contiguous chunks, several per process, and parsed in parallel.  Their results are added to one DFXMLObject in input order, so the output is the same as a serial conversion's.  With streaming or JSON Lines output, volumes are written as soon as every earlier chunk is done.
+    """
+    import concurrent.futures
+    import mmap
+
+    with open(in_path, "rb") as in_fh:
+        in_size = os.fstat(in_fh.fileno()).st_size
+        if in_size == 0:
+            write_dfxml(in_fh, out_fh, streaming, output_format=output_format)
+            return
+        with mmap.mmap(in_fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            section_offsets = list(iter_section_offsets(mapped))
+            #Chunk boundaries: a few chunks per process balances uneven section sizes without pickling a result per tiny section.
+            chunk_count = min(len(section_offsets), 4 * jobs)
+            chunk_starts = [section_offsets[len(section_offsets) * chunk_index // chunk_count] for chunk_index in range(chunk_count)]
+            chunk_ends = chunk_starts[1:] + [in_size]
+            line_nos = []
+            line_no = 0
+            for (chunk_start, chunk_end) in zip(chunk_starts, chunk_ends):
+                line_nos.append(line_no)
+                line_no += mapped[chunk_start:chunk_end].count(b"\n")
+    _logger.debug("%d sections, parsed in %d chunks.", len(section_offsets), chunk_count)
+
+    (parser, finish) = start_conversion(out_fh, streaming, output_format=output_format)
+    deliver_at_close = not parser._volume_callback is None
+    parser.begin_parse()
+    initializer = None if active_profile is None else enable_profiling
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+        results = executor.map(parse_section, [in_path] * chunk_count, chunk_starts, chunk_ends, line_nos, [deliver_at_close] * chunk_count)
+        for (sources, externals, volume_events, end_state, profile_dict) in results:
+            parser.add_section_result(sources, externals, volume_events, end_state)
+            #Worker processes profile into their own active_profile, so each chunk's counts are returned with its result.
+            if not profile_dict is None:
+                active_profile.merge(profile_dict)
+    finish(parser.end_parse())
+
+def write_dfxml_from_image(image_path, out_fh, streaming=False, disktype_path="disktype", output_format="dfxml"):
+    """
+    Runs disktype on image_path, and parses its stdout as it is produced, writing DFXML, or output_format, to text file handle out_fh.  No intermediate file is written.
+
+    disktype's exit status is only known once its output is converted, so if disktype fails, subprocess.CalledProcessError is raised after the output is written.  That output may be incomplete, however complete it looks, and should be discarded.
+    """
+    import subprocess
+
+    command = [disktype_path, image_path]
+    _logger.debug("Running: %r.", command)
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as disktype_proc:
+        try:
+            write_dfxml(disktype_proc.stdout, out_fh, streaming, output_format=output_format)
+        except:
+            disktype_proc.kill()
+            raise
+    if disktype_proc.returncode != 0:
+        raise subprocess.CalledProcessError(disktype_proc.returncode, command)
+
+def capture_volumes(in_fh, argv=None):
+    """Parses the disktype output in binary file handle in_fh, and returns (dobj, volumes): the DFXMLObject, which holds no volumes, and a list of (image index, VolumeObject) in the order the volumes' file systems closed.  The image index is the position of the volume's image among the images the output names ('--- <path>' lines), or -1 if it names none.  argv is passed to the Parser."""
+    volumes = []
+    def _record(dobj, vobj):
+        volumes.append((len(dobj.sources) - 1, vobj))
+    dobj = Parser(volume_callback=_record, argv=argv).parse(in_fh)
+    return (dobj, volumes)
+
+def volume_match_key(image_index, vobj):
+    """Returns the key a volume is matched on between two captures of the same media: its image index (see capture_volumes()), its partition byte run, its partition's GUID, and its UUID.  A volume with none of the last three, such as a file system spanning a whole disk image, is keyed on its own byte runs in place of the partition byte run."""
+    partition_byte_run = None
+    guid = None
+    uuid = None
+    for el in vobj.externals:
+        if el.tag == "dfxmlext:partition_byte_run":
+            partition_byte_run = tuple(sorted(el.attrib.items()))
+        elif el.tag == "dfxmlext:guid":
+            guid = el.text
+        elif el.tag == "dfxmlext:uuid":
+            uuid = el.text
+    if partition_byte_run is None and guid is None and uuid is None and not vobj.byte_runs is None:
+        partition_byte_run = tuple((br.img_offset, br.len) for br in vobj.byte_runs)
+    return (image_index, partition_byte_run, guid, uuid)
+
+def diff_capture_volumes(old_volumes, new_volumes):
+    """
+    Compares the volumes of two captures of the same media, as listed by capture_volumes(), and returns (annotation, VolumeObject, original VolumeObject) for each volume that differs.  The annotation is "new" for a volume only in the new capture, "deleted" for one only in the old capture, and "modified" for a volume matched between the captures whose DFXML differs; only a modified volume has an original, its old capture's version.
+
+    Volumes are matched on volume_match_key().  Volumes sharing a key, such as the file systems of an El Torito boot image, are paired in the order they are listed.  New and modified volumes are returned in the new capture's order, followed by the deleted volumes in the old capture's order.
+    """
+    unmatched_old_volumes = collections.defaultdict(collections.deque)
+    for (image_index, vobj) in old_volumes:
+        unmatched_old_volumes[volume_match_key(image_index, vobj)].append(vobj)
+    differences = []
+    for (image_index, vobj) in new_volumes:
+        candidates = unmatched_old_volumes.get(volume_match_key(image_index, vobj))
+        if not candidates:
+            differences.append(("new", vobj, None))
+            continue
+        original_vobj = candidates.popleft()
+        if ET.tostring(vobj.to_Element()) != ET.tostring(original_vobj.to_Element()):
+            differences.append(("modified", vobj, original_vobj))
+    deleted_volume_ids = set(id(vobj) for candidates in unmatched_old_volumes.values() for vobj in candidates)
+    for (image_index, vobj) in old_volumes:
+        if id(vobj) in deleted_volume_ids:
+            differences.append(("deleted", vobj, None))
+    return differences
+
+#Differential DFXML annotations of volumes, as attributes of their <volume> elements.
+volume_delta_attributes = {
+  "deleted": "delta:deleted_volume",
+  "modified": "delta:modified_volume",
+  "new": "delta:new_volume"
+}
+
+def write_differential_dfxml(old_in_fh, new_in_fh, out_fh, argv=None):
+    """
+    Parses two disktype outputs of the same media, an earlier capture in binary file handle old_in_fh and a later one in new_in_fh, and writes DFXML of only the volumes that differ between them (see diff_capture_volumes()) to text file handle out_fh.  argv is passed to the Parsers.
+
+    As in differential DFXML, each volume is annotated with a delta:new_volume, delta:deleted_volume or delta:modified_volume attribute, and a modified volume holds its earlier version in a <delta:original_volume> element.  The sources and root-level extension elements are the later capture's.  Two captures with no volume changes give DFXML with no volumes.
+    """
+    (old_dobj, old_volumes) = capture_volumes(old_in_fh, argv)
+    (dobj, new_volumes) = capture_volumes(new_in_fh, argv)
+    dobj.add_namespace("delta", XMLNS_DELTA)
+    out_fh.write(dfxml_head(dobj))
+    for (annotation, vobj, original_vobj) in diff_capture_volumes(old_volumes, new_volumes):
+        vel = vobj.to_Element()
+        vel.set(volume_delta_attributes[annotation], "1")
+        if not original_vobj is None:
+            original_el = ET.SubElement(vel, "delta:original_volume")
+            original_el.append(original_vobj.to_Element())
+        out_fh.write(ET.tostring(vel, encoding="unicode"))
+        out_fh.write("\n")
+    out_fh.write("</dfxml>\n")
+    out_fh.flush()
+
+class DFXMLCache(object):
+    """
+    On-disk cache of converted DFXML, or other output formats, keyed on a hash of the disktype output bytes, the output mode and format, this script's version, and the Objects.py and dfxml.py versions.  Each entry is a file in cache_dir, named with its output format's extension.  When the entries total more than max_bytes, the least recently used are removed, down to seven eighths of max_bytes; a hit refreshes an entry's modification time, which serves as its last-use time.
+
+    An entry holds the output of the run that stored it.  The DFXML creator's program name and command line differ between runs, so they are re-stamped on a hit instead of being part of the key.  JSON Lines output records no creator, so it is returned as stored.
+
+    The entries' sizes and last-use times are kept in memory, oldest first, so storing an entry costs no scan of cache_dir.  The directory is scanned once when the cache is made, and again only when the entries the cache knows of total more than max_bytes, to count entries other processes stored or removed before evicting.
+
+    The cache is safe to share between concurrent processes: entries are written to temporary files and renamed into place, an entry evicted by another process is treated as a miss, and an entry another process used since the last scan is kept.  Passed to a worker process, a DFXMLCache is replaced by the worker's own for the same cache_dir (see get_dfxml_cache()).
+    """
+
+    rx_program = LazyPattern(r"<program>[^<]*</program>")
+    rx_command_line = LazyPattern(r"<command_line>[^<]*</command_line>")
+
+    def __init__(self, cache_dir, max_bytes=2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def __reduce__(self):
+        #Pickled for a worker process, only the cache's parameters travel; the in-memory index is the worker's own.
+        return (get_dfxml_cache, (self.cache_dir, self.max_bytes))
+
+    def _scan(self):
+        """Rebuilds the in-memory index from cache_dir."""
+        entry_list = []
+        entry_extensions = tuple(output_format_extensions.values())
+        for dirent in os.scandir(self.cache_dir):
+            if not dirent.name.endswith(entry_extensions):
+                continue
+            try:
+                stat_result = dirent.stat()
+            except FileNotFoundError:
+                continue
+            entry_list.append((stat_result.st_mtime, stat_result.st_size, dirent.path))
+        entry_list.sort()
+        #(mtime, size) by entry path, least recently used first.
+        self._entries = collections.OrderedDict((entry_path, (mtime, size)) for (mtime, size, entry_path) in entry_list)
+        self._total_bytes = sum(size for (mtime, size, entry_path) in entry_list)
+
+    def _touch(self, entry_path):
+        """Records in the index that the entry at entry_path was just stored or used."""
+        stat_result = os.stat(entry_path)
+        if entry_path in self._entries:
+            self._total_bytes -= self._entries.pop(entry_path)[1]
+        self._entries[entry_path] = (stat_result.st_mtime, stat_result.st_size)
+        self._total_bytes += stat_result.st_size
+
+    def key(self, in_bytes, streaming=False, output_format="dfxml"):
+        import hashlib
+
+        #Streaming output places late partition system annotations differently, so the output mode is part of the key, as is the output format.
+        hasher = hashlib.sha256()
+        for version_part in [__version__, Objects.__version__, Objects.dfxml.__version__, "streaming" if streaming else "whole", output_format]:
+            hasher.update(str(version_part).encode("utf-8") + b"\0")
+        hasher.update(in_bytes)
+        return hasher.hexdigest()
+
+    def _entry_path(self, key, output_format="dfxml"):
+        return os.path.join(self.cache_dir, key + output_format_extensions[output_format])
+
+    def get(self, key, argv=None, output_format="dfxml"):
+        """Returns the cached output_format text for key, or None on a miss.  DFXML is re-stamped for this run (or for argv, if given, as Parser does)."""
+        import xml.sax.saxutils
+
+        entry_path = self._entry_path(key, output_format)
+        try:
+            with open(entry_path, "r") as entry_fh:
+                dfxml_text = entry_fh.read()
+            os.utime(entry_path)
+            self._touch(entry_path)
+        except FileNotFoundError:
+            self._forget(entry_path)
+            return None
+        _logger.debug("Cache hit: %r.", entry_path)
+        if output_format != "dfxml":
+            return dfxml_text
+        #Stamp the creator as Parser.begin_parse() would for this run.  Only the first occurrences are the creator's; volumes have no such elements.
+        if argv is None:
+            argv = sys.argv
+        dfxml_text = self.rx_program.sub(lambda m: "<program>%s</program>" % xml.sax.saxutils.escape(os.path.basename(argv[0])), dfxml_text, count=1)
+        dfxml_text = self.rx_command_line.sub(lambda m: "<command_line>%s</command_line>" % xml.sax.saxutils.escape(" ".join(argv)), dfxml_text, count=1)
+        return dfxml_text
+
+    def put(self, key, write_function, output_format="dfxml"):
+        """Stores the DFXML, or output_format text, that write_function writes to the text file handle it is passed, evicts entries past the size bound, and returns the stored text."""
+        import tempfile
+
+        (temp_fd, temp_path) = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with open(temp_fd, "w") as temp_fh:
+                write_function(temp_fh)
+            with open(temp_path, "r") as temp_fh:
+                dfxml_text = temp_fh.read()
+            entry_path = self._entry_path(key, output_format)
+            os.replace(temp_path, entry_path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        try:
+            self._touch(entry_path)
+        except FileNotFoundError:
+            #Already evicted by another process.
+            self._forget(entry_path)
+        self.evict()
+        return dfxml_text
+
+    def _forget(self, entry_path):
+        if entry_path in self._entries:
+            self._total_bytes -= self._entries.pop(entry_path)[1]
+
+    def evict(self):
+        """If the entries total more than max_bytes, rescans cache_dir, and removes least recently used entries until the entries total at most seven eighths of max_bytes.  The slack spares the next several stores a rescan."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        self._scan()
+        while self._total_bytes > self.max_bytes - self.max_bytes // 8 and len(self._entries) > 0:
+            (entry_path, (mtime, size)) = next(iter(self._entries.items()))
+            try:
+                stat_result = os.stat(entry_path)
+            except FileNotFoundError:
+                self._forget(entry_path)
+                continue
+            if stat_result.st_mtime > mtime:
+                #Used by another process since the index last saw it.
+                self._forget(entry_path)
+                self._entries[entry_path] = (stat_result.st_mtime, stat_result.st_size)
+                self._total_bytes += stat_result.st_size
+                continue
+            _logger.debug("Evicting cache entry: %r.", entry_path)
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            self._forget(entry_path)
+
+#DFXMLCaches by cache directory and size bound.  Each process keeps its own, so a worker's index persists across the inputs it converts.
+_dfxml_caches = dict()
+
+def get_dfxml_cache(cache_dir, max_bytes=2**30):
+    if not (cache_dir, max_bytes) in _dfxml_caches:
+        _dfxml_caches[(cache_dir, max_bytes)] = DFXMLCache(cache_dir, max_bytes)
+    return _dfxml_caches[(cache_dir, max_bytes)]
+
+def write_dfxml_from_bytes(in_bytes, out_fh, streaming=False, cache=None, argv=None, output_format="dfxml"):
+    """Parses the disktype output in in_bytes, and writes DFXML, or output_format, to text file handle out_fh, recording argv as the creator's command line (see Parser).  If cache, a DFXMLCache, is given, DFXML converted before from identical input is reused; on a miss, the DFXML is written to out_fh once the conversion is stored."""
+    if cache is None:
+        write_dfxml(io.BytesIO(in_bytes), out_fh, streaming, argv, output_format)
+        return
+    key = cache.key(in_bytes, streaming, output_format)
+    dfxml_text = cache.get(key, argv, output_format)
+    if dfxml_text is None:
+        dfxml_text = cache.put(key, lambda cache_fh: write_dfxml(io.BytesIO(in_bytes), cache_fh, streaming, argv, output_format), output_format)
+    out_fh.write(dfxml_text)
+
+def write_dfxml_from_path(in_path, out_fh, streaming=False, cache=None, output_format="dfxml", jobs=1):
+    """Parses the disktype output file at in_path, and writes DFXML, or output_format, to text file handle out_fh, using cache as write_dfxml_from_bytes() does.  Without a cache, if jobs is more than 1, the file's sections are parsed on that many processes (see write_dfxml_sections())."""
+    if cache is None and jobs > 1:
+        write_dfxml_sections(in_path, out_fh, streaming, jobs, output_format)
+        return
+    with open(in_path, "rb") as in_fh:
+        if cache is None:
+            write_dfxml(in_fh, out_fh, streaming, output_format=output_format)
+            return
+        in_bytes = in_fh.read()
+    write_dfxml_from_bytes(in_bytes, out_fh, streaming, cache, output_format=output_format)
+
+def convert_file(in_path, out_path, streaming=False, cache=None, output_format="dfxml"):
+    """Converts one disktype output file to a DFXML, or output_format, file.  The output is written to a temporary file that is renamed into place, so a failed conversion leaves no partial output."""
+    temp_out_path = out_path + ".tmp"
+    try:
+        with open(temp_out_path, "w") as out_fh:
+            write_dfxml_from_path(in_path, out_fh, streaming, cache, output_format)
+        os.replace(temp_out_path, out_path)
+    except:
+        if os.path.exists(temp_out_path):
+            os.remove(temp_out_path)
+        raise
+
+def convert_batch_item(in_path, out_path, streaming=False, cache=None, output_format="dfxml"):
+    """Batch worker.  Returns (in_path, out_path, error message, profile); the error message is None on success, and profile is the to_dict() form of the active_profile counts taken for this input, or None if not profiling."""
+    error_message = None
+    try:
+        convert_file(in_path, out_path, streaming, cache, output_format)
+    except Exception as e:
+        _logger.debug("Conversion failure on %r.", in_path, exc_info=True)
+        error_message = "%s: %s" % (type(e).__name__, e)
+    profile_dict = None if active_profile is None else active_profile.take()
+    return (in_path, out_path, error_message, profile_dict)
+
+def file_sha256(path):
+    """Returns the hexadecimal SHA-256 digest of the file at path, read in blocks."""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as in_fh:
+        for block in iter(lambda: in_fh.read(2**20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+class BatchJournal(object):
+    """
+    Append-only journal of batch conversions, so a batch run that dies partway can be rerun to convert only what is left, and concurrent batch runs over the same inputs can share the work.  The journal is a JSON Lines file of entries for inputs, each with the input's absolute "path", a "status", and the "host", "pid" and "time" of the worker that wrote it:
+
+    * "claimed": the worker started converting the input.
+    * "done" or "failed": the worker finished converting the input.  The entry records the input's "size", "mtime_ns" and "sha256" (its SHA-256 digest, or null if it could not be read) as they were before the conversion, the absolute "output" path, and, on failure, the "error" message.
+
+    A worker claims an input (see claim()) while holding an exclusive lock on the journal, after reading the entries appended since it last held the lock, so no two workers claim an input at once.  Entries are only appended, and completions are synced to disk, so a crash loses at most the conversions in flight.  A line torn by a crash mid-write is skipped.
+    """
+
+    def __init__(self, journal_path, lease_seconds=3600):
+        import json
+        import socket
+
+        self.journal_path = journal_path
+        self.lease_seconds = lease_seconds
+        self._encoder = json.JSONEncoder(ensure_ascii=False, sort_keys=True)
+        self._decoder = json.JSONDecoder()
+        self._host = socket.gethostname()
+        #Appending, and reading from self._offset, the length of the journal read so far.
+        self._journal_fh = open(journal_path, "a+b")
+        self._offset = 0
+        #Latest entry per input path, of the journal read so far.
+        self._latest_entries = dict()
+
+    def _read_new_entries(self):
+        """Reads the entries appended since the last read.  Call with the journal locked.  A torn last line is left unread."""
+        self._journal_fh.seek(self._offset)
+        new_bytes = self._journal_fh.read()
+        complete_length = new_bytes.rfind(b"\n") + 1
+        for line in new_bytes[:complete_length].splitlines():
+            try:
+                entry = self._decoder.decode(line.decode("utf-8", "surrogateescape"))
+                self._latest_entries[entry["path"]] = entry
+            except (ValueError, KeyError, TypeError):
+                _logger.warning("Skipping unreadable line of journal %r: %r.", self.journal_path, line)
+        self._offset += complete_length
+
+    def _append(self, entry, sync=False):
+        """Appends entry, stamped with this worker and the time.  Call with the journal locked, after _read_new_entries()."""
+        entry["host"] = self._host
+        entry["pid"] = os.getpid()
+        entry["time"] = time.time()
+        line_bytes = self._encoder.encode(entry).encode("utf-8", "surrogateescape") + b"\n"
+        if self._offset < self._journal_fh.seek(0, os.SEEK_END):
+            #Terminate a torn line, so it doesn't swallow this entry.
+            line_bytes = b"\n" + line_bytes
+        self._journal_fh.write(line_bytes)
+        self._journal_fh.flush()
+        if sync:
+            os.fsync(self._journal_fh.fileno())
+
+    def _lock(self):
+        import fcntl
+        fcntl.lockf(self._journal_fh, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        import fcntl
+        fcntl.lockf(self._journal_fh, fcntl.LOCK_UN)
+
+    def claim_is_live(self, entry):
+        """Returns whether a "claimed" entry still holds its input: until lease_seconds have passed, or, for a claim made on this host, until the claiming process has exited."""
+        if time.time() - entry["time"] >= self.lease_seconds:
+            return False
+        if entry["host"] != self._host:
+            return True
+        try:
+            os.kill(entry["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _is_converted(self, entry, in_path, out_path, stat_result):
+        """Returns whether entry records converting the input file at in_path, as it is now (per stat_result), to out_path, which still exists."""
+        if entry["status"] != "done" or entry["output"] != out_path or entry["size"] != stat_result.st_size:
+            return False
+        if not os.path.exists(out_path):
+            return False
+        if entry["mtime_ns"] == stat_result.st_mtime_ns:
+            return True
+        #A touched or copied input with the same content needs no conversion.
+        return entry["sha256"] == file_sha256(in_path)
+
+    def claim(self, in_path, out_path, stat_result):
+        """Claims the input file at in_path, with os.stat() result stat_result, for conversion to out_path.  Returns None if claimed, or otherwise (status, message), the journal status of the entry the input is skipped for and why: "claimed", if the journal records a live claim of it by another worker, whose outcome is not yet known; or "done", if it records its conversion to out_path since it last changed.  Failed conversions are retried."""
+        (in_path, out_path) = (os.path.abspath(in_path), os.path.abspath(out_path))
+        self._lock()
+        try:
+            self._read_new_entries()
+            entry = self._latest_entries.get(in_path)
+            if not entry is None:
+                if entry["status"] == "claimed" and self.claim_is_live(entry):
+                    return ("claimed", "Claimed by process %d on %s." % (entry["pid"], entry["host"]))
+                if self._is_converted(entry, in_path, out_path, stat_result):
+                    return ("done", "Converted to %s before." % out_path)
+            self._append({"path": in_path, "status": "claimed"})
+        finally:
+            self._unlock()
+        return None
+
+    def record(self, in_path, out_path, stat_result, content_hash, error_message):
+        """Records the end of a claimed conversion: done if error_message is None, failed otherwise.  stat_result and content_hash describe the input before the conversion."""
+        entry = {
+          "path": os.path.abspath(in_path),
+          "status": "done" if error_message is None else "failed",
+          "size": stat_result.st_size,
+          "mtime_ns": stat_result.st_mtime_ns,
+          "sha256": content_hash,
+          "output": os.path.abspath(out_path)
+        }
+        if not error_message is None:
+            entry["error"] = error_message
+        self._lock()
+        try:
+            self._read_new_entries()
+            self._append(entry, sync=True)
+        finally:
+            self._unlock()
+
+#BatchJournals by journal path.  Each process keeps its own, so a worker reads only the entries appended since its last claim.
+_batch_journals = dict()
+
+def get_batch_journal(journal_path, lease_seconds=3600):
+    if not journal_path in _batch_journals:
+        _batch_journals[journal_path] = BatchJournal(journal_path, lease_seconds)
+    return _batch_journals[journal_path]
+
+def convert_journaled_batch_item(journal_path, lease_seconds, in_path, out_path, streaming=False, cache=None, output_format="dfxml"):
+    """Batch worker for a batch journaled in journal_path (see BatchJournal).  Claims the input, converts it as convert_batch_item() does, and records the outcome.  Returns convert_batch_item()'s result with one more member, the (status, message) BatchJournal.claim() returned if the input was skipped, or None if it was not.  Inputs the journal says to skip are not converted."""
+    journal = get_batch_journal(journal_path, lease_seconds)
+    try:
+        stat_result = os.stat(in_path)
+    except OSError as e:
+        return (in_path, out_path, "%s: %s" % (type(e).__name__, e), None, None)
+    skip = journal.claim(in_path, out_path, stat_result)
+    if not skip is None:
+        return (in_path, out_path, None, None, skip)
+    try:
+        content_hash = file_sha256(in_path)
+    except OSError:
+        #The conversion will fail, and report why.
+        content_hash = None
+    result = convert_batch_item(in_path, out_path, streaming, cache, output_format)
+    journal.record(in_path, out_path, stat_result, content_hash, result[2])
+    return result + (None,)
+
+def image_group(dobj):
+    """Returns (image path, DFXML text, volume count) for dobj, the DFXMLObject parsed from one section of disktype output (see iter_section_offsets()).  The text holds dobj's <source> elements, its root-level extension elements, and its volumes, each volume tagged with a dfxmlext:image_path element naming the image it was found in.  The image path is None if the section named no image."""
+    image_path = dobj.sources[-1] if len(dobj.sources) > 0 else None
+    pieces = []
+    for el in source_elements(dobj.sources, dobj.version):
+        pieces.append(ET.tostring(el, encoding="unicode"))
+    for el in dobj.externals:
+        pieces.append(ET.tostring(el, encoding="unicode"))
+    volume_count = 0
+    for vobj in dobj.volumes:
+        vel = vobj.to_Element()
+        if not image_path is None:
+            image_path_el = ET.SubElement(vel, "dfxmlext:image_path")
+            image_path_el.text = image_path
+        pieces.append(ET.tostring(vel, encoding="unicode"))
+        volume_count += 1
+    return (image_path, "".join(piece + "\n" for piece in pieces), volume_count)
+
+def convert_shard_item(in_path):
+    """Shard batch worker.  Returns (in_path, image groups, error message, profile): the image_group() of each section of the disktype output file at in_path that names an image or holds a volume, in input order; the error message, None on success; and profile as convert_batch_item() returns it."""
+    image_groups = []
+    error_message = None
+    parser_count = 0
+    try:
+        with open(in_path, "rb") as in_fh:
+            in_bytes = in_fh.read()
+        section_offsets = list(iter_section_offsets(in_bytes))
+        line_no = 0
+        for (start, end) in zip(section_offsets, section_offsets[1:] + [len(in_bytes)]):
+            parser_count += 1
+            dobj = Parser().parse(io.BytesIO(in_bytes[start:end]), line_no)
+            line_no += in_bytes.count(b"\n", start, end)
+            if len(dobj.sources) > 0 or len(dobj.volumes) > 0:
+                image_groups.append(image_group(dobj))
+    except Exception as e:
+        _logger.debug("Conversion failure on %r.", in_path, exc_info=True)
+        (image_groups, error_message) = ([], "%s: %s" % (type(e).__name__, e))
+    profile_dict = None
+    if not active_profile is None:
+        profile_dict = active_profile.take()
+        #The input is counted once, not once per section.
+        profile_dict["input_count"] -= max(parser_count - 1, 0)
+    return (in_path, image_groups, error_message, profile_dict)
+
+class DFXMLShardWriter(object):
+    """
+    Writes batch conversion results into DFXML shard files in shard_dir.  Each shard is a complete DFXML document holding the volumes of the disk images of several inputs, so a whole collection can be converted into a few files while holding only one input's results in memory.
+
+    A shard is written as shard-NNNNNN.dfxml.tmp, and closed and renamed into place once it holds max_bytes or more, or max_inputs inputs.  An input's results are never split across shards.  Numbering continues after the shards already in shard_dir.
+
+    Once a shard is complete, and before it is renamed, one JSON object per disk image in it is appended to the index, index.jsonl, and synced to disk: the batch input path ("input"); the image path from disktype's "---" line ("image"); the shard file name ("shard"); the byte offset and length of the image's elements in the shard ("offset", "length"); the byte length of the shard's DFXML header ("head_length"); and the image's volume count ("volumes").  So every shard in place has its index entries.  A crash between the two steps leaves index entries for a shard that was never renamed; those are ignored (see read_shard_index()), and numbering also continues after them, so no later shard takes the missing shard's name.  See fetch_shard_image().
+    """
+
+    index_file_name = "index.jsonl"
+
+    def __init__(self, shard_dir, max_bytes=2**28, max_inputs=None, argv=None):
+        import json
+        self._encoder = json.JSONEncoder(ensure_ascii=False, sort_keys=True)
+        self._shard_dir = shard_dir
+        self._max_bytes = max_bytes
+        self._max_inputs = max_inputs
+        self._head = dfxml_head(make_dfxml_object(sys.argv if argv is None else argv)).encode("utf-8")
+        os.makedirs(shard_dir, exist_ok=True)
+        shard_names = [dirent_name for dirent_name in os.listdir(shard_dir) if rx_shard_file_name.fullmatch(dirent_name)]
+        shard_names += [entry["shard"] for entry in read_shard_index(shard_dir, only_present=False)]
+        self._shard_number = max([int(shard_name[len("shard-"):-len(".dfxml")]) for shard_name in shard_names], default=0)
+        self._shard_fh = None
+
+    def _shard_path(self):
+        return os.path.join(self._shard_dir, "shard-%06d.dfxml" % self._shard_number)
+
+    def _open_shard(self):
+        self._shard_number += 1
+        self._shard_fh = open(self._shard_path() + ".tmp", "wb")
+        self._shard_fh.write(self._head)
+        self._shard_input_count = 0
+        #Index entries of the open shard, written just before it is renamed into place.
+        self._shard_entries = []
+
+    def _close_shard(self):
+        self._shard_fh.write(b"</dfxml>\n")
+        self._shard_fh.flush()
+        os.fsync(self._shard_fh.fileno())
+        self._shard_fh.close()
+        self._shard_fh = None
+        with open(os.path.join(self._shard_dir, self.index_file_name), "a", encoding="utf-8") as index_fh:
+            for entry in self._shard_entries:
+                index_fh.write(self._encoder.encode(entry))
+                index_fh.write("\n")
+            index_fh.flush()
+            os.fsync(index_fh.fileno())
+        os.replace(self._shard_path() + ".tmp", self._shard_path())
+
+    def write_input(self, in_path, image_groups):
+        """Appends the image groups of one input (see convert_shard_item()) to the open shard, opening a shard if none is open.  Returns the path the shard will have once it is closed."""
+        if self._shard_fh is None:
+            self._open_shard()
+        shard_path = self._shard_path()
+        for (image_path, group_text, volume_count) in image_groups:
+            group_bytes = group_text.encode("utf-8")
+            self._shard_entries.append({
+              "input": in_path,
+              "image": image_path,
+              "shard": os.path.basename(shard_path),
+              "offset": self._shard_fh.tell(),
+              "length": len(group_bytes),
+              "head_length": len(self._head),
+              "volumes": volume_count
+            })
+            self._shard_fh.write(group_bytes)
+        self._shard_input_count += 1
+        if self._shard_fh.tell() >= self._max_bytes or (not self._max_inputs is None and self._shard_input_count >= self._max_inputs):
+            self._close_shard()
+        return shard_path
+
+    def close(self):
+        """Closes the open shard, if any."""
+        if not self._shard_fh is None:
+            self._close_shard()
+
+def read_shard_index(shard_dir, only_present=True):
+    """Returns the entries of the shard index in shard_dir (see DFXMLShardWriter), in the order they were written, or an empty list if there is no index yet.  If only_present, entries for shards that are not in shard_dir, left by a run that crashed before renaming a shard into place, are left out."""
+    import json
+    try:
+        with open(os.path.join(shard_dir, DFXMLShardWriter.index_file_name), "r", encoding="utf-8") as index_fh:
+            entries = [json.loads(line) for line in index_fh if line.strip() != ""]
+    except FileNotFoundError:
+        return []
+    if only_present:
+        present_shard_names = set(dirent_name for dirent_name in os.listdir(shard_dir) if rx_shard_file_name.fullmatch(dirent_name))
+        entries = [entry for entry in entries if entry["shard"] in present_shard_names]
+    return entries
+
+def fetch_shard_image(shard_dir, path):
+    """
+    Returns, as text, a DFXML document holding the elements stored in the shards in shard_dir (see DFXMLShardWriter) for path, which is a disk image path as disktype named it, or a batch input path.  The shard index gives where the elements are, so no shard is scanned.
+
+    If path was converted in several runs, the latest run's conversion is returned.  Raises KeyError if the index has no entry for path in a shard that is in place.
+    """
+    entries = [entry for entry in read_shard_index(shard_dir) if path in (entry["image"], entry["input"])]
+    if len(entries) == 0:
+        raise KeyError(path)
+    latest_shard = entries[-1]["shard"]
+    entries = [entry for entry in entries if entry["shard"] == latest_shard]
+    pieces = []
+    with open(os.path.join(shard_dir, latest_shard), "rb") as shard_fh:
+        pieces.append(shard_fh.read(entries[0]["head_length"]))
+        for entry in entries:
+            shard_fh.seek(entry["offset"])
+            pieces.append(shard_fh.read(entry["length"]))
+    pieces.append(b"</dfxml>\n")
+    return b"".join(pieces).decode("utf-8")
+
+def iter_batch_input_paths(paths, file_list_path=None):
+    """Yields the input file paths for a batch.  Directories in paths contribute their *.txt files.  file_list_path, if given, names a file listing one input path per line."""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirent_name in sorted(os.listdir(path)):
+                if dirent_name.endswith(".txt"):
+                    yield os.path.join(path, dirent_name)
+        else:
+            yield path
+    if not file_list_path is None:
+        with open(file_list_path, "r") as file_list_fh:
+            for line in file_list_fh:
+                path = line.rstrip("\n")
+                if path != "":
+                    yield path
+
+def batch_output_path(output_dir, in_path, extension=".dfxml"):
+    """Returns the output path for a batch input: the input's base name, with a .txt extension replaced by extension."""
+    in_basename = os.path.basename(in_path)
+    if in_basename.endswith(".txt"):
+        in_basename = in_basename[:-len(".txt")]
+    return os.path.join(output_dir, in_basename + extension)
+
+def batch_output_paths(output_dir, in_paths, extension=".dfxml"):
+    """Returns the list of output paths for in_paths.  Raises ValueError if two inputs would be written to the same path."""
+    out_paths = []
+    out_path_to_in_path = dict()
+    for in_path in in_paths:
+        out_path = batch_output_path(output_dir, in_path, extension)
+        if out_path in out_path_to_in_path:
+            raise ValueError("Inputs %r and %r would both be written to %r." % (out_path_to_in_path[out_path], in_path, out_path))
+        out_path_to_in_path[out_path] = in_path
+        out_paths.append(out_path)
+    return out_paths
+
+class BatchReport(object):
+    """
+    Reports batch results, as (in_path, out_path, error message) tuples, on stderr as they arrive.  A fifth tuple member, if given and not None, is the journal status and reason the input was skipped (see convert_journaled_batch_item()).  Further tuple members are ignored.
+
+    An input skipped because it was converted before is reported as SKIPPED.  An input skipped because another run holds a live claim on it is reported as IN_PROGRESS_ELSEWHERE: that run may yet fail it, so this batch cannot confirm it converted.
+    """
+    def __init__(self):
+        self.input_count = 0
+        self.failure_count = 0
+        self.skip_count = 0
+        self.elsewhere_count = 0
+
+    def report(self, result):
+        (in_path, out_path, error_message) = result[:3]
+        skip = result[4] if len(result) > 4 else None
+        self.input_count += 1
+        if not skip is None:
+            (skip_status, skip_message) = skip
+            if skip_status == "claimed":
+                self.elsewhere_count += 1
+                sys.stderr.write("IN_PROGRESS_ELSEWHERE\t%s\t%s\n" % (in_path, skip_message))
+            else:
+                self.skip_count += 1
+                sys.stderr.write("SKIPPED\t%s\t%s\n" % (in_path, skip_message))
+        elif error_message is None:
+            sys.stderr.write("OK\t%s\t%s\n" % (in_path, out_path))
+        else:
+            self.failure_count += 1
+            sys.stderr.write("FAILED\t%s\t%s\n" % (in_path, error_message))
+
+    def finish(self):
+        """Writes the summary line.  Returns the process exit status: 0 if every input converted, or was converted before; 1 if any failed; otherwise, if any are in progress in another run, 75 (EX_TEMPFAIL of sysexits.h), as they are not yet confirmed converted."""
+        summary = "%d of %d inputs converted; %d failed" % (self.input_count - self.failure_count - self.skip_count - self.elsewhere_count, self.input_count, self.failure_count)
+        if self.skip_count > 0:
+            summary += "; %d skipped" % self.skip_count
+        if self.elsewhere_count > 0:
+            summary += "; %d in progress elsewhere, not confirmed converted" % self.elsewhere_count
+        sys.stderr.write(summary + ".\n")
+        if self.failure_count > 0:
+            return 1
+        if self.elsewhere_count > 0:
+            return 75
+        return 0
+
+def make_cache():
+    """Returns the DFXMLCache requested by --cache-dir, or None."""
+    if args.cache_dir is None:
+        return None
+    return get_dfxml_cache(args.cache_dir, args.cache_max_bytes)
+
+def batch_main():
+    """Converts every batch input to its own DFXML file in args.output_dir, reporting each input's outcome on stderr.  With --journal, inputs are claimed and recorded in the journal (see BatchJournal).  Returns the process exit status, per BatchReport.finish()."""
+    import concurrent.futures
+
+    in_paths = list(iter_batch_input_paths(args.disktype_out_txt, args.file_list))
+    try:
+        out_paths = batch_output_paths(args.output_dir, in_paths, output_format_extensions[args.format])
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    cache = make_cache()
+    #A journaled batch's worker takes the journal path and lease before the usual arguments.
+    if args.journal is None:
+        (convert_item, journal_args) = (convert_batch_item, ())
+    else:
+        (convert_item, journal_args) = (convert_journaled_batch_item, (args.journal, args.journal_lease))
+    report = BatchReport()
+    def _report(result):
+        report.report(result)
+        #Worker processes profile into their own active_profile, so each input's counts are returned with its result.
+        if not result[3] is None:
+            active_profile.merge(result[3])
+
+    if args.jobs == 1:
+        for (in_path, out_path) in zip(in_paths, out_paths):
+            _report(convert_item(*journal_args, in_path, out_path, args.streaming, cache, args.format))
+    else:
+        initializer = None if active_profile is None else enable_profiling
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, initializer=initializer) as executor:
+            #As in shard_batch_main(), at most a window of inputs is in flight, so pending work does not grow with the number of inputs.
+            pending_paths = collections.deque(zip(in_paths, out_paths))
+            futures = set()
+            while len(futures) > 0 or len(pending_paths) > 0:
+                while len(pending_paths) > 0 and len(futures) < 2 * args.jobs:
+                    (in_path, out_path) = pending_paths.popleft()
+                    futures.add(executor.submit(convert_item, *journal_args, in_path, out_path, args.streaming, cache, args.format))
+                (done_futures, futures) = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done_futures:
+                    _report(future.result())
+    return report.finish()
+
+def shard_batch_main():
+    """Converts every batch input into the DFXML shards in args.shard_dir (see DFXMLShardWriter), reporting each input's outcome on stderr.  Returns the process exit status as batch_main() does."""
+    import concurrent.futures
+
+    in_paths = list(iter_batch_input_paths(args.disktype_out_txt, args.file_list))
+    writer = DFXMLShardWriter(args.shard_dir, args.shard_max_bytes, args.shard_max_inputs)
+    report = BatchReport()
+    def _write(result):
+        (in_path, image_groups, error_message, profile_dict) = result
+        shard_path = None
+        if error_message is None:
+            shard_path = writer.write_input(in_path, image_groups)
+        report.report((in_path, shard_path, error_message))
+        if not profile_dict is None:
+            active_profile.merge(profile_dict)
+
+    try:
+        if args.jobs == 1:
+            for in_path in in_paths:
+                _write(convert_shard_item(in_path))
+        else:
+            initializer = None if active_profile is None else enable_profiling
+            with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, initializer=initializer) as executor:
+                #At most a window of inputs is in flight, and results are written and dropped as they complete, so memory use does not grow with the number of inputs.
+                pending_in_paths = collections.deque(in_paths)
+                futures = set()
+                while len(futures) > 0 or len(pending_in_paths) > 0:
+                    while len(pending_in_paths) > 0 and len(futures) < 2 * args.jobs:
+                        futures.add(executor.submit(convert_shard_item, pending_in_paths.popleft()))
+                    (done_futures, futures) = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done_futures:
+                        _write(future.result())
+    finally:
+        writer.close()
+    return report.finish()
+
+def shard_fetch_main():
+    try:
+        sys.stdout.write(fetch_shard_image(args.shard_dir, args.shard_fetch))
+    except KeyError:
+        sys.stderr.write("%s: Not in the shard index of %s.\n" % (args.shard_fetch, args.shard_dir))
+        return 1
+    return 0
+
+async def convert_image_async(image_path, out_path, streaming=False, disktype_path="disktype", output_format="dfxml"):
+    """Runs disktype on image_path as an asyncio subprocess, feeding its stdout to a Parser as it arrives, and writes DFXML, or output_format, to out_path.  As with convert_file(), the DFXML is written to a temporary file that is renamed into place."""
+    import asyncio
+    import subprocess
+
+    command = [disktype_path, image_path]
+    _logger.debug("Running: %r.", command)
+    disktype_proc = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE)
+    temp_out_path = out_path + ".tmp"
+    try:
+        with open(temp_out_path, "w") as out_fh:
+            (parser, finish) = start_conversion(out_fh, streaming, output_format=output_format)
+            #Read whatever has arrived, instead of whole lines, so no line is too long for the stream reader's buffer.
+            while True:
+                data = await disktype_proc.stdout.read(2**16)
+                if data == b"":
+                    break
+                parser.feed(data)
+            finish(parser.close())
+        returncode = await disktype_proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
+        os.replace(temp_out_path, out_path)
+    except:
+        if disktype_proc.returncode is None:
+            disktype_proc.kill()
+            await disktype_proc.wait()
+        if os.path.exists(temp_out_path):
+            os.remove(temp_out_path)
+        raise
+
+async def convert_images(image_paths, out_paths, result_callback, jobs=1, jobs_per_device=None, streaming=False, disktype_path="disktype", output_format="dfxml"):
+    """Converts each image in image_paths to the DFXML file at the parallel position in out_paths, with at most jobs disktype processes running at once.  If jobs_per_device is given, at most that many of the running processes read images stored on the same device (st_dev), so a fleet of images on one spindle isn't read in a seek-thrashing interleave.  result_callback is called with (image_path, out_path, error message) as each image finishes; the error message is None on success."""
+    import asyncio
+
+    jobs_semaphore = asyncio.Semaphore(jobs)
+    device_semaphores = dict()
+
+    async def _convert_one(image_path, out_path):
+        try:
+            #Wait for a device slot before taking a global slot, so images queued behind a busy device don't hold up images on idle devices.
+            if jobs_per_device is None:
+                async with jobs_semaphore:
+                    await convert_image_async(image_path, out_path, streaming, disktype_path, output_format)
+            else:
+                device = os.stat(image_path).st_dev
+                if not device in device_semaphores:
+                    device_semaphores[device] = asyncio.Semaphore(jobs_per_device)
+                async with device_semaphores[device]:
+                    async with jobs_semaphore:
+                        await convert_image_async(image_path, out_path, streaming, disktype_path, output_format)
+        except Exception as e:
+            _logger.debug("Conversion failure on %r.", image_path, exc_info=True)
+            result_callback((image_path, out_path, "%s: %s" % (type(e).__name__, e)))
+        else:
+            result_callback((image_path, out_path, None))
+
+    await asyncio.gather(*[_convert_one(image_path, out_path) for (image_path, out_path) in zip(image_paths, out_paths)])
+
+def image_batch_main():
+    """Runs disktype on every image named by --image and --image-list, converting each to its own DFXML file in args.output_dir.  Returns the process exit status as batch_main() does."""
+    import asyncio
+
+    image_paths = list(args.image)
+    if not args.image_list is None:
+        with open(args.image_list, "r") as image_list_fh:
+            for line in image_list_fh:
+                path = line.rstrip("\n")
+                if path != "":
+                    image_paths.append(path)
+    try:
+        out_paths = batch_output_paths(args.output_dir, image_paths, output_format_extensions[args.format])
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    report = BatchReport()
+    asyncio.run(convert_images(image_paths, out_paths, report.report, args.jobs, args.jobs_per_device, args.streaming, args.disktype, args.format))
+    return report.finish()
+
+def default_server_socket():
+    """Returns where --serve listens, and disktype_to_dfxml_client.py connects, when no --socket or --port is given: in $XDG_RUNTIME_DIR if it is set, otherwise in a per-user directory in the temporary directory.  Either directory must be private to the user (see check_private_directory()), so another local user can neither take the path first nor stand in for the server.  The client computes the same path."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "disktype_to_dfxml.sock")
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), "disktype_to_dfxml-%d" % os.getuid(), "disktype_to_dfxml.sock")
+
+def check_private_directory(dir_path, create=False):
+    """Raises PermissionError unless dir_path is a directory, not a symbolic link, owned by this user, with no permissions for anybody else.  If create, a missing directory is created with mode 0700 first.  The client makes the same check."""
+    if create:
+        try:
+            os.mkdir(dir_path, 0o700)
+        except FileExistsError:
+            pass
+    stat_result = os.lstat(dir_path)
+    if not stat.S_ISDIR(stat_result.st_mode) or stat_result.st_uid != os.getuid() or stat_result.st_mode & 0o077 != 0:
+        raise PermissionError("%s is not a directory private to user %d." % (dir_path, os.getuid()))
+
+def convert_request(in_bytes, streaming=False, cache=None, argv=None, output_format="dfxml"):
+    """Server worker.  Returns (output text, profile): the conversion of one request's disktype output, as write_dfxml_from_bytes() writes it, and profile as convert_batch_item() returns it."""
+    out_fh = io.StringIO()
+    write_dfxml_from_bytes(in_bytes, out_fh, streaming, cache, argv, output_format)
+    profile_dict = None if active_profile is None else active_profile.take()
+    return (out_fh.getvalue(), profile_dict)
+
+async def handle_conversion_request(reader, writer, cache=None, executor=None, max_request_bytes=2**28):
+    """
+    Serves one conversion request on an asyncio stream pair.  The protocol, spoken by disktype_to_dfxml_client.py:
+
+    * Request: one line of JSON, an object with members "argv" (the client's command line, recorded as the DFXML's creator), "streaming" (as --streaming) and optionally "format" (as --format); then the disktype output, ended by the client shutting down its sending side.
+    * Response: a status line, "OK" or "ERROR" and a tab-separated message; then, on success, the DFXML, UTF-8-encoded, ended by the server closing the connection.
+
+    Each request is parsed by a fresh Parser, so requests share nothing but the warm imports and compiled patterns.  The parse runs on executor (a concurrent.futures executor; None for the event loop's default thread pool), so the event loop keeps serving other clients meanwhile.  Disktype output longer than max_request_bytes is read and discarded, and answered with an error.
+    """
+    import asyncio
+    import json
+
+    try:
+        try:
+            request = json.loads((await reader.readline()).decode("utf-8"))
+            in_chunks = []
+            in_size = 0
+            while True:
+                chunk = await reader.read(2**16)
+                if chunk == b"":
+                    break
+                in_size += len(chunk)
+                if in_size <= max_request_bytes:
+                    in_chunks.append(chunk)
+                else:
+                    in_chunks = None
+            if in_chunks is None:
+                raise ValueError("Request of %d bytes exceeds the server's limit of %d bytes." % (in_size, max_request_bytes))
+            output_format = request.get("format", "dfxml")
+            if not output_format in output_format_extensions:
+                raise ValueError("Unknown output format: %r." % output_format)
+            (out_text, profile_dict) = await asyncio.get_running_loop().run_in_executor(executor, convert_request, b"".join(in_chunks), bool(request.get("streaming")), cache, request.get("argv"), output_format)
+            if not profile_dict is None:
+                active_profile.merge(profile_dict)
+        except Exception as e:
+            _logger.debug("Conversion failure on request.", exc_info=True)
+            writer.write(("ERROR\t%s: %s\n" % (type(e).__name__, e)).encode("utf-8"))
+        else:
+            writer.write(b"OK\n")
+            writer.write(out_text.encode("utf-8"))
+        await writer.drain()
+    except ConnectionError:
+        _logger.debug("Client went away.", exc_info=True)
+    finally:
+        writer.close()
+
+async def serve(socket_path=None, port=None, cache=None, jobs=1, max_request_bytes=2**28):
+    """Answers conversion requests (see handle_conversion_request()) on the Unix domain socket at socket_path, or if port is given, on that localhost TCP port, until SIGINT or SIGTERM.  Requests are converted on a pool of jobs processes, which keep their imports warm between requests; requests of more than max_request_bytes are refused."""
+    import asyncio
+    import concurrent.futures
+    import signal
+
+    if port is None:
+        if socket_path == default_server_socket():
+            check_private_directory(os.path.dirname(socket_path), create=True)
+        #A socket file left by a server that was killed would make the bind fail.  A live server's socket accepts connections, and is left alone; only a refused connection shows the socket is stale.
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            import socket
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.remove(socket_path)
+                else:
+                    raise FileExistsError("A server is already serving on %s." % socket_path)
+
+    initializer = None if active_profile is None else enable_profiling
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=initializer)
+    #Start the worker processes before any client connects.  Forked later, they would inherit the open client connections, so a client would not see its connection closed until the workers exited.
+    executor.submit(os.getpid).result()
+
+    async def _handle(reader, writer):
+        await handle_conversion_request(reader, writer, cache, executor, max_request_bytes)
+
+    if port is None:
+        server = await asyncio.start_unix_server(_handle, path=socket_path)
+        address = socket_path
+    else:
+        server = await asyncio.start_server(_handle, host="127.0.0.1", port=port)
+        address = "127.0.0.1:%d" % port
+
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for signal_number in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signal_number, lambda: stop.done() or stop.set_result(None))
+    try:
+        async with server:
+            _logger.info("Serving conversions on %s.", address)
+            await stop
+    finally:
+        if port is None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        executor.shutdown(cancel_futures=True)
+
+def serve_main():
+    import asyncio
+
+    try:
+        asyncio.run(serve(args.socket, args.port, make_cache(), args.jobs, args.max_request_bytes))
+    except (FileExistsError, PermissionError) as e:
+        sys.stderr.write("%s\n" % e)
+        return 1
+    return 0
+
+def write_profile():
+    """Writes active_profile as a report on stderr, or as JSON to args.profile_json."""
+    if args.profile_json is None:
+        active_profile.write_report(sys.stderr)
+        return
+    import json
+    with open(args.profile_json, "w") as profile_fh:
+        json.dump(active_profile.to_dict(), profile_fh, indent=2, sort_keys=True)
+        profile_fh.write("\n")
+
+def train_main():
+    sys.stdout.write(format_line_kind_frequencies(train_line_kind_frequencies(iter_batch_input_paths(args.disktype_out_txt, args.file_list))))
+    return 0
+
+def convert_main():
+    if args.train_line_kind_frequencies:
+        return train_main()
+    if args.serve:
+        return serve_main()
+    if not args.shard_fetch is None:
+        return shard_fetch_main()
+    if not args.shard_dir is None:
+        return shard_batch_main()
+    if len(args.image) > 0 or not args.image_list is None:
+        if not args.output_dir is None:
+            return image_batch_main()
+        import subprocess
+        try:
+            write_dfxml_from_image(args.image[0], sys.stdout, args.streaming, args.disktype, args.format)
+        except subprocess.CalledProcessError as e:
+            sys.stderr.write("%s: disktype exited with status %d.  The output written may be incomplete, and should be discarded.\n" % (args.image[0], e.returncode))
+            return 1
+        return 0
+    if not args.output_dir is None:
+        return batch_main()
+    if not args.diff_from is None:
+        with open(args.diff_from, "rb") as old_in_fh:
+            with open(args.disktype_out_txt[0], "rb") as new_in_fh:
+                write_differential_dfxml(old_in_fh, new_in_fh, sys.stdout)
+        return 0
+    write_dfxml_from_path(args.disktype_out_txt[0], sys.stdout, args.streaming, make_cache(), args.format, args.jobs)
+    return 0
+
+def main():
+    if not args.profile and args.profile_json is None:
+        return convert_main()
+    enable_profiling()
+    try:
+        return convert_main()
+    finally:
+        write_profile()
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--debug", action="store_true")
-    parser.add_argument("disktype_out_txt", help="Disktype stdout.")
+    parser.add_argument("--streaming", action="store_true", help="Write each volume as soon as it is parsed, instead of after the whole input is parsed.")
+    parser.add_argument("--format", choices=sorted(output_format_extensions.keys()), default="dfxml", help="Output format: DFXML, or JSON Lines, one object per volume, which is always written as each volume is parsed.  Batch output files are named with the format's extension.  (Default: %(default)s.)")
+    parser.add_argument("--image", action="append", default=[], help="Run disktype on this disk image and convert its output as it is produced, instead of reading pre-computed disktype output.  With --output-dir, can be given more than once.")
+    parser.add_argument("--image-list", help="Image batch mode: file listing further disk images, one path per line.")
+    parser.add_argument("--disktype", default="disktype", help="disktype executable to run in --image mode.  (Default: %(default)s.)")
+    parser.add_argument("--output-dir", help="Batch mode: write one DFXML file per input into this directory, instead of writing one input's DFXML to stdout.")
+    parser.add_argument("--shard-dir", help="Shard batch mode: instead of one file per input, write the inputs' DFXML into size-bounded shard files in this directory, with an index of where each disk image's volumes are.  Does not use --cache-dir.")
+    parser.add_argument("--shard-max-bytes", type=int, default=2**28, help="Shard batch mode: close a shard once it is at least this large.  (Default: %(default)s.)")
+    parser.add_argument("--shard-max-inputs", type=int, help="Shard batch mode: close a shard once it holds this many inputs.  (Default: no limit.)")
+    parser.add_argument("--shard-fetch", metavar="PATH", help="With --shard-dir, instead of converting, write the DFXML stored for this disk image path, or batch input path, to stdout.")
+    parser.add_argument("--diff-from", metavar="OLD_TXT", help="Differential mode: compare the disktype output file with this earlier disktype output of the same media, and write DFXML of only the volumes added, removed or changed since it, annotated as in differential DFXML.")
+    parser.add_argument("--journal", help="Batch mode: record each input's conversion in this append-only journal file, and skip inputs it records as converted and unchanged since, or as claimed by a running worker.  Rerunning an interrupted batch with its journal converts only the inputs that are missing or failed, and concurrent batch runs sharing a journal split the inputs between them.")
+    parser.add_argument("--journal-lease", type=float, default=3600, metavar="SECONDS", help="--journal: an input claimed by a worker on another host is retried after this many seconds without an outcome.  Inputs claimed by exited processes on this host are retried at once.  (Default: %(default)s.)")
+    parser.add_argument("--file-list", help="Batch mode: file listing further inputs, one path per line.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Batch mode: number of worker processes, or in image batch mode, of concurrent disktype processes.  With one disktype output file converted to stdout, without --cache-dir: number of processes parsing the file's '--- <path>' sections in parallel.  With --serve: number of processes converting requests.  (Default: %(default)s.)")
+    parser.add_argument("--jobs-per-device", type=int, help="Image batch mode: at most this many concurrent disktype processes read images on the same device.  (Default: no per-device limit.)")
+    parser.add_argument("--cache-dir", help="Reuse DFXML converted before from identical disktype output, keeping conversions in this directory.  Does not apply to --image.")
+    parser.add_argument("--cache-max-bytes", type=int, default=2**30, help="Size bound of the --cache-dir contents; least recently used conversions are removed past it.  (Default: %(default)s.)")
+    parser.add_argument("--profile", action="store_true", help="At exit, report on stderr where parsing time went: per-pattern attempts, hits and time; transitions into each parsing state; and time in line parsing, state transitions, level popping and serialization.  In batch mode, counts are totaled across inputs.")
+    parser.add_argument("--profile-json", help="As --profile, but write the counts as JSON to this file.")
+    parser.add_argument("--train-line-kind-frequencies", action="store_true", help="Instead of converting, classify every line of the inputs (files, or directories of *.txt files), and print the resulting line_kind_frequencies table, to replace the one in this script.")
+    parser.add_argument("--serve", action="store_true", help="Run as a resident server, answering conversion requests from disktype_to_dfxml_client.py, so each conversion skips interpreter startup and imports.")
+    parser.add_argument("--socket", default=default_server_socket(), help="--serve: Unix domain socket to listen on.  (Default: %(default)s.)")
+    parser.add_argument("--port", type=int, help="--serve: listen on this localhost TCP port instead of --socket.")
+    parser.add_argument("--max-request-bytes", type=int, default=2**28, help="--serve: refuse requests with more disktype output than this.  (Default: %(default)s.)")
+    parser.add_argument("disktype_out_txt", nargs="*", help="Disktype stdout.  In batch mode, any number of files, or directories of *.txt files.")
     args = parser.parse_args()
 
+    if args.train_line_kind_frequencies:
+        if len(args.disktype_out_txt) == 0 and args.file_list is None:
+            parser.error("--train-line-kind-frequencies needs disktype output files to classify.")
+    elif not args.shard_fetch is None:
+        if args.shard_dir is None:
+            parser.error("--shard-fetch needs --shard-dir.")
+    elif not args.shard_dir is None:
+        if not args.output_dir is None or len(args.image) > 0 or not args.image_list is None:
+            parser.error("--shard-dir takes disktype output files, and replaces --output-dir.")
+        if args.format != "dfxml":
+            parser.error("--shard-dir writes DFXML shards.")
+        if len(args.disktype_out_txt) == 0 and args.file_list is None:
+            parser.error("--shard-dir needs disktype output files to convert.")
+    elif not args.diff_from is None:
+        if len(args.disktype_out_txt) != 1 or not args.file_list is None or not args.output_dir is None or len(args.image) > 0 or not args.image_list is None:
+            parser.error("--diff-from compares exactly one disktype output file with the earlier one, writing to stdout.")
+        if args.format != "dfxml":
+            parser.error("--diff-from writes DFXML.")
+    elif args.serve:
+        if len(args.disktype_out_txt) > 0 or len(args.image) > 0 or not args.image_list is None or not args.file_list is None or not args.output_dir is None:
+            parser.error("--serve takes no inputs; clients send them.")
+    elif len(args.image) > 0 or not args.image_list is None:
+        if len(args.disktype_out_txt) > 0 or not args.file_list is None:
+            parser.error("--image and --image-list run disktype, and do not take disktype output files.")
+        if args.output_dir is None and (len(args.image) != 1 or not args.image_list is None):
+            parser.error("Exactly one disk image is converted to stdout.  Use --output-dir to convert more.")
+    elif args.output_dir is None:
+        if len(args.disktype_out_txt) != 1 or not args.file_list is None:
+            parser.error("Exactly one disktype output file is converted to stdout.  Use --output-dir to convert more.")
+    if not args.journal is None and (args.output_dir is None or len(args.image) > 0 or not args.image_list is None):
+        parser.error("--journal applies to batch conversion of disktype output files with --output-dir.")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+    if not args.jobs_per_device is None and args.jobs_per_device < 1:
+        parser.error("--jobs-per-device must be at least 1.")
+
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
 
-    main()
+    sys.exit(main())
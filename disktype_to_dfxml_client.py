@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script is a drop-in replacement for converting one disktype output file with disktype_to_dfxml.py, handing the conversion to a running `disktype_to_dfxml.py --serve`.  It imports only a few standard library modules, so it starts much faster than disktype_to_dfxml.py and its DFXML libraries.
+
+See handle_conversion_request() in disktype_to_dfxml.py for the protocol.
+"""
+
+__version__ = "0.1.0"
+
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+_logger = logging.getLogger(os.path.basename(__file__))
+
+#Must match default_server_socket() in disktype_to_dfxml.py.
+if os.environ.get("XDG_RUNTIME_DIR"):
+    DEFAULT_SERVER_SOCKET = os.path.join(os.environ["XDG_RUNTIME_DIR"], "disktype_to_dfxml.sock")
+else:
+    DEFAULT_SERVER_SOCKET = os.path.join(tempfile.gettempdir(), "disktype_to_dfxml-%d" % os.getuid(), "disktype_to_dfxml.sock")
+
+def check_default_server_socket(socket_path):
+    """Raises PermissionError unless socket_path is in a directory private to this user, as check_private_directory() in disktype_to_dfxml.py requires, and is owned by this user.  Otherwise another local user could have put the socket there, and would receive the disktype output."""
+    dir_stat = os.lstat(os.path.dirname(socket_path))
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077 != 0:
+        raise PermissionError("%s is not a directory private to user %d." % (os.path.dirname(socket_path), os.getuid()))
+    if os.lstat(socket_path).st_uid != os.getuid():
+        raise PermissionError("%s is not owned by user %d." % (socket_path, os.getuid()))
+
+def connect(socket_path=None, port=None):
+    if port is None:
+        if socket_path == DEFAULT_SERVER_SOCKET:
+            check_default_server_socket(socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection(("127.0.0.1", port))
+    return sock
+
+def main():
+    request = {
+      "argv": sys.argv,
+      "streaming": args.streaming,
+      "format": args.format
+    }
+    with open(args.disktype_out_txt, "rb") as in_fh:
+        try:
+            sock = connect(args.socket, args.port)
+        except PermissionError as e:
+            sys.stderr.write("%s\n" % e)
+            return 1
+        with sock:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            sock.sendfile(in_fh)
+            sock.shutdown(socket.SHUT_WR)
+
+            with sock.makefile("rb") as response_fh:
+                status_line = response_fh.readline().decode("utf-8").rstrip("\n")
+                if status_line != "OK":
+                    if status_line == "":
+                        status_line = "ERROR\tServer closed the connection without a response."
+                    sys.stderr.write("%s: %s\n" % (args.disktype_out_txt, status_line.split("\t", 1)[-1]))
+                    return 1
+                while True:
+                    chunk = response_fh.read(2**16)
+                    if chunk == b"":
+                        break
+                    sys.stdout.buffer.write(chunk)
+    return 0
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--debug", action="store_true")
+    parser.add_argument("--streaming", action="store_true", help="As disktype_to_dfxml.py --streaming.")
+    parser.add_argument("--format", choices=["dfxml", "jsonl"], default="dfxml", help="As disktype_to_dfxml.py --format.  (Default: %(default)s.)")
+    parser.add_argument("--socket", default=DEFAULT_SERVER_SOCKET, help="Unix domain socket the server listens on.  (Default: %(default)s.)")
+    parser.add_argument("--port", type=int, help="Connect to the server on this localhost TCP port instead of --socket.")
+    parser.add_argument("disktype_out_txt", help="Disktype stdout.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that differential DFXML of a capture against itself lists no volumes, on all sample data; and that an edited re-scan of one sample lists exactly the volumes that were added, removed and changed.
+"""
+
+import glob
+import io
+import logging
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+#The differential DFXML namespace, as Objects.py's readers expect it.
+XMLNS_DELTA = "http://www.forensicswiki.org/wiki/Forensic_Disk_Differencing"
+
+def differential_volume_elements(old_bytes, new_bytes):
+    out_fh = io.StringIO()
+    disktype_to_dfxml.write_differential_dfxml(io.BytesIO(old_bytes), io.BytesIO(new_bytes), out_fh)
+    root = ET.fromstring(out_fh.getvalue())
+    return [el for el in root if el.tag.endswith("volume")]
+
+def delta_annotation(vel):
+    annotations = [name for name in ["new_volume", "deleted_volume", "modified_volume"] if vel.get("{%s}%s" % (XMLNS_DELTA, name)) == "1"]
+    assert len(annotations) == 1, annotations
+    return annotations[0]
+
+def partition_offset(vel):
+    for el in vel:
+        if el.tag.endswith("partition_offset"):
+            return int(el.text)
+    return None
+
+def ptype(vel):
+    return [el.text for el in vel if el.tag.endswith("ptype")]
+
+sample_count = 0
+for sample_path in sorted(glob.glob("*/*.txt")):
+    with open(sample_path, "rb") as sample_fh:
+        sample_bytes = sample_fh.read()
+    assert differential_volume_elements(sample_bytes, sample_bytes) == [], sample_path
+    sample_count += 1
+_logger.debug("Checked %d samples against themselves." % sample_count)
+
+with open("ubuntu16.04/nsrl-10453-1.txt", "rb") as sample_fh:
+    old_bytes = sample_fh.read()
+#Re-scan: partition 4 was retyped, partition 5 was removed, and a partition 6 was added.
+partition_4_start = old_bytes.index(b"\nPartition 4:") + 1
+partition_5_start = old_bytes.index(b"\nPartition 5:") + 1
+new_bytes = old_bytes[:partition_4_start] + old_bytes[partition_4_start:partition_5_start].replace(b"Type 0", b"Type 8") + b"""Partition 6: 1.250 MiB (1310720 bytes, 2560 sectors from 6579840)
+  Type 0
+  UFS file system, 8 KiB offset, big-endian
+    Last mounted at "/tmp/MntDev.26893"
+
+"""
+volume_elements = differential_volume_elements(old_bytes, new_bytes)
+annotations = {delta_annotation(vel): vel for vel in volume_elements}
+_logger.debug([delta_annotation(vel) for vel in volume_elements])
+assert len(volume_elements) == 3
+assert sorted(annotations.keys()) == ["deleted_volume", "modified_volume", "new_volume"]
+assert partition_offset(annotations["modified_volume"]) == 6574720 * 512
+assert partition_offset(annotations["deleted_volume"]) == 6577280 * 512
+assert partition_offset(annotations["new_volume"]) == 6579840 * 512
+
+original_elements = [el for el in annotations["modified_volume"] if el.tag == "{%s}original_volume" % XMLNS_DELTA]
+assert len(original_elements) == 1
+assert partition_offset(original_elements[0][0]) == 6574720 * 512
+assert ptype(annotations["modified_volume"]) == ["8"]
+assert ptype(original_elements[0][0]) == ["0"]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that feeding the sample data to a Parser in chunks of various sizes, splitting lines (including lines broken by embedded '\\r\\n's) anywhere, yields the same volumes, in the same order, as parsing the files whole.  It also checks that an unterminated last line is parsed by close().
+"""
+
+import glob
+import io
+import json
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+def volume_records(parse_function):
+    records = []
+    def _volume_callback(dobj, vobj):
+        records.append(json.dumps(disktype_to_dfxml.volume_to_json_object(vobj, dobj.sources[-1])))
+    parser = disktype_to_dfxml.Parser(volume_callback=_volume_callback)
+    dobj = parse_function(parser)
+    return (records, list(dobj.sources), len(dobj.externals), parser._line_no)
+
+def feed_function(sample_bytes, chunk_size):
+    def _parse(parser):
+        for chunk_start in range(0, len(sample_bytes), chunk_size):
+            parser.feed(sample_bytes[chunk_start:chunk_start+chunk_size])
+        return parser.close()
+    return _parse
+
+sample_count = 0
+for sample_path in sorted(glob.glob("*/*.txt")):
+    with open(sample_path, "rb") as sample_fh:
+        sample_bytes = sample_fh.read()
+    with open(sample_path, "rb") as sample_fh:
+        expected = volume_records(lambda parser: parser.parse(sample_fh))
+    for chunk_size in [1, 2, 7, 64, len(sample_bytes)]:
+        assert volume_records(feed_function(sample_bytes, chunk_size)) == expected, (sample_path, chunk_size)
+    #A whitespace-only line still ends the input, but counts as a line.
+    unterminated_bytes = sample_bytes + b"  "
+    unterminated_expected = volume_records(lambda parser: parser.parse(io.BytesIO(unterminated_bytes)))
+    assert unterminated_expected[3] == expected[3] + 1
+    assert volume_records(feed_function(unterminated_bytes, 5)) == unterminated_expected, sample_path
+    sample_count += 1
+_logger.debug("Checked %d samples." % sample_count)
+assert sample_count > 0
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that a journaled batch converts only what its journal does not record as done: failed, changed, lost and newly added inputs, and inputs whose claims were abandoned by crashed workers.  Converted inputs, touched inputs with unchanged content, and inputs claimed by live workers are skipped.  A line torn by a crash mid-append does not stop the journal from being read or appended.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+work_dir = "journal_work"
+shutil.rmtree(work_dir, ignore_errors=True)
+in_dir = os.path.join(work_dir, "inputs")
+out_dir = os.path.join(work_dir, "outputs")
+os.makedirs(in_dir)
+os.makedirs(out_dir)
+journal_path = os.path.join(work_dir, "journal.jsonl")
+
+sample_names = ["nsrl-10002-1", "nsrl-10453-1", "cfreds-macwd"]
+for sample_name in sample_names:
+    shutil.copy(os.path.join("ubuntu16.04", sample_name + ".txt"), in_dir)
+with open(os.path.join(in_dir, "unparseable.txt"), "w") as unparseable_fh:
+    unparseable_fh.write("This is not disktype output.\n")
+
+def run_batch():
+    """Returns the status of each input: "OK", "FAILED", or the (journal status, message) it was skipped for."""
+    statuses = dict()
+    for in_name in sorted(os.listdir(in_dir)):
+        in_path = os.path.join(in_dir, in_name)
+        out_path = disktype_to_dfxml.batch_output_path(out_dir, in_path)
+        (in_path, out_path, error_message, profile_dict, skip) = disktype_to_dfxml.convert_journaled_batch_item(journal_path, 3600, in_path, out_path)
+        if not skip is None:
+            statuses[in_name] = skip
+        else:
+            statuses[in_name] = "OK" if error_message is None else "FAILED"
+    _logger.debug(statuses)
+    return statuses
+
+def converted(statuses):
+    return sorted(in_name for (in_name, status) in statuses.items() if status == "OK")
+
+def append_entry(entry):
+    with open(journal_path, "a") as journal_fh:
+        journal_fh.write(json.dumps(entry) + "\n")
+
+statuses = run_batch()
+assert converted(statuses) == sorted(sample_name + ".txt" for sample_name in sample_names)
+assert statuses["unparseable.txt"] == "FAILED"
+with open(journal_path, "r") as journal_fh:
+    entries = [json.loads(line) for line in journal_fh]
+assert [entry["status"] for entry in entries].count("claimed") == 4
+done_entries = [entry for entry in entries if entry["status"] == "done"]
+assert len(done_entries) == 3
+for entry in done_entries:
+    assert os.path.isabs(entry["path"]) and os.path.isabs(entry["output"])
+    assert entry["size"] == os.stat(entry["path"]).st_size
+    assert entry["sha256"] == disktype_to_dfxml.file_sha256(entry["path"])
+    assert os.path.exists(entry["output"])
+assert "error" in [entry for entry in entries if entry["status"] == "failed"][0]
+
+#A rerun converts nothing new, but retries the failure.
+statuses = run_batch()
+assert converted(statuses) == []
+assert statuses["unparseable.txt"] == "FAILED"
+assert statuses["nsrl-10002-1.txt"][0] == "done"
+assert statuses["nsrl-10002-1.txt"][1].startswith("Converted to ")
+
+#Repair the failed input, touch one input, change another, lose an output, and add an input.
+shutil.copy(os.path.join("ubuntu16.04", "nsrl-1025-2.txt"), os.path.join(in_dir, "unparseable.txt"))
+touched_time = time.time() + 10
+os.utime(os.path.join(in_dir, "nsrl-10002-1.txt"), (touched_time, touched_time))
+shutil.copy(os.path.join("ubuntu16.04", "nsrl-10619-1.txt"), os.path.join(in_dir, "nsrl-10453-1.txt"))
+os.remove(os.path.join(out_dir, "cfreds-macwd.dfxml"))
+shutil.copy(os.path.join("ubuntu16.04", "nsrl-16618-1.txt"), in_dir)
+statuses = run_batch()
+assert converted(statuses) == ["cfreds-macwd.txt", "nsrl-10453-1.txt", "nsrl-16618-1.txt", "unparseable.txt"]
+assert statuses["nsrl-10002-1.txt"][0] == "done"
+
+#Claims abandoned by an exited process on this host, or long ago on another host, are taken over.  Live claims are respected.
+exited_proc = subprocess.Popen([sys.executable, "-c", "pass"])
+exited_proc.wait()
+claims = {
+  "cfreds-macwd.txt": (disktype_to_dfxml.get_batch_journal(journal_path)._host, exited_proc.pid, time.time()),
+  "nsrl-10002-1.txt": ("elsewhere.example", 1, time.time() - 7200),
+  "nsrl-10453-1.txt": (disktype_to_dfxml.get_batch_journal(journal_path)._host, os.getpid(), time.time()),
+  "nsrl-16618-1.txt": ("elsewhere.example", 1, time.time())
+}
+for (in_name, (host, pid, claim_time)) in sorted(claims.items()):
+    append_entry({"path": os.path.abspath(os.path.join(in_dir, in_name)), "status": "claimed", "host": host, "pid": pid, "time": claim_time})
+#A crash mid-append.
+with open(journal_path, "a") as journal_fh:
+    journal_fh.write('{"path": "torn')
+statuses = run_batch()
+assert converted(statuses) == ["cfreds-macwd.txt", "nsrl-10002-1.txt"]
+assert statuses["nsrl-10453-1.txt"][0] == "claimed"
+assert statuses["nsrl-10453-1.txt"][1].startswith("Claimed by process %d " % os.getpid())
+assert statuses["nsrl-16618-1.txt"] == ("claimed", "Claimed by process 1 on elsewhere.example.")
+assert statuses["unparseable.txt"][0] == "done"
+
+#An input claimed by another live run is not confirmed converted, so a batch that met one does not exit as a success.
+report = disktype_to_dfxml.BatchReport()
+report.report((os.path.join(in_dir, "nsrl-16618-1.txt"), None, None, None, statuses["nsrl-16618-1.txt"]))
+report.report((os.path.join(in_dir, "unparseable.txt"), None, None, None, statuses["unparseable.txt"]))
+assert (report.elsewhere_count, report.skip_count) == (1, 1)
+assert report.finish() == 75
+report.report((os.path.join(in_dir, "unparseable.txt"), None, "ValueError: Unparseable.", None, None))
+assert report.finish() == 1
+
+#The torn line is left on a line of its own.
+with open(journal_path, "r") as journal_fh:
+    journal_lines = journal_fh.read().splitlines()
+assert journal_lines.count('{"path": "torn') == 1
+for line in journal_lines:
+    if line != '{"path": "torn':
+        json.loads(line)
+
+shutil.rmtree(work_dir)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that JSON Lines output has one object per volume of the DFXML output, with the same fields, on all sample data; and spot-checks one sample's values.
+"""
+
+import glob
+import io
+import json
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+volume_count = 0
+for sample_path in sorted(glob.glob("*/*.txt")):
+    with open(sample_path, "rb") as sample_fh:
+        dobj = disktype_to_dfxml.Parser().parse(sample_fh)
+    jsonl_fh = io.StringIO()
+    with open(sample_path, "rb") as sample_fh:
+        disktype_to_dfxml.write_dfxml(sample_fh, jsonl_fh, output_format="jsonl")
+    records = [json.loads(line) for line in jsonl_fh.getvalue().splitlines()]
+    assert len(records) == len(dobj.volumes), sample_path
+    for record in records:
+        assert record.pop("image_path") in dobj.sources, sample_path
+    #Volumes are written as their file systems close, so a volume nested in a boot image precedes its container, unlike in whole-document DFXML.
+    expected_records = [disktype_to_dfxml.volume_to_json_object(vobj) for vobj in dobj.volumes]
+    assert sorted(map(json.dumps, records)) == sorted(map(json.dumps, expected_records)), sample_path
+    volume_count += len(records)
+_logger.debug("Checked %d volumes." % volume_count)
+assert volume_count > 0
+
+jsonl_fh = io.StringIO()
+with open("ubuntu16.04/nsrl-10002-1.txt", "rb") as sample_fh:
+    disktype_to_dfxml.write_dfxml(sample_fh, jsonl_fh, output_format="jsonl")
+records = [json.loads(line) for line in jsonl_fh.getvalue().splitlines()]
+assert len(records) == 1
+record = records[0]
+_logger.debug(record)
+assert record["image_path"] == ".../nsrl-10002-1.img"
+assert record["ftype_str"] == "HFS"
+assert record["pstype_str"] == "mac"
+assert record["partition_byte_run"] == {"img_offset": 495616, "len": 677928960}
+assert record["byte_runs"] == [{"img_offset": 495616, "len": 677855232}]
+assert record["wrapped_hfsplus_volume"]["ftype_str"] == "HFS Plus"
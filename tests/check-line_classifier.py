@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that the leading-token line classifier agrees with trying every line pattern in precedence order and then applying the kind overrides, on every line of the sample data and on some lines that several patterns match.  This is checked for the shipped line_kind_frequencies ordering, and for an ordering that tries patterns in reverse precedence order.  It also checks that pruning candidates by parsing state only changes the result when the unpruned result could not legally follow that state.
+"""
+
+import glob
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+def classify_sequentially(cleaned_line, kinds=None):
+    for (kind, regexen, leading_tokens) in disktype_to_dfxml.line_kind_patterns:
+        if not kinds is None and not kind in kinds:
+            continue
+        for regex in regexen:
+            maybe_match = regex.search(cleaned_line)
+            if not maybe_match is None:
+                for override_kind in disktype_to_dfxml.line_kind_overrides.get(kind, []):
+                    (overriding_kind, overriding_match) = classify_sequentially(cleaned_line, {override_kind})
+                    if not overriding_kind is None:
+                        return (overriding_kind, overriding_match)
+                return (kind, maybe_match)
+    return (None, None)
+
+#Frequencies that rank every pattern above all patterns of higher precedence, for every leading token.
+reversed_frequencies = dict()
+rank = 0
+for (kind, regexen, leading_tokens) in disktype_to_dfxml.line_kind_patterns:
+    for leading_token in [None] + [leading_token for (other_kind, other_regexen, other_leading_tokens) in disktype_to_dfxml.line_kind_patterns for leading_token in other_leading_tokens or []]:
+        reversed_frequencies.setdefault(leading_token, dict())[kind.name] = list(range(rank, rank + len(regexen)))
+    rank += len(regexen)
+line_classifiers = [
+  disktype_to_dfxml.get_line_classifier(),
+  disktype_to_dfxml.LineClassifier(disktype_to_dfxml.line_kind_patterns, disktype_to_dfxml.line_kind_overrides, reversed_frequencies)
+]
+
+overlapping_lines = [
+  b"Volume name \"ext2 file system\"",
+  b"Type 0x83 (Linux file system)",
+  b"Type Basic data (FAT32) (GUID EBD0A0A2-B9E5-4433-87C0-68B6B72699C7)",
+  b"Partition Name \"1: a (1 sectors from 2)\"",
+  b"Partition 1: 1 MiB (1048576 bytes, 2048 sectors from 63) file system"
+]
+
+def check_line(cleaned_line, sample_path):
+    (expected_kind, expected_match) = classify_sequentially(cleaned_line)
+    for line_classifier in line_classifiers:
+        (kind, maybe_match) = line_classifier.classify(cleaned_line)
+        if kind != expected_kind:
+            _logger.error("%s: %r" % (sample_path, cleaned_line))
+        assert kind == expected_kind
+        if not kind is None:
+            assert maybe_match.re.pattern == expected_match.re.pattern
+            assert maybe_match.groupdict() == expected_match.groupdict()
+        for state in disktype_to_dfxml.ParseState:
+            (pruned_kind, pruned_match) = line_classifier.classify(cleaned_line, state)
+            if expected_kind is None or disktype_to_dfxml.line_kind_can_follow(expected_kind, state):
+                assert pruned_kind == expected_kind
+
+for cleaned_line in overlapping_lines:
+    check_line(cleaned_line, "(overlapping line)")
+
+line_count = 0
+for sample_path in sorted(glob.glob("*/*.txt")):
+    with open(sample_path, "rb") as sample_fh:
+        for line in sample_fh:
+            cleaned_line = line.strip()
+            if cleaned_line == b"":
+                continue
+            check_line(cleaned_line, sample_path)
+            line_count += 1
+_logger.debug("Checked %d lines." % line_count)
+assert line_count > 0
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks a --profile-json report of a batch conversion of the ubuntu16.04 samples: the counts of every input must be totaled, including from worker processes, and must agree with the sample data.
+"""
+
+import glob
+import json
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+with open(sys.argv[1], "r") as profile_fh:
+    profile_dict = json.load(profile_fh)
+
+sample_paths = glob.glob("ubuntu16.04/*.txt")
+line_count = 0
+for sample_path in sample_paths:
+    with open(sample_path, "rb") as sample_fh:
+        line_count += len(sample_fh.readlines())
+_logger.debug("%d samples, %d lines." % (len(sample_paths), line_count))
+
+assert profile_dict["input_count"] == len(sample_paths)
+assert profile_dict["transitions"]["_INPUT_END"] == len(sample_paths)
+assert profile_dict["timers"]["parse_line"]["calls"] == line_count
+assert profile_dict["timers"]["serialization"]["calls"] == len(sample_paths)
+assert profile_dict["deindent_pop_count"] >= profile_dict["deindent_count"] > 0
+for (name, pattern_dict) in profile_dict["patterns"].items():
+    assert name.startswith("rx_")
+    assert 0 <= pattern_dict["hits"] <= pattern_dict["attempts"]
+assert profile_dict["patterns"]["rx_input_file"]["hits"] == len(sample_paths)
@@ -56,3 +56,33 @@ assert not maybe_match is None
 
 maybe_match = disktype_to_dfxml.rx_boot_loader.search(b'      ISOLINUX boot loader\n'.strip())
 assert not maybe_match is None
+
+#The partition size is the whole number before the unit, not only its last digit.
+maybe_match = disktype_to_dfxml.rx_partition_meta_no_size_summary.search(b'Partition 1: 512 bytes (1 sectors from 63)\n'.strip())
+assert not maybe_match is None
+assert maybe_match.group("partition_size_unitless") == b"512"
+assert maybe_match.group("partition_size_unit") == b"bytes"
+
+maybe_match = disktype_to_dfxml.rx_partition_meta_size_summary.search(b'Partition 2: 1.000 GiB (1073741824 bytes, 2097152 sectors from 2048, bootable)\n'.strip())
+assert not maybe_match is None
+assert maybe_match.group("partition_size_unitless") == b"1073741824"
+assert maybe_match.group("from") == b"2048"
+assert maybe_match.group("bootable") == b", bootable"
+
+#A decoded system type can itself end in a parenthetical.
+maybe_match = disktype_to_dfxml.rx_platform_system_type.search(b'  Platform 0x00 (x86), System Type 0x0C (Win95 FAT32 (LBA))\n'.strip())
+assert not maybe_match is None
+assert maybe_match.group("system_type_encoded") == b"0x0C"
+assert maybe_match.group("system_type_decoded") == b"Win95 FAT32 (LBA)"
+
+maybe_match = disktype_to_dfxml.rx_volume_size_blocks_or_sectors.search(b'  Volume size 1.000 GiB (1073741824 bytes, 2097152 sectors)   \n'.strip())
+assert not maybe_match is None
+assert maybe_match.group("num_blocks") == b"2097152"
+
+#A size summary not closing the line does not match.
+maybe_match = disktype_to_dfxml.rx_volume_size_blocks_or_sectors.search(b'Volume size 1.000 GiB (1073741824 bytes, 2097152 sectors')
+assert maybe_match is None
+
+maybe_match = disktype_to_dfxml.rx_fs_type_str_misc_offset.search(b', 1234 KiB offset')
+assert not maybe_match is None
+assert maybe_match.group("bytes_unitless") == b"1234"
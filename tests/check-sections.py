@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks that parsing the '--- <path>' sections of a multi-image disktype output in parallel gives the same DFXML, streamed DFXML and JSON Lines as a serial parse.  The sample data, concatenated, is the multi-image input.
+
+It also checks that section boundaries are found only at a blank line before a '--- ' line, and not where a line broken by an embedded '\\r\\n' is followed by a '--- ' line.
+"""
+
+import glob
+import io
+import logging
+import os
+import sys
+import tempfile
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+sample_blobs = []
+for sample_path in sorted(glob.glob("*/*.txt")):
+    with open(sample_path, "rb") as sample_fh:
+        sample_blobs.append(sample_fh.read())
+input_blob = b"".join(sample_blobs)
+
+section_offsets = list(disktype_to_dfxml.iter_section_offsets(input_blob))
+_logger.debug("%d samples, %d sections." % (len(sample_blobs), len(section_offsets)))
+assert len(section_offsets) == input_blob.count(b"\n--- ")
+for section_offset in section_offsets[1:]:
+    assert input_blob[section_offset:section_offset+4] == b"--- "
+
+assert list(disktype_to_dfxml.iter_section_offsets(b"\n--- a\nX\n\n--- b\nY\n\n")) == [0, 10]
+assert list(disktype_to_dfxml.iter_section_offsets(b"\n--- a\nApplication \"X\r\n\n--- b\"\n\n")) == [0]
+assert list(disktype_to_dfxml.iter_section_offsets(b"\n--- a\nX\n  \n--- b\nY\n\n")) == [0, 12]
+
+with tempfile.NamedTemporaryFile(suffix=".txt") as input_fh:
+    input_fh.write(input_blob)
+    input_fh.flush()
+    for (streaming, output_format) in [
+      (False, "dfxml"),
+      (True, "dfxml"),
+      (False, "jsonl")
+    ]:
+        serial_fh = io.StringIO()
+        disktype_to_dfxml.write_dfxml(io.BytesIO(input_blob), serial_fh, streaming, output_format=output_format)
+        parallel_fh = io.StringIO()
+        disktype_to_dfxml.write_dfxml_sections(input_fh.name, parallel_fh, streaming, 3, output_format)
+        _logger.debug("streaming=%r, output_format=%r: %d characters." % (streaming, output_format, len(serial_fh.getvalue())))
+        assert parallel_fh.getvalue() == serial_fh.getvalue()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script checks a shard batch conversion of the ubuntu16.04 samples (see the check-shards.done.log recipe): the shards are complete, well-formed DFXML; the index covers every sample; and the DFXML fetched through the index for each sample has the same volumes, in the same order, as the sample's own conversion.
+
+It then simulates, in a second directory, a run that crashed after indexing a shard but before renaming it into place: the orphaned index entries are ignored, and the next run does not reuse the missing shard's name.
+"""
+
+import glob
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import xml.etree.ElementTree as ET
+
+logging.basicConfig(level=logging.DEBUG)
+_logger = logging.getLogger(os.path.basename(__file__))
+
+sys.path.append("..")
+import disktype_to_dfxml
+
+shard_dir = sys.argv[1]
+crash_shard_dir = sys.argv[2]
+
+dirent_names = sorted(os.listdir(shard_dir))
+assert not any(dirent_name.endswith(".tmp") for dirent_name in dirent_names)
+shard_names = [dirent_name for dirent_name in dirent_names if dirent_name.endswith(".dfxml")]
+_logger.debug("%d shards." % len(shard_names))
+assert len(shard_names) > 1
+for shard_name in shard_names:
+    ET.parse(os.path.join(shard_dir, shard_name))
+
+with open(os.path.join(shard_dir, "index.jsonl"), "r") as index_fh:
+    entries = [json.loads(line) for line in index_fh]
+assert set(entry["shard"] for entry in entries) == set(shard_names)
+
+def volume_texts(dfxml_text):
+    """Returns the serialized volume elements of a DFXML document, without their image path tags."""
+    texts = []
+    for vel in ET.fromstring(dfxml_text.encode("utf-8")).iter("{%s}volume" % disktype_to_dfxml.Objects.dfxml.XMLNS_DFXML):
+        for image_path_el in vel.findall("{%s}image_path" % disktype_to_dfxml.XMLNS_DFXML_EXT):
+            vel.remove(image_path_el)
+        #Shards put a line break after each volume.
+        vel.tail = None
+        texts.append(ET.tostring(vel, encoding="unicode"))
+    return texts
+
+sample_paths = sorted(glob.glob("ubuntu16.04/*.txt"))
+assert sorted(set(entry["input"] for entry in entries)) == sample_paths
+for sample_path in sample_paths:
+    serial_fh = io.StringIO()
+    with open(sample_path, "rb") as sample_fh:
+        disktype_to_dfxml.write_dfxml(sample_fh, serial_fh)
+    fetched_text = disktype_to_dfxml.fetch_shard_image(shard_dir, sample_path)
+    assert volume_texts(fetched_text) == volume_texts(serial_fh.getvalue()), sample_path
+
+shutil.rmtree(crash_shard_dir, ignore_errors=True)
+crash_groups = [disktype_to_dfxml.convert_shard_item(sample_path)[1] for sample_path in sample_paths[:3]]
+writer = disktype_to_dfxml.DFXMLShardWriter(crash_shard_dir, max_inputs=1)
+writer.write_input(sample_paths[0], crash_groups[0])
+orphan_shard_path = writer.write_input(sample_paths[1], crash_groups[1])
+#Undo the rename, as if the run had crashed just before it.
+os.replace(orphan_shard_path, orphan_shard_path + ".tmp")
+assert os.path.basename(orphan_shard_path) in set(entry["shard"] for entry in disktype_to_dfxml.read_shard_index(crash_shard_dir, only_present=False))
+assert not os.path.basename(orphan_shard_path) in set(entry["shard"] for entry in disktype_to_dfxml.read_shard_index(crash_shard_dir))
+try:
+    disktype_to_dfxml.fetch_shard_image(crash_shard_dir, sample_paths[1])
+    assert False, "Fetched an image from a shard that is not in place."
+except KeyError:
+    pass
+disktype_to_dfxml.fetch_shard_image(crash_shard_dir, sample_paths[0])
+
+writer = disktype_to_dfxml.DFXMLShardWriter(crash_shard_dir, max_inputs=1)
+for (sample_path, image_groups) in zip(sample_paths[1:3], crash_groups[1:3]):
+    shard_path = writer.write_input(sample_path, image_groups)
+    _logger.debug("Rerun shard: %r." % shard_path)
+    assert shard_path != orphan_shard_path
+writer.close()
+for sample_path in sample_paths[:3]:
+    serial_fh = io.StringIO()
+    with open(sample_path, "rb") as sample_fh:
+        disktype_to_dfxml.write_dfxml(sample_fh, serial_fh)
+    assert volume_texts(disktype_to_dfxml.fetch_shard_image(crash_shard_dir, sample_path)) == volume_texts(serial_fh.getvalue()), sample_path
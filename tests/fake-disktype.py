@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+# This software was developed at the National Institute of Standards
+# and Technology by employees of the Federal Government in the course
+# of their official duties. Pursuant to title 17 Section 105 of the
+# United States Code this software is not subject to copyright
+# protection and is in the public domain. NIST assumes no
+# responsibility whatsoever for its use by other parties, and makes
+# no guarantees, expressed or implied, about its quality,
+# reliability, or any other characteristic.
+#
+# We would appreciate acknowledgement if the software is used.
+
+"""
+This script stands in for disktype in tests.  Its "disk image" argument is a file of pre-computed disktype output, which is written to stdout a line at a time, as disktype would while scanning.
+
+The exit status is taken from the environment variable FAKE_DISKTYPE_EXIT_STATUS (default 0), to stand in for a scan that fails after writing its output.
+"""
+
+import os
+import sys
+
+with open(sys.argv[1], "rb") as in_fh:
+    for line in in_fh:
+        sys.stdout.buffer.write(line)
+        sys.stdout.buffer.flush()
+
+sys.exit(int(os.environ.get("FAKE_DISKTYPE_EXIT_STATUS", "0")))